@@ -1,11 +1,13 @@
 #!/usr/bin/env python3
 """
-Daily cost report from analytics/x_api_usage.jsonl.
+Cost report from the day-partitioned X API usage log (analytics/x_api_usage/).
+One day (--date), a month (--month) or any range (--from/--to) with optional
+weekly/monthly rollups. Closed days are read from their summary sidecar; today
+is summarized from its partition, so a range never loads every row at once.
 """
 
 import argparse
 import json
-from collections import defaultdict
 from datetime import date, timedelta
 from pathlib import Path
 import sys
@@ -14,20 +16,32 @@ from dotenv import load_dotenv
 ROOT_DIR = Path(__file__).resolve().parent.parent
 load_dotenv(ROOT_DIR / ".env")
 sys.path.insert(0, str(ROOT_DIR))
+sys.path.insert(0, str(ROOT_DIR / "post_scheduler"))
 from notifications.discord_notifier import DiscordNotifier
-
-LOG_FILE = Path(__file__).resolve().parent / "x_api_usage.jsonl"
+import cost_logger
+from usage_summary import TOP_QUERIES
+from usage_rollup import PERIODS, project_month_end, rollup
 
 
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="X API日次コスト集計")
     parser.add_argument("--date", help="対象日 (YYYY-MM-DD)")
     parser.add_argument("--yesterday", action="store_true", help="昨日を対象にする")
+    parser.add_argument("--month", help="月次で集計する (YYYY-MM)")
+    parser.add_argument("--from", dest="from_date", help="期間集計の開始日 (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="to_date", help="期間集計の終了日 (YYYY-MM-DD, 省略時は今日)")
+    parser.add_argument("--rollup", choices=PERIODS, help="期間内を日/週/月ごとに小計する")
+    parser.add_argument("--top-queries", type=int, default=TOP_QUERIES, help="出力する検索クエリの上位件数")
+    parser.add_argument("--projection", action="store_true", help="月末時点の支出見込みを付ける（--month/期間集計では常に付く）")
+    parser.add_argument("--migrate-legacy", action="store_true", help="旧 x_api_usage.jsonl を日別パーティションに分割する")
     parser.add_argument("--json", action="store_true", help="JSONで出力")
     parser.add_argument("--notify-discord", action="store_true", help="Discordに通知する")
     parser.add_argument("--discord-env", default="DISCORD_WEBHOOK_COST", help="Webhook URLを読む環境変数名")
     parser.add_argument("--discord-username", default="X Cost Reporter", help="Discord表示名")
-    return parser.parse_args()
+    args = parser.parse_args()
+    if args.to_date and not args.from_date:
+        parser.error("--to requires --from")
+    return args
 
 
 def target_date(args: argparse.Namespace) -> str:
@@ -39,57 +53,63 @@ def target_date(args: argparse.Namespace) -> str:
 
 
 def load_records(day: str) -> list[dict]:
-    if not LOG_FILE.exists():
-        return []
-    rows = []
-    with open(LOG_FILE, "r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            try:
-                rec = json.loads(line)
-            except json.JSONDecodeError:
-                continue
-            if rec.get("date") == day:
-                rows.append(rec)
-    return rows
-
-
-def summarize(rows: list[dict]) -> dict:
-    by_type = defaultdict(lambda: {"units": 0, "cost": 0.0, "events": 0})
-    by_endpoint = defaultdict(lambda: {"units": 0, "cost": 0.0, "events": 0})
-    total = 0.0
-    for r in rows:
-        usage_type = r.get("usage_type", "unknown")
-        endpoint = r.get("endpoint", "unknown")
-        units = int(r.get("units", 0) or 0)
-        cost = float(r.get("estimated_cost_usd", 0.0) or 0.0)
-
-        by_type[usage_type]["units"] += units
-        by_type[usage_type]["cost"] += cost
-        by_type[usage_type]["events"] += 1
-
-        by_endpoint[endpoint]["units"] += units
-        by_endpoint[endpoint]["cost"] += cost
-        by_endpoint[endpoint]["events"] += 1
-        total += cost
-
-    return {
-        "events": len(rows),
-        "estimated_total_usd": round(total, 6),
-        "by_type": {k: {"units": v["units"], "events": v["events"], "cost": round(v["cost"], 6)} for k, v in by_type.items()},
-        "by_endpoint": {k: {"units": v["units"], "events": v["events"], "cost": round(v["cost"], 6)} for k, v in by_endpoint.items()},
-    }
+    return list(cost_logger.iter_records(day))
+
+
+def month_range(month: str) -> tuple[date, date]:
+    """YYYY-MM の1日〜末日（今月なら今日まで）"""
+    first = date.fromisoformat(f"{month}-01")
+    last = min((first + timedelta(days=32)).replace(day=1) - timedelta(days=1), date.today())
+    return first, last
+
+
+def _projection(result: dict, end: date) -> dict:
+    """rollup が月初から集計していれば、その合計で月末見込みを出す（日別 summary を読み直さない）"""
+    month_to_date = result.pop("month_to_date_usd", None)
+    as_of = min(end, date.today())
+    if (as_of.year, as_of.month) != (end.year, end.month):
+        # end が来月以降: 集計した月と見込みを出す月が違う
+        month_to_date = None
+    return project_month_end(as_of, month_to_date_usd=month_to_date)
+
+
+def _sorted_buckets(buckets: dict) -> list[tuple[str, dict]]:
+    return sorted(buckets.items(), key=lambda x: x[1]["cost"], reverse=True)
+
+
+def _projection_line(p: dict) -> str:
+    line = (
+        f"{p['month']} 月末見込み ${p['projected_usd']:.6f}"
+        f"（{p['as_of']} 時点 ${p['month_to_date_usd']:.6f} / 日平均 ${p['daily_average_usd']:.6f}）"
+    )
+    if p["monthly_budget_usd"] is not None:
+        line += f" / 月次予算 ${p['monthly_budget_usd']:.2f}"
+        if p["projected_over_budget"]:
+            line += " ⚠ 超過見込み"
+    return line
+
+
+def _search_cache_line(cache: dict) -> str:
+    saved = ", ".join(f"{k}={v}" for k, v in sorted(cache["units_saved"].items())) or "0"
+    return (
+        f"照会 {cache['lookups']}回 / ヒット率 {cache['hit_rate']:.0%}"
+        f" (差分取得 {cache['since_id']}回) / 節約 ${cache['saved_usd']:.6f} ({saved})"
+    )
 
 
 def build_discord_message(result: dict) -> str:
     def _short(s: str, n: int = 64) -> str:
         return s if len(s) <= n else s[: n - 1] + "…"
 
+    if "month" in result:
+        title, scope = "**X API 月次コストレポート**", f"`month` {result['month']}"
+    elif "date" in result:
+        title, scope = "**X API 日次コストレポート**", f"`date` {result['date']}"
+    else:
+        title, scope = "**X API 期間コストレポート**", f"`range` {result['from']} 〜 {result['to']}"
     lines = [
-        "**X API 日次コストレポート**",
-        f"`date` {result['date']}",
+        title,
+        scope,
         "",
         f"**推定合計**: `${result['estimated_total_usd']:.6f}`",
         f"**イベント数**: `{result['events']}`",
@@ -117,22 +137,71 @@ def build_discord_message(result: dict) -> str:
     else:
         lines.append("- _データなし（この日のAPI利用ログなし）_")
 
+    by_ctx_sorted = _sorted_buckets(result.get("by_context") or {})[:5]
+    if by_ctx_sorted:
+        lines.append("")
+        lines.append("**by_context 上位5**")
+        for i, (ctx, v) in enumerate(by_ctx_sorted, 1):
+            lines.append(f"{i}. `{_short(ctx)}`  `${v['cost']:.6f}`  (events=`{v['events']}`)")
+
+    cache = result.get("search_cache") or {}
+    if cache.get("lookups"):
+        lines.append("")
+        lines.append("**検索キャッシュ**")
+        lines.append(f"- {_search_cache_line(cache)}")
+
+    if result.get("projection"):
+        lines.append("")
+        lines.append("**月末見込み**")
+        lines.append(f"- {_projection_line(result['projection'])}")
+
     return "\n".join(lines)
 
 
 def main() -> None:
     args = parse_args()
-    day = target_date(args)
-    rows = load_records(day)
-    result = summarize(rows)
-    result["date"] = day
-    result["log_file"] = str(LOG_FILE)
+    if args.migrate_legacy:
+        moved = cost_logger.split_legacy_log()
+        print(f"[migrate] {sum(moved.values())}件を{len(moved)}日分のパーティションに分割しました")
+        return
+
+    # 終わった日のパーティションを締めて sidecar を作っておく
+    cost_logger.close_past_days()
+    if args.month:
+        start, end = month_range(args.month)
+        if end < start:
+            raise SystemExit(f"--month ({args.month}) は今月以前にしてください")
+        result = rollup(start, end, args.rollup, max_queries=args.top_queries)
+        result["month"] = args.month
+        result["projection"] = _projection(result, end)
+        label = f"X API月次推定コスト: {args.month}"
+    elif args.from_date:
+        start = date.fromisoformat(args.from_date)
+        end = date.fromisoformat(args.to_date) if args.to_date else date.today()
+        if end < start:
+            raise SystemExit(f"--to ({end}) は --from ({start}) 以降にしてください")
+        result = rollup(start, end, args.rollup, max_queries=args.top_queries)
+        result["projection"] = _projection(result, end)
+        label = f"X API期間推定コスト: {start} 〜 {end}"
+    else:
+        day = target_date(args)
+        result = rollup(date.fromisoformat(day), date.fromisoformat(day), max_queries=args.top_queries)
+        for key in ("from", "to"):
+            result.pop(key)
+        result["date"] = day
+        if args.projection:
+            result["projection"] = _projection(result, date.fromisoformat(day))
+        result.pop("month_to_date_usd", None)
+        # 従来の出力キー（単一ファイル時代の log_file）はその日のパーティションを指す
+        result["log_file"] = str(cost_logger.partition_path(day))
+        label = f"X API日次推定コスト: {day}"
+    result["log_dir"] = str(cost_logger.partition_dir())
 
     if args.json:
         print(json.dumps(result, ensure_ascii=False, indent=2))
         return
 
-    print(f"X API日次推定コスト: {day}")
+    print(label)
     print(f"イベント数: {result['events']}")
     print(f"推定合計: ${result['estimated_total_usd']:.6f}")
     print("")
@@ -145,6 +214,34 @@ def main() -> None:
     for endpoint, v in sorted(result["by_endpoint"].items(), key=lambda x: x[1]["cost"], reverse=True):
         print(f"- {endpoint}: ${v['cost']:.6f} (units={v['units']}, events={v['events']})")
 
+    if result["by_context"]:
+        print("")
+        print("[by_context]")
+        for ctx, v in _sorted_buckets(result["by_context"]):
+            print(f"- {ctx}: ${v['cost']:.6f} (units={v['units']}, events={v['events']})")
+
+    if result["by_query"]:
+        print("")
+        print(f"[by_query 上位{args.top_queries}]")
+        for query, v in _sorted_buckets(result["by_query"]):
+            print(f"- {query}: ${v['cost']:.6f} (units={v['units']}, events={v['events']})")
+
+    if result.get("periods"):
+        print("")
+        print(f"[{result['rollup']}]")
+        for p in result["periods"]:
+            print(f"- {p['period']} ({p['from']}〜{p['to']}): ${p['estimated_total_usd']:.6f} (events={p['events']})")
+
+    if result.get("projection"):
+        print("")
+        print("[projection]")
+        print(f"- {_projection_line(result['projection'])}")
+
+    if result["search_cache"]["lookups"]:
+        print("")
+        print("[search_cache]")
+        print(f"- {_search_cache_line(result['search_cache'])}")
+
     if args.notify_discord:
         message = build_discord_message(result)
         notifier = DiscordNotifier.from_env(args.discord_env)
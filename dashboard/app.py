@@ -35,6 +35,7 @@ _EMPTY_DATA: dict = {
     "strategy": {"preferred_categories": [], "avoid_categories": [], "guidance": "データなし"},
     "reply_strategy": {"preferred_categories": [], "avoid_categories": [], "guidance": "データなし"},
     "reply_summary": {"total": 0, "posted": 0, "posted_rate": 0, "recent": []},
+    "rate_limits": [],
     "log_errors": [],
 }
 
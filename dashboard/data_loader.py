@@ -3,18 +3,26 @@
 import json
 import math
 import re
-from collections import defaultdict
+import sqlite3
+import sys
+from datetime import datetime
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent  # hokke_x/
 
+sys.path.insert(0, str(BASE_DIR / "post_scheduler"))
+from perf_store import PerfStore
+from rate_limiter import STATE_FILE as RATE_LIMIT_STATE_FILE, load_state as load_rate_limit_state
+
 DATA_PATHS = {
     "hook_performance": BASE_DIR / "hook_performance.json",
+    "hook_performance_db": BASE_DIR / "hook_performance.db",
     "strategy": BASE_DIR / "post_scheduler" / "strategy.json",
     "auto_post_state": BASE_DIR / "post_scheduler" / "auto_post_state.json",
     "auto_post_log": BASE_DIR / "post_scheduler" / "auto_post.log",
     "reply_log": BASE_DIR / "reply_system" / "reply_log.json",
     "reply_strategy": BASE_DIR / "reply_system" / "reply_strategy.json",
+    "rate_limits": RATE_LIMIT_STATE_FILE,
 }
 
 _SANITIZE_RE = re.compile(r"/[\w/.-]+")
@@ -66,13 +74,15 @@ def load_auto_post_state() -> dict:
     return data
 
 
-def _parse_perf_data(data: dict | list | None) -> list[dict]:
-    if not isinstance(data, dict) or "posts" not in data:
-        return []
-    posts = data["posts"]
-    if not isinstance(posts, list):
-        return []
-    return [p for p in posts if isinstance(p, dict)]
+def _load_perf_view(n_recent: int) -> tuple[list[dict], list[dict]]:
+    """直近 n_recent 件の投稿とカテゴリ別集計行を返す。全件は読み込まない。"""
+    try:
+        with PerfStore(DATA_PATHS["hook_performance_db"], DATA_PATHS["hook_performance"]) as store:
+            posts = [p for p in store.recent_posts(n_recent) if isinstance(p, dict)]
+            rows = store.rollup(group_by=("hookCategory",), fetched_only=False)
+            return posts, rows
+    except (OSError, ValueError, sqlite3.Error):
+        return [], []
 
 
 def _safe_number(val: object) -> int | float:
@@ -106,33 +116,43 @@ def load_recent_posts(posts: list[dict], n: int = 10) -> list[dict]:
     return result
 
 
-def load_category_stats(posts: list[dict]) -> list[dict]:
-    if not posts:
-        return []
-
-    by_cat: dict[str, list[dict]] = defaultdict(list)
-    for p in posts:
-        cat = p.get("hookCategory", "不明")
-        if not isinstance(cat, str):
-            cat = "不明"
-        by_cat[cat].append(p)
-
+def load_category_stats(rows: list[dict]) -> list[dict]:
+    """PerfStore.rollup(group_by=("hookCategory",)) の集計行を表示用に整形する。"""
     stats = []
-    for cat, cat_posts in sorted(by_cat.items()):
-        imps = [_safe_number(p.get("impressions", 0)) for p in cat_posts]
-        likes = [_safe_number(p.get("likes", 0)) for p in cat_posts]
-        avg_imp = sum(imps) / len(imps) if imps else 0
-        avg_likes = sum(likes) / len(likes) if likes else 0
+    for row in sorted(rows, key=lambda r: _ensure_str(r.get("hookCategory"))):
         stats.append({
-            "category": cat,
-            "count": len(cat_posts),
-            "avg_imp": round(avg_imp, 1),
-            "avg_likes": round(avg_likes, 1),
+            "category": _ensure_str(row.get("hookCategory")) or "不明",
+            "count": int(_safe_number(row.get("n", 0))),
+            "avg_imp": round(_safe_number(row.get("avg_imp", 0)), 1),
+            "avg_likes": round(_safe_number(row.get("avg_likes", 0)), 1),
         })
     stats.sort(key=lambda x: x["avg_imp"], reverse=True)
     return stats
 
 
+def load_rate_limits(now: datetime | None = None) -> list[dict]:
+    """X API エンドポイントごとの残り枠（XApiClient が最後に保存した状態）"""
+    now = now or datetime.now()
+    rows = []
+    for endpoint, bucket in sorted(load_rate_limit_state(DATA_PATHS["rate_limits"]).items()):
+        if not isinstance(bucket, dict):
+            continue
+        reset_at = bucket.get("reset_at")
+        reset = ""
+        if isinstance(reset_at, (int, float)) and math.isfinite(reset_at):
+            reset_dt = datetime.fromtimestamp(reset_at)
+            reset = reset_dt.strftime("%H:%M:%S") if reset_dt > now else "リセット済み"
+        remaining = bucket.get("remaining")
+        limit = bucket.get("limit")
+        rows.append({
+            "endpoint": _ensure_str(endpoint),
+            "remaining": int(_safe_number(remaining)) if remaining is not None else None,
+            "limit": int(_safe_number(limit)) if limit is not None else None,
+            "reset": reset,
+        })
+    return rows
+
+
 def _normalize_strategy(data: dict | None, default_guidance: str = "データなし") -> dict:
     """戦略dictのフィールドを型正規化する。"""
     if not isinstance(data, dict):
@@ -198,8 +218,7 @@ def _parse_log(log_text: str) -> tuple[list[str], str | None]:
 
 
 def load_all_dashboard_data() -> dict:
-    perf_data = _load_json(DATA_PATHS["hook_performance"])
-    posts = _parse_perf_data(perf_data)
+    recent_posts, category_rows = _load_perf_view(10)
 
     log_text = _load_tail(DATA_PATHS["auto_post_log"])
     log_errors, last_post_time = _parse_log(log_text)
@@ -207,10 +226,11 @@ def load_all_dashboard_data() -> dict:
     return {
         "auto_post_state": load_auto_post_state(),
         "last_post_time": last_post_time,
-        "recent_posts": load_recent_posts(posts, 10),
-        "category_stats": load_category_stats(posts),
+        "recent_posts": load_recent_posts(recent_posts, 10),
+        "category_stats": load_category_stats(category_rows),
         "strategy": load_strategy(),
         "reply_strategy": load_reply_strategy(),
         "reply_summary": load_reply_summary(),
+        "rate_limits": load_rate_limits(),
         "log_errors": log_errors,
     }
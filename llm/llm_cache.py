@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Content-addressed cache for LLM results.
+Entries are keyed on (prompt template id, model, normalized input), so the
+same tweet judged again in a later search, or a post re-categorized after a
+failed run, is answered from disk instead of paying for another LLM call.
+
+The template id carries a hash of the prompt text itself (template_id), so
+editing a prompt or the persona invalidates its entries without a migration.
+Callers cache parsed results only, never failed or malformed responses.
+Entries expire after a TTL and the table is trimmed to MAX_ENTRIES by least
+recent use. Hit/miss counters are kept per session and per template on disk.
+Lookups only read; recency and counter updates are batched into the next write.
+"""
+
+from __future__ import annotations
+
+import atexit
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import unicodedata
+from pathlib import Path
+from typing import Any, Optional
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+DB_FILE = PROJECT_DIR / "analytics" / "llm_cache.db"
+
+# Entries older than this are treated as missing (per-call ttl overrides)
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+# Least recently used entries beyond this count are evicted
+MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "20000"))
+# Buffered last_used/counter updates are written after this many (and on put/close)
+FLUSH_EVERY = 200
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key       TEXT PRIMARY KEY,
+    template  TEXT NOT NULL,
+    model     TEXT NOT NULL,
+    value     TEXT NOT NULL,
+    created   REAL NOT NULL,
+    expires   REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_entries_last_used ON entries(last_used);
+CREATE INDEX IF NOT EXISTS idx_entries_expires ON entries(expires);
+CREATE TABLE IF NOT EXISTS counters (
+    template  TEXT PRIMARY KEY,
+    hits      INTEGER NOT NULL DEFAULT 0,
+    misses    INTEGER NOT NULL DEFAULT 0,
+    stores    INTEGER NOT NULL DEFAULT 0,
+    evictions INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+
+def _warn(message: str, error: Exception) -> None:
+    print(f"[llm_cache] {message}: {type(error).__name__}: {error}", file=sys.stderr)
+
+
+def normalize_input(text: str) -> str:
+    """全角/半角と空白の揺れだけを吸収する（大文字小文字は区別する）"""
+    return " ".join(unicodedata.normalize("NFKC", text or "").split())
+
+
+def template_id(name: str, *parts: str) -> str:
+    """name にプロンプト本文のハッシュを付ける。プロンプトが変われば別のキーになる"""
+    digest = hashlib.sha1("\0".join(parts).encode("utf-8")).hexdigest()[:12]
+    return f"{name}@{digest}"
+
+
+def cache_key(template: str, model: str, text: str) -> str:
+    raw = "\0".join((template, model, normalize_input(text)))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """値は JSON にして保存する。None は「キャッシュなし」と区別できないので保存しない。
+
+    get は読むだけで、LRU の last_used とヒット・ミス件数はメモリに貯め、put・close
+    （または FLUSH_EVERY 件たまった時）にまとめて書く。SQLite のエラーはキャッシュの
+    障害として扱い、get はミス、put は何もしない（LLM 呼び出し自体は止めない）。
+    """
+
+    def __init__(self, path: Path = DB_FILE, *, max_entries: int = MAX_ENTRIES,
+                 ttl_seconds: float = DEFAULT_TTL_SECONDS):
+        self.path = Path(path)
+        self.max_entries = max(max_entries, 1)
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._counts = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        # まだ DB に書いていない last_used と counters の差分
+        self._touched: dict[str, float] = {}
+        self._pending: dict[tuple[str, str], int] = {}
+        self._conn: Optional[sqlite3.Connection] = None
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # generate_reply_dashboard の LLM ワーカー（スレッド）から共有する
+            conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._conn = conn
+        except (sqlite3.Error, OSError) as e:
+            _warn(f"{self.path} を開けない（キャッシュなしで続行）", e)
+
+    def _count(self, template: str, column: str, n: int = 1) -> None:
+        self._counts[column] += n
+        self._pending[(template, column)] = self._pending.get((template, column), 0) + n
+
+    def _write_pending(self) -> None:
+        """貯めた last_used と counters を書く。呼び出し側でロックとトランザクションを持つ"""
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE entries SET last_used = MAX(last_used, ?) WHERE key = ?",
+                [(used, key) for key, used in self._touched.items()],
+            )
+        for (template, column), n in self._pending.items():
+            self._conn.execute(
+                f"INSERT INTO counters (template, {column}) VALUES (?, ?) "
+                f"ON CONFLICT(template) DO UPDATE SET {column} = {column} + excluded.{column}",
+                (template, n),
+            )
+        self._touched.clear()
+        self._pending.clear()
+
+    def _flush_locked(self) -> None:
+        if self._conn is None or not (self._touched or self._pending):
+            return
+        try:
+            with self._conn:
+                self._write_pending()
+        except sqlite3.Error as e:
+            # LRU の順番と件数がずれるだけなので、貯め続けずに捨てる
+            self._touched.clear()
+            self._pending.clear()
+            _warn("使用状況を書けない", e)
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush_locked()
+
+    def get(self, template: str, model: str, text: str, *, now: Optional[float] = None) -> Optional[Any]:
+        """期限内の値を返す（無ければ None）。使った entry は次の書き込みで LRU の先頭に戻す"""
+        now = time.time() if now is None else now
+        key = cache_key(template, model, text)
+        with self._lock:
+            row = None
+            if self._conn is not None:
+                try:
+                    row = self._conn.execute(
+                        "SELECT value FROM entries WHERE key = ? AND expires > ?", (key, now)
+                    ).fetchone()
+                except sqlite3.Error as e:
+                    _warn("読めない（ミス扱い）", e)
+            if row is None:
+                self._count(template, "misses")
+            else:
+                self._touched[key] = now
+                self._count(template, "hits")
+            if len(self._touched) + len(self._pending) >= FLUSH_EVERY:
+                self._flush_locked()
+        return None if row is None else json.loads(row[0])
+
+    def put(self, template: str, model: str, text: str, value: Any, *,
+            ttl: Optional[float] = None, now: Optional[float] = None) -> None:
+        if value is None:
+            return
+        now = time.time() if now is None else now
+        ttl = self.ttl_seconds if ttl is None else ttl
+        with self._lock:
+            if self._conn is None:
+                return
+            # 書き込みに失敗したら件数と貯めた差分を元に戻す
+            saved = dict(self._counts), dict(self._touched), dict(self._pending)
+            try:
+                with self._conn:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO entries (key, template, model, value, created, expires, last_used) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (cache_key(template, model, text), template, model,
+                         json.dumps(value, ensure_ascii=False), now, now + ttl, now),
+                    )
+                    self._count(template, "stores")
+                    # 使った entry の last_used を反映してから追い出す
+                    self._write_pending()
+                    self._evict(now)
+                    self._write_pending()
+            except sqlite3.Error as e:
+                self._counts, self._touched, self._pending = saved
+                _warn("書けない（保存せず続行）", e)
+
+    def _evict(self, now: float) -> None:
+        """期限切れを消し、残りが max_entries を超えたら古く使われたものから消す"""
+        evicted: dict[str, int] = dict(self._conn.execute(
+            "SELECT template, COUNT(*) FROM entries WHERE expires <= ? GROUP BY template", (now,)
+        ).fetchall())
+        self._conn.execute("DELETE FROM entries WHERE expires <= ?", (now,))
+        excess = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0] - self.max_entries
+        if excess > 0:
+            rows = self._conn.execute(
+                "SELECT key, template FROM entries ORDER BY last_used LIMIT ?", (excess,)
+            ).fetchall()
+            self._conn.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key, _ in rows])
+            for _, template in rows:
+                evicted[template] = evicted.get(template, 0) + 1
+        for template, n in evicted.items():
+            self._count(template, "evictions", n)
+
+    def __len__(self) -> int:
+        with self._lock:
+            if self._conn is None:
+                return 0
+            return self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def stats(self) -> dict:
+        """このプロセスでのヒット・ミス・保存・追い出し件数"""
+        with self._lock:
+            counts = dict(self._counts)
+        lookups = counts["hits"] + counts["misses"]
+        return {**counts, "hit_rate": round(counts["hits"] / lookups, 4) if lookups else 0.0}
+
+    def totals(self) -> dict[str, dict]:
+        """テンプレートごとの累計（cron の実行をまたいだ件数）"""
+        with self._lock:
+            if self._conn is None:
+                return {}
+            self._flush_locked()
+            rows = self._conn.execute(
+                "SELECT template, hits, misses, stores, evictions FROM counters ORDER BY template"
+            ).fetchall()
+        return {t: {"hits": h, "misses": m, "stores": s, "evictions": e} for t, h, m, s, e in rows}
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is None:
+                return
+            self._flush_locked()
+            self._conn.close()
+            self._conn = None
+
+
+_CACHE: Optional[LLMCache] = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_cache() -> LLMCache:
+    """プロセス内で共有するキャッシュ（初回呼び出し時に DB_FILE を開く）"""
+    global _CACHE
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            _CACHE = LLMCache(DB_FILE)
+            atexit.register(_CACHE.close)
+        return _CACHE
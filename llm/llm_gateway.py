@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+"""
+Shared LLM gateway.
+One interface for every subsystem that prompts an LLM CLI (auto_post,
+reply_engine, check_engagement, account_brainstorm).
+
+CLI backends keep warm workers: processes started ahead of time that have
+already paid the Node start-up and are blocked reading the prompt from stdin.
+A call hands its prompt to an idle worker. Replacements are only started once a
+process has come back for a second call, so a one-shot script spawns a single
+CLI and a batch loop pays the cold start at most twice.
+Each worker answers exactly one prompt, so no conversation state leaks between
+calls. The gateway adds a concurrency limit, per-call timeouts and latency
+metrics. Backends are pluggable (claude / codex / stub, or register_backend).
+"""
+
+from __future__ import annotations
+
+import atexit
+import os
+import shutil
+import statistics
+import subprocess
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Optional
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+NODE_BIN_FALLBACK = Path("/home/sekiz/.nvm/versions/node/v24.13.0/bin")
+
+DEFAULT_TIMEOUT_SECONDS = 60.0
+# Processes answering prompts at the same time (per gateway)
+MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "2"))
+# Idle pre-started workers kept per backend (0 = start a process per call)
+WARM_WORKERS = int(os.getenv("LLM_WARM_WORKERS", "1"))
+# Idle workers older than this are replaced (credentials/config may have changed)
+WORKER_MAX_IDLE_SECONDS = 10 * 60
+LATENCY_SAMPLES = 500
+
+
+@dataclass
+class LLMResponse:
+    ok: bool
+    text: str = ""
+    error: str = ""
+    latency: float = 0.0
+    timed_out: bool = False
+    warm: bool = False
+
+
+def find_cli(name: str) -> Optional[str]:
+    """PATH → nvm の固定パスの順に CLI を探す"""
+    found = shutil.which(name)
+    if found:
+        return found
+    fallback = NODE_BIN_FALLBACK / name
+    return str(fallback) if fallback.exists() else None
+
+
+# Claude Code 内から claude を起動したときにネスト起動と判定される環境変数
+NESTING_ENV_VARS = ("CLAUDECODE", "CLAUDE_CODE_ENTRYPOINT")
+
+
+def clean_env() -> dict[str, str]:
+    """ネスト起動の目印だけを除いた環境変数（CLAUDE_CONFIG_DIR などの設定は残す）"""
+    return {k: v for k, v in os.environ.items() if k not in NESTING_ENV_VARS}
+
+
+class Backend:
+    name = "base"
+
+    def complete(self, prompt: str, timeout: float) -> LLMResponse:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class StubBackend(Backend):
+    """CLI を起動しない代替バックエンド（テスト・dry run 用）"""
+
+    name = "stub"
+
+    def __init__(self, responder: Optional[Callable[[str], str]] = None):
+        self.responder = responder or (lambda prompt: "")
+
+    def complete(self, prompt: str, timeout: float) -> LLMResponse:
+        try:
+            return LLMResponse(ok=True, text=self.responder(prompt), warm=True)
+        except Exception as e:
+            return LLMResponse(ok=False, error=str(e))
+
+
+class _Worker:
+    def __init__(self, proc: subprocess.Popen):
+        self.proc = proc
+        self.started = time.monotonic()
+
+    def usable(self) -> bool:
+        return self.proc.poll() is None and time.monotonic() - self.started < WORKER_MAX_IDLE_SECONDS
+
+    def kill(self) -> None:
+        if self.proc.poll() is None:
+            self.proc.kill()
+        try:
+            self.proc.communicate(timeout=5)
+        except (subprocess.TimeoutExpired, ValueError, OSError):
+            pass
+
+
+class CLIBackend(Backend):
+    """プロンプトを stdin で受け取る CLI。起動済みの待機プロセスを warm 個保つ"""
+
+    name = "cli"
+
+    def __init__(self, argv: list[str], *, warm: int = WARM_WORKERS, cwd: Optional[Path] = None,
+                 env: Optional[dict[str, str]] = None):
+        self.argv = argv
+        self.warm = max(warm, 0)
+        self.cwd = cwd
+        self.env = env
+        self._idle: list[_Worker] = []
+        self._spawning = 0
+        self._taken = 0
+        self._lock = threading.Lock()
+        # 起動中の待機プロセスが _idle に入った（または起動に失敗した）ことを知らせる
+        self._ready = threading.Condition(self._lock)
+        self._closed = False
+        self.prewarm()
+
+    def _spawn(self) -> _Worker:
+        return _Worker(subprocess.Popen(
+            self.argv,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            cwd=str(self.cwd) if self.cwd else None,
+            env=self.env,
+        ))
+
+    def prewarm(self) -> None:
+        """待機プロセスを warm 個まで補充する（バックグラウンド）"""
+        if self.warm:
+            threading.Thread(target=self._refill, name=f"llm-{self.name}-prewarm", daemon=True).start()
+
+    def _refill(self) -> None:
+        while True:
+            with self._lock:
+                stale = [w for w in self._idle if not w.usable()]
+                self._idle = [w for w in self._idle if w.usable()]
+                need = not self._closed and len(self._idle) + self._spawning < self.warm
+                if need:
+                    self._spawning += 1
+            for w in stale:
+                w.kill()
+            if not need:
+                return
+            worker = None
+            try:
+                worker = self._spawn()
+            except OSError:
+                pass
+            finally:
+                with self._lock:
+                    self._spawning -= 1
+                    keep = worker is not None and not self._closed
+                    if keep:
+                        self._idle.append(worker)
+                    self._ready.notify_all()
+            if not keep:
+                if worker is not None:
+                    worker.kill()
+                return
+
+    def _take(self) -> tuple[_Worker, bool]:
+        """待機プロセスを1つ取り出す（無ければその場で起動）。
+
+        起動中の待機プロセスがあれば、2つ目を起動せずにそれを待つ。
+        補充は2回目の呼び出しから始める。1回しか呼ばないプロセスで
+        使われない待機プロセスを起動しないため。
+        """
+        worker = None
+        with self._lock:
+            repeat = self._taken > 0
+            self._taken += 1
+            while True:
+                while self._idle:
+                    candidate = self._idle.pop(0)
+                    if candidate.usable():
+                        worker = candidate
+                        break
+                    threading.Thread(target=candidate.kill, daemon=True).start()
+                if worker is not None or not self._spawning or self._closed:
+                    break
+                self._ready.wait()
+        if repeat:
+            self.prewarm()
+        if worker is not None:
+            return worker, True
+        return self._spawn(), False
+
+    def parse_output(self, stdout: str) -> str:
+        return stdout.strip()
+
+    def complete(self, prompt: str, timeout: float) -> LLMResponse:
+        try:
+            worker, warm = self._take()
+        except OSError as e:
+            return LLMResponse(ok=False, error=f"{self.argv[0]} を起動できない: {e}")
+        try:
+            stdout, stderr = worker.proc.communicate(input=prompt, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            worker.kill()
+            return LLMResponse(ok=False, error=f"タイムアウト ({timeout:.0f}秒)", timed_out=True, warm=warm)
+        except OSError as e:
+            worker.kill()
+            return LLMResponse(ok=False, error=str(e), warm=warm)
+        if worker.proc.returncode != 0:
+            err = (stderr or "").strip()
+            return LLMResponse(ok=False, error=f"exit={worker.proc.returncode}: {err[:200]}", warm=warm)
+        return LLMResponse(ok=True, text=self.parse_output(stdout or ""), warm=warm)
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._ready.notify_all()
+        for w in idle:
+            w.kill()
+
+
+class ClaudeBackend(CLIBackend):
+    """claude -p（プロンプトは stdin）"""
+
+    name = "claude"
+
+    def __init__(self, **kwargs):
+        cmd = find_cli("claude")
+        if not cmd:
+            raise FileNotFoundError("claude コマンドが見つからない")
+        kwargs.setdefault("env", clean_env())
+        super().__init__([cmd, "-p"], **kwargs)
+
+
+class CodexBackend(CLIBackend):
+    """codex exec -（プロンプトは stdin）"""
+
+    name = "codex"
+
+    def __init__(self, **kwargs):
+        cmd = find_cli("codex")
+        if not cmd:
+            raise FileNotFoundError("codex コマンドが見つからない")
+        kwargs.setdefault("cwd", PROJECT_DIR)
+        super().__init__([cmd, "exec", "--skip-git-repo-check", "-"], **kwargs)
+
+    def parse_output(self, stdout: str) -> str:
+        # codex exec の出力からヘッダーとフッターを除去
+        content_lines = []
+        in_content = False
+        for line in stdout.split("\n"):
+            if line.startswith("codex"):
+                in_content = True
+                continue
+            if in_content:
+                if line.startswith("tokens used"):
+                    break
+                content_lines.append(line)
+        return "\n".join(content_lines).strip() if content_lines else stdout.strip()
+
+
+BACKENDS: dict[str, Callable[[], Backend]] = {
+    "claude": ClaudeBackend,
+    "codex": CodexBackend,
+    "stub": StubBackend,
+}
+
+
+def register_backend(name: str, factory: Callable[[], Backend]) -> None:
+    BACKENDS[name] = factory
+    _GATEWAYS.pop(name, None)
+
+
+class LLMGateway:
+    """バックエンド1つ分の入口。同時実行数の上限・タイムアウト・レイテンシ計測を受け持つ"""
+
+    def __init__(self, backend: Backend, *, max_concurrency: int = MAX_CONCURRENCY,
+                 default_timeout: float = DEFAULT_TIMEOUT_SECONDS):
+        self.backend = backend
+        self.default_timeout = default_timeout
+        self._slots = threading.BoundedSemaphore(max(max_concurrency, 1))
+        self._lock = threading.Lock()
+        self._latencies: deque[float] = deque(maxlen=LATENCY_SAMPLES)
+        self._counts = {"calls": 0, "ok": 0, "errors": 0, "timeouts": 0, "warm": 0}
+        self._queue_wait = 0.0
+
+    def complete(self, prompt: str, *, timeout: Optional[float] = None) -> LLMResponse:
+        """prompt を投げて応答を返す。timeout には空きスロット待ちの時間も含む"""
+        timeout = timeout or self.default_timeout
+        t0 = time.monotonic()
+        if not self._slots.acquire(timeout=timeout):
+            response = LLMResponse(ok=False, error=f"同時実行の空き待ちでタイムアウト ({timeout:.0f}秒)", timed_out=True)
+        else:
+            waited = time.monotonic() - t0
+            try:
+                response = self.backend.complete(prompt, max(timeout - waited, 1.0))
+            finally:
+                self._slots.release()
+            with self._lock:
+                self._queue_wait += waited
+        response.latency = time.monotonic() - t0
+        self._record(response)
+        return response
+
+    def _record(self, response: LLMResponse) -> None:
+        with self._lock:
+            self._counts["calls"] += 1
+            self._counts["ok" if response.ok else "errors"] += 1
+            self._counts["timeouts"] += int(response.timed_out)
+            self._counts["warm"] += int(response.warm)
+            self._latencies.append(response.latency)
+
+    def metrics(self) -> dict:
+        """呼び出し回数・エラー・warm 率と、直近 LATENCY_SAMPLES 件のレイテンシ（秒）"""
+        with self._lock:
+            samples = sorted(self._latencies)
+            counts = dict(self._counts)
+            queue_wait = self._queue_wait
+
+        def _pct(p: float) -> float:
+            return round(samples[min(int(len(samples) * p), len(samples) - 1)], 3) if samples else 0.0
+
+        return {
+            "backend": self.backend.name,
+            **counts,
+            "warm_rate": round(counts["warm"] / counts["calls"], 4) if counts["calls"] else 0.0,
+            "latency_p50": _pct(0.5),
+            "latency_p95": _pct(0.95),
+            "latency_max": round(samples[-1], 3) if samples else 0.0,
+            "latency_mean": round(statistics.fmean(samples), 3) if samples else 0.0,
+            "queue_wait_total": round(queue_wait, 3),
+        }
+
+    def close(self) -> None:
+        self.backend.close()
+
+
+_GATEWAYS: dict[str, LLMGateway] = {}
+_GATEWAYS_LOCK = threading.Lock()
+
+
+def backend_name(name: str = "claude") -> str:
+    """実際に使われるバックエンド名（LLM_BACKEND が設定されていればそちら）"""
+    return os.getenv("LLM_BACKEND", "").strip() or name
+
+
+def get_gateway(name: str = "claude") -> LLMGateway:
+    """プロセス内で共有するゲートウェイ。LLM_BACKEND を設定すると全呼び出しをそのバックエンドに向ける"""
+    name = backend_name(name)
+    with _GATEWAYS_LOCK:
+        gateway = _GATEWAYS.get(name)
+        if gateway is None:
+            if name not in BACKENDS:
+                raise ValueError(f"unknown LLM backend: {name}")
+            gateway = _GATEWAYS[name] = LLMGateway(BACKENDS[name]())
+        return gateway
+
+
+def prewarm(name: str = "claude") -> None:
+    """最初の呼び出しより前に待機プロセスを起こしておく（CLI が無ければ何もしない）"""
+    try:
+        get_gateway(name)
+    except (FileNotFoundError, ValueError):
+        pass
+
+
+@atexit.register
+def _close_all() -> None:
+    with _GATEWAYS_LOCK:
+        gateways = list(_GATEWAYS.values())
+        _GATEWAYS.clear()
+    for gateway in gateways:
+        gateway.close()
@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 """
 ホッケ 自動投稿スクリプト
-cronから実行。claude -p でツイートを生成してx_poster.pyで投稿する。
+cronから実行。claude -p（llm_gateway 経由）でツイートを生成してx_poster.pyで投稿する。
 投稿判断・画像判断もLLMに委譲（ハードリミットで制約付き）。
 """
 
@@ -13,15 +13,21 @@ import sys
 import re
 import random
 import argparse
-import time
+import sqlite3
 from pathlib import Path
 from datetime import datetime, timedelta
 from typing import IO
 
+from perf_store import PerfStore, store_signature
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from llm.llm_gateway import get_gateway, prewarm
+
 SCRIPT_DIR = Path(__file__).parent
 PROJECT_DIR = SCRIPT_DIR.parent
 PERSONA_FILE = PROJECT_DIR / "PERSONA.md"
 PERFORMANCE_FILE = PROJECT_DIR / "hook_performance.json"
+PERFORMANCE_DB = PROJECT_DIR / "hook_performance.db"
 LOG_FILE = SCRIPT_DIR / "auto_post.log"
 X_POSTER = SCRIPT_DIR / "x_poster.py"
 STATE_FILE = SCRIPT_DIR / "auto_post_state.json"
@@ -63,51 +69,84 @@ def _parse_posted_at(value: str) -> datetime | None:
 
 
 def _load_posts() -> list[dict]:
-    if not PERFORMANCE_FILE.exists():
+    try:
+        with PerfStore(PERFORMANCE_DB, PERFORMANCE_FILE) as store:
+            return store.all_posts()
+    except (OSError, ValueError, sqlite3.Error) as e:
+        log(f"[warn] hook_performance 読み込み失敗: {e}")
         return []
+
+
+def _load_rollup(**query) -> list[dict]:
     try:
-        with open(PERFORMANCE_FILE, encoding="utf-8") as f:
-            data = json.load(f)
-        if not isinstance(data, dict):
-            log(f"[warn] hook_performance.json がdict以外: {type(data).__name__}")
-            return []
-        return data.get("posts", [])
-    except (OSError, json.JSONDecodeError) as e:
-        log(f"[warn] hook_performance.json 読み込み失敗: {e}")
+        with PerfStore(PERFORMANCE_DB, PERFORMANCE_FILE) as store:
+            return store.rollup(**query)
+    except (OSError, ValueError, sqlite3.Error) as e:
+        log(f"[warn] engagement_rollup 読み込み失敗: {e}")
         return []
 
 
+class _PostSnapshot:
+    """1回の実行で共有する投稿スナップショット。
+
+    postedAt のパースと reply 除外・日付グルーピングを読み込み時に1度だけ行い、
+    ゲート判定・プロンプト構築はここから引く。
+    """
+
+    def __init__(self, posts: list[dict]):
+        self.posts = posts
+        # (post, postedAt の datetime) の組。reply も含む
+        self.parsed: list[tuple[dict, datetime | None]] = [
+            (p, _parse_posted_at(p.get("postedAt", ""))) for p in posts
+        ]
+        non_reply = [p for p in posts if p.get("tweet_type") != "reply"]
+
+        self._by_day: dict[str, list[dict]] = {}
+        for p in non_reply:
+            self._by_day.setdefault(str(p.get("postedAt", ""))[:10], []).append(p)
+
+        self.last_post_at: datetime | None = max(
+            (dt for p, dt in self.parsed if dt and p.get("tweet_type") != "reply"),
+            default=None,
+        )
+        self.recent_non_reply: list[dict] = sorted(
+            non_reply, key=lambda p: p.get("postedAt", ""), reverse=True
+        )
+
+    def today_posts(self, now: datetime) -> list[dict]:
+        """今日の投稿（reply除く）"""
+        return self._by_day.get(now.date().isoformat(), [])
+
+    def today_image_posts(self, now: datetime) -> list[dict]:
+        return [p for p in self.today_posts(now) if p.get("has_image") is True]
+
+    def recent_texts(self, limit: int) -> list[tuple[str, str]]:
+        return [(p.get("hookCategory", ""), p.get("text", "")) for p in self.recent_non_reply[:limit]]
+
+
+_snapshot_cache: tuple[tuple, _PostSnapshot] | None = None
+
+
+def _post_snapshot() -> _PostSnapshot:
+    """hook_performance の (mtime, size) が変わらない限り同じスナップショットを返す"""
+    global _snapshot_cache
+    key = store_signature(PERFORMANCE_DB)
+    if _snapshot_cache is None or _snapshot_cache[0] != key:
+        _snapshot_cache = (key, _PostSnapshot(_load_posts()))
+    return _snapshot_cache[1]
+
+
 def _today_post_count(now: datetime) -> int:
-    today = now.date().isoformat()
-    return sum(
-        1 for p in _load_posts()
-        if str(p.get("postedAt", "")).startswith(today)
-        and p.get("tweet_type") != "reply"
-    )
+    return len(_post_snapshot().today_posts(now))
 
 
 def _today_image_post_count(now: datetime) -> int:
     """今日の画像付き投稿数をカウント"""
-    today = now.date().isoformat()
-    return sum(
-        1 for p in _load_posts()
-        if str(p.get("postedAt", "")).startswith(today)
-        and p.get("tweet_type") != "reply"
-        and p.get("has_image") is True
-    )
+    return len(_post_snapshot().today_image_posts(now))
 
 
 def _last_post_at() -> datetime | None:
-    latest = None
-    for post in _load_posts():
-        if post.get("tweet_type") == "reply":
-            continue
-        dt = _parse_posted_at(post.get("postedAt", ""))
-        if not dt:
-            continue
-        if latest is None or dt > latest:
-            latest = dt
-    return latest
+    return _post_snapshot().last_post_at
 
 
 def _load_state() -> dict:
@@ -270,9 +309,7 @@ def is_image_eligible(strategy: dict, now: datetime) -> bool:
 
 def _recent_post_texts(limit: int = 7) -> list[tuple[str, str]]:
     """直近の投稿(reply除く)からカテゴリとテキストを返す"""
-    posts = [p for p in _load_posts() if p.get("tweet_type") != "reply"]
-    posts.sort(key=lambda p: p.get("postedAt", ""), reverse=True)
-    return [(p.get("hookCategory", ""), p.get("text", "")) for p in posts[:limit]]
+    return _post_snapshot().recent_texts(limit)
 
 
 def load_strategy() -> dict:
@@ -289,7 +326,7 @@ def load_strategy() -> dict:
 # --- Timing context for LLM ---
 
 def _build_timing_context(now: datetime, gate_info: dict, image_eligible: bool, *, run_interval_minutes: int = 30) -> str:
-    """hook_performance.json から直近14日間のデータを集計し、LLMに渡す構造化コンテキストを返す"""
+    """直近14日間の投稿実績を集計し、LLMに渡す構造化コンテキストを返す"""
     lines = []
 
     # 現在の状況
@@ -330,68 +367,37 @@ def _build_timing_context(now: datetime, gate_info: dict, image_eligible: bool,
     else:
         lines.append("- 画像枠: なし（日次上限到達）")
 
-    # 直近14日間のパフォーマンスデータ
-    posts = _load_posts()
-    cutoff = (now - timedelta(days=14)).isoformat()
-    recent_posts = [
-        p for p in posts
-        if p.get("engagementFetchedAt")
-        and p.get("tweet_type") != "reply"
-        and p.get("hookCategory") not in ("リプライ", "未分類")
-        and str(p.get("postedAt", "")) >= cutoff
-    ]
-
-    if recent_posts:
-        # 時間帯別パフォーマンス
-        from collections import defaultdict
-        hour_stats: dict[int, list[int]] = defaultdict(list)
-        for p in recent_posts:
-            posted_at = _parse_posted_at(p.get("postedAt", ""))
-            if posted_at:
-                imp = p.get("impressions") or 0
-                hour_stats[posted_at.hour].append(imp)
-
-        if hour_stats:
-            lines.append("")
-            lines.append("【時間帯別パフォーマンス（直近14日）】")
-            # imp平均でソート（降順）
-            sorted_hours = sorted(
-                hour_stats.items(),
-                key=lambda x: sum(x[1]) / len(x[1]),
-                reverse=True,
-            )
-            for hour, imps in sorted_hours:
-                avg = sum(imps) / len(imps)
-                n = len(imps)
-                note = ""
-                if n <= 2:
-                    note = "データ少"
-                elif avg >= 30:
-                    note = "好調"
-                elif avg < 15:
-                    note = "低調"
-                marker = " ← 現在" if hour == now.hour else ""
-                lines.append(f"- {hour:02d}時台: avg imp {avg:.0f} (n={n}{', ' + note if note else ''}){marker}")
-
-        # カテゴリ別パフォーマンス
-        cat_stats: dict[str, list[int]] = defaultdict(list)
-        for p in recent_posts:
-            cat = p.get("hookCategory", "未分類")
-            imp = p.get("impressions") or 0
-            cat_stats[cat].append(imp)
-
-        if cat_stats:
-            lines.append("")
-            lines.append("【カテゴリ別パフォーマンス（直近14日）】")
-            sorted_cats = sorted(
-                cat_stats.items(),
-                key=lambda x: sum(x[1]) / len(x[1]),
-                reverse=True,
-            )
-            for cat, imps in sorted_cats:
-                avg = sum(imps) / len(imps)
-                n = len(imps)
-                lines.append(f"- {cat}: avg imp {avg:.0f} (n={n})")
+    # 直近14日間のパフォーマンスデータ（engagement_rollup から O(グループ数) で引く）
+    window = dict(
+        since=(now - timedelta(days=14)).date().isoformat(),
+        exclude_tweet_types=("reply",),
+        exclude_categories=("リプライ", "未分類"),
+    )
+    hour_rows = _load_rollup(group_by=("hour",), **window)
+    cat_rows = _load_rollup(group_by=("hookCategory",), **window)
+
+    if hour_rows:
+        lines.append("")
+        lines.append("【時間帯別パフォーマンス（直近14日）】")
+        # imp平均でソート（降順）
+        for row in sorted(hour_rows, key=lambda r: r["avg_imp"], reverse=True):
+            hour, avg, n = row["hour"], row["avg_imp"], row["n"]
+            note = ""
+            if n <= 2:
+                note = "データ少"
+            elif avg >= 30:
+                note = "好調"
+            elif avg < 15:
+                note = "低調"
+            marker = " ← 現在" if hour == now.hour else ""
+            lines.append(f"- {hour:02d}時台: avg imp {avg:.0f} (n={n}{', ' + note if note else ''}){marker}")
+
+    # カテゴリ別パフォーマンス
+    if cat_rows:
+        lines.append("")
+        lines.append("【カテゴリ別パフォーマンス（直近14日）】")
+        for row in sorted(cat_rows, key=lambda r: r["avg_imp"], reverse=True):
+            lines.append(f"- {row['hookCategory']}: avg imp {row['avg_imp']:.0f} (n={row['n']})")
 
     return "\n".join(lines)
 
@@ -684,27 +690,20 @@ def build_prompt(
 
 
 def generate_tweet(prompt: str) -> dict | None:
-    t0 = time.monotonic()
     try:
-        result = subprocess.run(
-            ["/home/sekiz/.nvm/versions/node/v24.13.0/bin/claude", "-p", prompt],
-            capture_output=True,
-            text=True,
-            timeout=60,
-        )
-    except subprocess.TimeoutExpired:
-        latency = time.monotonic() - t0
-        log(f"ERROR: claude -p タイムアウト (latency={latency:.1f}s)")
-        return None
+        response = get_gateway("claude").complete(prompt, timeout=60)
     except FileNotFoundError:
         log("ERROR: claude コマンドが見つからない")
         return None
 
-    latency = time.monotonic() - t0
-    output = result.stdout.strip()
-    if result.returncode != 0:
-        log(f"ERROR: claude -p 失敗 (exit={result.returncode}, latency={latency:.1f}s): {result.stderr.strip()}")
+    latency = response.latency
+    if response.timed_out:
+        log(f"ERROR: claude -p タイムアウト (latency={latency:.1f}s)")
+        return None
+    if not response.ok:
+        log(f"ERROR: claude -p 失敗 ({response.error}, latency={latency:.1f}s)")
         return None
+    output = response.text
 
     # JSON部分を抽出（フラットなオブジェクトのみ対応）
     match = re.search(r'\{[^{}]*\}', output, re.DOTALL)
@@ -806,7 +805,8 @@ def main() -> None:
             log("=== auto_post 完了（skip） ===")
             return
 
-        # 2. コンテキスト構築
+        # 2. コンテキスト構築（その間に claude の待機プロセスを起動しておく）
+        prewarm("claude")
         if not PERSONA_FILE.exists():
             log(f"ERROR: PERSONA.md が見つからない: {PERSONA_FILE}")
             sys.exit(1)
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Pre-flight X API budget governor.
+Predicts each call's cost from cost_logger.UNIT_PRICES and the requested unit
+count, and refuses, downscales or defers calls that would push the day's or
+month's spend over budget. Running totals are seeded from the month's daily
+cost-log summaries and kept current through cost_logger's usage hook.
+
+Budgets are opt-in: with X_API_DAILY_BUDGET_USD / X_API_MONTHLY_BUDGET_USD unset
+nothing is limited. Reads stop X_API_CREATE_RESERVE_USD short of each budget so
+that posting (content_create, reserved with essential=True) is not starved by
+searches and timeline reads.
+"""
+
+import math
+import os
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime, time as dt_time, timedelta
+from typing import Iterator, Optional
+
+import cost_logger
+from cost_logger import UNIT_PRICES
+
+DAILY_BUDGET_ENV = "X_API_DAILY_BUDGET_USD"
+MONTHLY_BUDGET_ENV = "X_API_MONTHLY_BUDGET_USD"
+CREATE_RESERVE_ENV = "X_API_CREATE_RESERVE_USD"
+# 未設定なら上限なし（.env.example に推奨値）
+DEFAULT_DAILY_BUDGET_USD: Optional[float] = None
+DEFAULT_MONTHLY_BUDGET_USD: Optional[float] = None
+# 投稿用に読み取り系が使わずに残しておく額（content_create 50件分）
+DEFAULT_CREATE_RESERVE_USD = 0.5
+
+
+def unit_cost(*usage_types: str) -> float:
+    """1件あたりの見積単価（検索なら post_read + user_read のように合算する）"""
+    return sum(UNIT_PRICES.get(t, 0.0) for t in usage_types)
+
+
+def _budget_from_env(name: str, default: Optional[float]) -> Optional[float]:
+    """未設定なら default、0 以下なら上限なし（None）"""
+    raw = os.getenv(name, "").strip()
+    if not raw:
+        return default
+    try:
+        value = float(raw)
+    except ValueError:
+        return default
+    return value if value > 0 else None
+
+
+class BudgetExceeded(RuntimeError):
+    def __init__(self, endpoint: str, scope: str, predicted_usd: float, remaining_usd: float, retry_at: datetime):
+        label = "日次" if scope == "daily" else "月次"
+        super().__init__(
+            f"{endpoint}: {label}予算超過（見積 ${predicted_usd:.3f} / 残り ${remaining_usd:.3f}）"
+            f" → {retry_at:%Y-%m-%d %H:%M} 以降に再実行"
+        )
+        self.endpoint = endpoint
+        self.scope = scope
+        self.predicted_usd = predicted_usd
+        self.remaining_usd = remaining_usd
+        self.retry_at = retry_at
+
+
+class BudgetGuard:
+    """日次・月次の X API 予算を呼び出し前に確認する（スレッド・asyncio 両対応）"""
+
+    def __init__(
+        self,
+        daily_usd: Optional[float] = DEFAULT_DAILY_BUDGET_USD,
+        monthly_usd: Optional[float] = DEFAULT_MONTHLY_BUDGET_USD,
+        *,
+        create_reserve_usd: float = DEFAULT_CREATE_RESERVE_USD,
+        register: bool = True,
+    ):
+        self.daily_usd = daily_usd
+        self.monthly_usd = monthly_usd
+        self.create_reserve_usd = max(create_reserve_usd, 0.0)
+        self._by_date: dict[str, float] = {}
+        self._seeded_month: Optional[str] = None
+        self._pending = 0.0
+        self._lock = threading.Lock()
+        if register:
+            cost_logger.add_usage_hook(self.record)
+
+    @classmethod
+    def from_env(cls, **kwargs) -> "BudgetGuard":
+        kwargs.setdefault(
+            "create_reserve_usd", _budget_from_env(CREATE_RESERVE_ENV, DEFAULT_CREATE_RESERVE_USD) or 0.0
+        )
+        return cls(
+            _budget_from_env(DAILY_BUDGET_ENV, DEFAULT_DAILY_BUDGET_USD),
+            _budget_from_env(MONTHLY_BUDGET_ENV, DEFAULT_MONTHLY_BUDGET_USD),
+            **kwargs,
+        )
+
+    # ---- running totals ----
+    def _seed(self, today: date) -> None:
+        """今月1日〜今日の日別累計を作り直す（月が変わった時と初回だけ）。
+        締め済みの日は summary sidecar だけを読み、今日はその日のパーティションを読む"""
+        by_date: dict[str, float] = {}
+        day = today.replace(day=1)
+        while day <= today:
+            try:
+                spent = float(cost_logger.load_day_summary(day.isoformat()).get("estimated_total_usd", 0.0) or 0.0)
+            except OSError:
+                spent = 0.0
+            if spent:
+                by_date[day.isoformat()] = spent
+            day += timedelta(days=1)
+        self._by_date = by_date
+        self._seeded_month = today.strftime("%Y-%m")
+
+    def _ensure_seeded(self, today: date) -> None:
+        if self._seeded_month != today.strftime("%Y-%m"):
+            self._seed(today)
+
+    def record(self, record: dict) -> None:
+        """cost_logger の usage hook。記録された実コストを累計に足す"""
+        day = str(record.get("date", ""))
+        with self._lock:
+            # 未読み込みの月はあとで _seed がログから拾うので、ここで足すと二重になる
+            if self._seeded_month is None or not day.startswith(self._seeded_month):
+                return
+            self._by_date[day] = self._by_date.get(day, 0.0) + float(record.get("estimated_cost_usd", 0.0) or 0.0)
+
+    def spent(self, today: Optional[date] = None) -> tuple[float, float]:
+        """(今日の累計, 今月の累計) USD"""
+        today = today or date.today()
+        with self._lock:
+            self._ensure_seeded(today)
+            return self._by_date.get(today.isoformat(), 0.0), sum(self._by_date.values())
+
+    def _remaining(self, today: date, essential: bool = True) -> tuple[float, str]:
+        """(残り予算, 効いている方の scope)。essential=False なら投稿用の取り置きを除く。
+        呼び出し側でロックを取る"""
+        self._ensure_seeded(today)
+        day_spent = self._by_date.get(today.isoformat(), 0.0) + self._pending
+        month_spent = sum(self._by_date.values()) + self._pending
+        held = 0.0 if essential else self.create_reserve_usd
+        daily = self.daily_usd - held - day_spent if self.daily_usd is not None else math.inf
+        monthly = self.monthly_usd - held - month_spent if self.monthly_usd is not None else math.inf
+        return (daily, "daily") if daily <= monthly else (monthly, "monthly")
+
+    def remaining_usd(self, today: Optional[date] = None, *, essential: bool = True) -> float:
+        """残り予算 USD。essential=False なら reserve(essential=False) と同じく投稿用の取り置きを除く"""
+        with self._lock:
+            return max(self._remaining(today or date.today(), essential)[0], 0.0)
+
+    # ---- pre-flight ----
+    @contextmanager
+    def reserve(
+        self,
+        endpoint: str,
+        units: int,
+        *,
+        unit_usd: float,
+        min_units: Optional[int] = None,
+        today: Optional[date] = None,
+        essential: bool = False,
+    ) -> Iterator[int]:
+        """units 件（1件 unit_usd）の呼び出しを予約し、実際に使ってよい件数を返す。
+
+        予算が足りなければ min_units まで件数を縮める（min_units=None なら縮めない）。
+        それでも足りなければ BudgetExceeded を送出し、呼び出しは次の日（月）まで延期となる。
+        予約分は with を抜けるまで残りから差し引くので、並列の呼び出しでも超過しない。
+        essential=True（投稿）だけが create_reserve_usd の取り置きまで使える。
+        """
+        today = today or date.today()
+        with self._lock:
+            remaining, scope = self._remaining(today, essential)
+            allowed = units
+            if units * unit_usd > remaining + 1e-9:
+                affordable = math.floor(remaining / unit_usd + 1e-9) if unit_usd > 0 else units
+                floor_units = units if min_units is None else min_units
+                if affordable < floor_units:
+                    raise BudgetExceeded(endpoint, scope, units * unit_usd, max(remaining, 0.0), _retry_at(scope, today))
+                allowed = min(affordable, units)
+            reserved = allowed * unit_usd
+            self._pending += reserved
+        if allowed < units:
+            print(f"[budget] {endpoint}: {units}件 → {allowed}件に縮小（残り ${remaining:.3f}）")
+        try:
+            yield allowed
+        finally:
+            with self._lock:
+                self._pending -= reserved
+
+
+def _retry_at(scope: str, today: date) -> datetime:
+    if scope == "daily":
+        return datetime.combine(today + timedelta(days=1), dt_time.min)
+    first_of_next = (today.replace(day=1) + timedelta(days=32)).replace(day=1)
+    return datetime.combine(first_of_next, dt_time.min)
@@ -4,20 +4,29 @@
 hook_performance.json の未取得エントリに対してX APIでエンゲージメントを一括取得し診断する。
 """
 
-import os
 import sys
 import json
 import re
 import argparse
-import subprocess
-import shutil
 from pathlib import Path
-from datetime import datetime, timezone, timedelta
+from datetime import datetime, timedelta, timezone
 from typing import Optional
-from x_api_client import XApiClient
+from x_api_client import BUDGET_GUARD, UNAVAILABLE_ERRORS, XApiClient
+from perf_store import PerfStore, PostIndex
+from group_stats import by_avg_imp, group_posts
+from refresh_planner import plan_refresh
+from metric_series import JST, now_jst_str, parse_jst
+
+try:
+    from hook_classifier import LOCAL_SOURCE, MODEL_DIR, HookClassifier
+except ImportError:
+    # numpy が無い環境では従来どおり LLM だけで分類する
+    HookClassifier = None
 
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 from notifications.discord_notifier import DiscordNotifier
+from llm.llm_cache import get_cache, template_id
+from llm.llm_gateway import backend_name, get_gateway
 
 try:
     import tweepy
@@ -34,6 +43,18 @@ except ImportError:
 
 SCRIPT_DIR = Path(__file__).parent
 HOOK_PERF_FILE = SCRIPT_DIR.parent / "hook_performance.json"
+HOOK_PERF_DB = SCRIPT_DIR.parent / "hook_performance.db"
+# 初回 --sync で遡る日数（全履歴を読むと post_read の課金がかさむ）
+FIRST_SYNC_DAYS = 30
+
+_store: Optional[PerfStore] = None
+
+
+def _get_store() -> PerfStore:
+    global _store
+    if _store is None:
+        _store = PerfStore(HOOK_PERF_DB, HOOK_PERF_FILE)
+    return _store
 
 
 def diagnose(likes: int, retweets: int, impressions: int = 0) -> str:
@@ -56,15 +77,12 @@ def diagnose(likes: int, retweets: int, impressions: int = 0) -> str:
 
 
 def load_perf_data() -> dict:
-    if not HOOK_PERF_FILE.exists():
-        return {"version": "1.0", "posts": []}
-    with open(HOOK_PERF_FILE, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    return _get_store().load()
 
 
 def save_perf_data(data: dict) -> None:
-    with open(HOOK_PERF_FILE, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    """変更のあった投稿だけを書き戻す"""
+    _get_store().save(data)
 
 
 def get_pending_posts(data: dict, threshold_hours: int) -> list:
@@ -77,12 +95,9 @@ def get_pending_posts(data: dict, threshold_hours: int) -> list:
         posted_at_str = post.get("postedAt")
         if not posted_at_str:
             continue
-        # タイムゾーン情報がある場合とない場合を両対応
-        try:
-            posted_at = datetime.fromisoformat(posted_at_str)
-            if posted_at.tzinfo is None:
-                posted_at = posted_at.replace(tzinfo=timezone(timedelta(hours=9)))  # JST
-        except ValueError:
+        # タイムゾーン情報がある場合とない場合を両対応（なしは JST）
+        posted_at = parse_jst(posted_at_str)
+        if posted_at is None:
             continue
         elapsed_hours = (now - posted_at).total_seconds() / 3600
         if elapsed_hours >= threshold_hours:
@@ -90,10 +105,12 @@ def get_pending_posts(data: dict, threshold_hours: int) -> list:
     return pending
 
 
-def fetch_engagement(api_client: XApiClient, posts: list) -> list:
+def fetch_engagement(api_client: XApiClient, posts: list, index: Optional[PostIndex] = None) -> list:
     """バッチでエンゲージメントを取得して posts を更新して返す"""
+    if index is None:
+        index = PostIndex({"posts": posts})
     tweet_ids = [p["tweet_id"] for p in posts]
-    now_str = datetime.now().astimezone().strftime('%Y-%m-%dT%H:%M:%S')
+    now_str = now_jst_str()
 
     # 最大100件ずつバッチ処理
     updated = []
@@ -103,7 +120,7 @@ def fetch_engagement(api_client: XApiClient, posts: list) -> list:
 
         try:
             response = api_client.get_tweets_public_metrics(batch_ids)
-        except tweepy.TweepyException as e:
+        except (tweepy.TweepyException, *UNAVAILABLE_ERRORS) as e:
             print(f"[ERROR] API呼び出し失敗: {e}")
             updated.extend(batch_posts)
             continue
@@ -116,36 +133,42 @@ def fetch_engagement(api_client: XApiClient, posts: list) -> list:
         # tweet_id → data のマップを作成
         tweet_map = {str(t.id): t for t in response.data}
 
+        records = []
         for post in batch_posts:
             tid = post["tweet_id"]
             tweet = tweet_map.get(tid)
             if not tweet:
                 print(f"[WARN] tweet_id={tid} が見つからない")
-                updated.append(post)
                 continue
 
             pub = tweet.public_metrics or {}
-
-            post["likes"] = pub.get("like_count")
-            post["retweets"] = pub.get("retweet_count")
-            post["replies"] = pub.get("reply_count")
-            post["quotes"] = pub.get("quote_count")
-            post["bookmarks"] = pub.get("bookmark_count")
-            post["impressions"] = None  # Free プランでは取得不可
-            post["url_link_clicks"] = None
-            post["user_profile_clicks"] = None
-            post["engagementFetchedAt"] = now_str
-
-            likes = post["likes"] or 0
-            retweets = post["retweets"] or 0
-            post["diagnosis"] = diagnose(likes, retweets, impressions=0)
-
+            likes = pub.get("like_count")
+            retweets = pub.get("retweet_count")
+            record = {
+                "tweet_id": tid,
+                "likes": likes,
+                "retweets": retweets,
+                "replies": pub.get("reply_count"),
+                "quotes": pub.get("quote_count"),
+                "bookmarks": pub.get("bookmark_count"),
+                "engagementFetchedAt": now_str,
+                "diagnosis": diagnose(likes or 0, retweets or 0, impressions=post.get("impressions") or 0),
+            }
+            # Free プランでは取得不可。sync で取得済みの値は再取得時に消さない
+            for key in ("impressions", "url_link_clicks", "user_profile_clicks"):
+                if post.get(key) is None:
+                    record[key] = None
+            records.append(record)
+
+        index.upsert_many(records)
+        for record in records:
+            post = index.get(record["tweet_id"])
             print(
                 f"[取得] {post['hookCategory']} | "
                 f"likes={post['likes']} RT={post['retweets']} "
                 f"imp={post['impressions']} → {post['diagnosis']}"
             )
-            updated.append(post)
+        updated.extend(batch_posts)
 
     return updated
 
@@ -161,109 +184,139 @@ def get_or_fetch_user_id(data: dict, api_client: XApiClient) -> str:
     return user_id
 
 
-def sync_timeline(api_client: XApiClient, data: dict) -> int:
-    """タイムラインを取得して hook_performance.json に upsert。返り値は追加+更新件数。"""
+def sync_timeline(
+    api_client: XApiClient,
+    data: dict,
+    index: Optional[PostIndex] = None,
+    first_sync_days: int = FIRST_SYNC_DAYS,
+) -> int:
+    """タイムラインを since_id まで全ページ取得して hook_performance に upsert。返り値は追加+更新件数。
+
+    ページごとに upsert して再開用の token を data["sync_checkpoint"] に保存する。
+    last_since_id は全ページを取り終えた時だけ進め、sync_checkpoint は消す。
+    初回（last_since_id なし）は first_sync_days 日前以降だけを取得する（0 以下なら全履歴）。
+    """
     user_id = get_or_fetch_user_id(data, api_client)
     since_id = data.get("last_since_id")
 
-    tweets = api_client.get_user_tweets(user_id, max_results=100, since_id=since_id)
-    if not tweets:
+    checkpoint = data.get("sync_checkpoint") or {}
+    if checkpoint.get("since_id") == since_id and checkpoint.get("pagination_token"):
+        token = checkpoint["pagination_token"]
+        max_id: Optional[str] = checkpoint.get("max_id") or since_id
+        pages = checkpoint.get("pages", 0)
+        start_time = checkpoint.get("start_time")
+        print(f"[sync] 前回の中断地点から再開（{pages}ページ取得済み）")
+    else:
+        token = None
+        max_id = since_id
+        pages = 0
+        start_time = None
+        if since_id is None and first_sync_days > 0:
+            start = datetime.now(timezone.utc) - timedelta(days=first_sync_days)
+            start_time = start.strftime("%Y-%m-%dT%H:%M:%SZ")
+            print(f"[sync] 初回: 直近{first_sync_days}日分を取得（start_time={start_time}）")
+
+    if index is None:
+        index = PostIndex(data)
+    now_str = now_jst_str()
+    added = updated = 0
+
+    for tweets, next_token in api_client.iter_user_tweets(
+        user_id, since_id=since_id, pagination_token=token, start_time=start_time
+    ):
+        records = []
+        for tweet in tweets:
+            tid = str(tweet.id)
+            if max_id is None or int(tid) > int(max_id):
+                max_id = tid
+            records.append(_timeline_record(tweet, tid not in index, now_str))
+        page_added, page_updated = index.upsert_many(records)
+        added += page_added
+        updated += page_updated
+        pages += 1
+
+        if next_token:
+            # 中断してもこのページまでの upsert と再開位置が残るように保存する
+            data["sync_checkpoint"] = {
+                "since_id": since_id,
+                "pagination_token": next_token,
+                "max_id": max_id,
+                "pages": pages,
+                "start_time": start_time,
+            }
+            save_perf_data(data)
+
+    data.pop("sync_checkpoint", None)
+    data["last_since_id"] = max_id
+    if not added and not updated:
         print(f"[sync] 新規ツイートなし（since_id={since_id}）")
         return 0
 
-    existing_ids = {p["tweet_id"] for p in data["posts"]}
-    now_str = datetime.now().astimezone().strftime('%Y-%m-%dT%H:%M:%S')
-    max_id: Optional[str] = since_id
-    added = 0
-    updated = 0
-
-    for tweet in tweets:
-        tid = str(tweet.id)
-        is_new = tid not in existing_ids
-
-        if max_id is None or int(tid) > int(max_id):
-            max_id = tid
-
-        pub = tweet.public_metrics or {}
-        non_pub = tweet.non_public_metrics or {}
-        ref_types = {r["type"] for r in (tweet.referenced_tweets or [])}
-        if tweet.in_reply_to_user_id is not None:
-            tweet_type = "reply"
-        elif "quoted" in ref_types:
-            tweet_type = "quote"
-        else:
-            tweet_type = "post"
-        likes = pub.get("like_count")
-        retweets = pub.get("retweet_count")
-        impressions = (non_pub.get("impression_count") or 0)
-        diagnosis = diagnose(likes or 0, retweets or 0, impressions=impressions)
+    print(f"[sync] 完了: 新規{added}件 / 更新{updated}件 / {pages}ページ / last_since_id={max_id}")
+    return added + updated
+
 
+def _timeline_record(tweet, is_new: bool, now_str: str) -> dict:
+    """タイムラインのツイート1件を upsert 用レコードにする"""
+    tid = str(tweet.id)
+    pub = tweet.public_metrics or {}
+    non_pub = tweet.non_public_metrics or {}
+    ref_types = {r["type"] for r in (tweet.referenced_tweets or [])}
+    if tweet.in_reply_to_user_id is not None:
+        tweet_type = "reply"
+    elif "quoted" in ref_types:
+        tweet_type = "quote"
+    else:
+        tweet_type = "post"
+    likes = pub.get("like_count")
+    retweets = pub.get("retweet_count")
+    impressions = (non_pub.get("impression_count") or 0)
+    diagnosis = diagnose(likes or 0, retweets or 0, impressions=impressions)
+
+    metrics = {
+        "tweet_id": tid,
+        "likes": likes,
+        "retweets": retweets,
+        "replies": pub.get("reply_count"),
+        "quotes": pub.get("quote_count"),
+        "bookmarks": pub.get("bookmark_count"),
+        "impressions": non_pub.get("impression_count"),
+        "engagements": non_pub.get("engagements"),
+        "url_link_clicks": non_pub.get("url_link_clicks"),
+        "user_profile_clicks": non_pub.get("user_profile_clicks"),
+        "diagnosis": diagnosis,
+    }
+
+    if is_new:
         if tweet.created_at:
-            posted_at = tweet.created_at.astimezone(
-                timezone(timedelta(hours=9))
-            ).strftime('%Y-%m-%dT%H:%M:%S')
+            posted_at = tweet.created_at.astimezone(JST).strftime('%Y-%m-%dT%H:%M:%S')
         else:
             posted_at = now_str
-
-        if is_new:
-            hook_category = "リプライ" if tweet_type == "reply" else "未分類"
-            data["posts"].append({
-                "tweet_id": tid,
-                "text": tweet.text,
-                "hookCategory": hook_category,
-                "tweet_type": tweet_type,
-                "postedAt": posted_at,
-                "engagementFetchedAt": now_str,
-                "likes": likes,
-                "retweets": retweets,
-                "replies": pub.get("reply_count"),
-                "quotes": pub.get("quote_count"),
-                "bookmarks": pub.get("bookmark_count"),
-                "impressions": non_pub.get("impression_count"),
-                "engagements": non_pub.get("engagements"),
-                "url_link_clicks": non_pub.get("url_link_clicks"),
-                "user_profile_clicks": non_pub.get("user_profile_clicks"),
-                "diagnosis": diagnosis,
-            })
-            existing_ids.add(tid)
-            added += 1
-        else:
-            for post in data["posts"]:
-                if post["tweet_id"] == tid:
-                    post["likes"] = likes
-                    post["retweets"] = retweets
-                    post["replies"] = pub.get("reply_count")
-                    post["quotes"] = pub.get("quote_count")
-                    post["bookmarks"] = pub.get("bookmark_count")
-                    post["impressions"] = non_pub.get("impression_count")
-                    post["engagements"] = non_pub.get("engagements")
-                    post["url_link_clicks"] = non_pub.get("url_link_clicks")
-                    post["user_profile_clicks"] = non_pub.get("user_profile_clicks")
-                    post["tweet_type"] = tweet_type
-                    post["engagementFetchedAt"] = now_str
-                    post["diagnosis"] = diagnosis
-                    break
-            updated += 1
-
-        imp = non_pub.get("impression_count")
-        label = "新規" if is_new else "更新"
-        print(
-            f"[sync] {label} {tweet_type} | "
-            f"likes={likes} RT={retweets} imp={imp} | "
-            f"{tweet.text[:30]}..."
-        )
-
-    data["last_since_id"] = max_id
-    print(f"[sync] 完了: 新規{added}件 / 更新{updated}件 / last_since_id={max_id}")
-    return added + updated
+        record = {
+            "tweet_id": tid,
+            "text": tweet.text,
+            "hookCategory": "リプライ" if tweet_type == "reply" else "未分類",
+            "tweet_type": tweet_type,
+            "postedAt": posted_at,
+            "engagementFetchedAt": now_str,
+            **metrics,
+        }
+    else:
+        record = {**metrics, "tweet_type": tweet_type, "engagementFetchedAt": now_str}
+
+    imp = non_pub.get("impression_count")
+    label = "新規" if is_new else "更新"
+    print(
+        f"[sync] {label} {tweet_type} | "
+        f"likes={likes} RT={retweets} imp={imp} | "
+        f"{tweet.text[:30]}..."
+    )
+    return record
 
 
 VALID_HOOK_CATEGORIES = ["猫写真", "鋭い一言", "日常観察", "脱力系", "時事ネタ", "たまに有益", "猫Meme", "猫vs人間", "シュール猫"]
 
-CATEGORIZE_SYSTEM_PROMPT = """あなたはホッケ（茶トラ猫AIアカウント）の投稿分析アシスタントです。
-与えられた投稿テキストを以下のカテゴリのどれか1つに分類してください。
-
-カテゴリ一覧:
+CATEGORY_DESCRIPTIONS = """カテゴリ一覧:
 - 猫写真: 画像付き、猫の様子を見せる投稿（リアル猫写真）
 - 鋭い一言: 人間vs猫の哲学的観察、社会への皮肉・気づき
 - 日常観察: 飼い主や日常の出来事を淡々と描写
@@ -272,91 +325,223 @@ CATEGORIZE_SYSTEM_PROMPT = """あなたはホッケ（茶トラ猫AIアカウン
 - たまに有益: 実用的・有益な情報を含む
 - 猫Meme: 共感・あるある系のMeme画像付き投稿
 - 猫vs人間: 猫と人間の生活を対比する画像付き投稿
-- シュール猫: 猫が人間の行動をしているシュール画像付き投稿
+- シュール猫: 猫が人間の行動をしているシュール画像付き投稿"""
+
+CATEGORIZE_SYSTEM_PROMPT = f"""あなたはホッケ（茶トラ猫AIアカウント）の投稿分析アシスタントです。
+与えられた投稿テキストを以下のカテゴリのどれか1つに分類してください。
+
+{CATEGORY_DESCRIPTIONS}
 
 カテゴリ名のみを1単語で返してください。余計な説明は不要です。"""
 
+CATEGORIZE_BATCH_SYSTEM_PROMPT = f"""あなたはホッケ（茶トラ猫AIアカウント）の投稿分析アシスタントです。
+番号付きの投稿それぞれを以下のカテゴリのどれか1つに分類してください。
+
+{CATEGORY_DESCRIPTIONS}
+
+投稿と同じ順番・同じ件数のカテゴリ名を JSON 配列だけで返してください（例: ["脱力系", "猫写真"]）。
+余計な説明は不要です。"""
+
+# 1回のプロンプトにまとめる投稿数の上限と、投稿本文の合計文字数の上限
+CATEGORIZE_BATCH_SIZE = 20
+CATEGORIZE_BATCH_MAX_CHARS = 4000
+# 1件あたりの追加タイムアウト（基本30秒に加算、上限120秒）
+CATEGORIZE_TIMEOUT_PER_ITEM = 3
+# LLM キャッシュのキー（単発・バッチのどちらで分類しても同じ答えとして共有する）と保持期間
+CATEGORIZE_CACHE_TEMPLATE = template_id("engagement.category", CATEGORY_DESCRIPTIONS, *VALID_HOOK_CATEGORIES)
+CATEGORIZE_CACHE_TTL = 90 * 24 * 3600
+
 
 def _call_claude(prompt: str, timeout: int = 30) -> Optional[str]:
-    claude_cmd = shutil.which("claude")
-    if not claude_cmd:
-        fallback = "/home/sekiz/.nvm/versions/node/v24.13.0/bin/claude"
-        if Path(fallback).exists():
-            claude_cmd = fallback
-        else:
-            return None
-    # CLAUDECODE を除いた環境変数（ネスト起動ブロックを回避）
-    env = {k: v for k, v in os.environ.items() if k != "CLAUDECODE"}
     try:
-        result = subprocess.run(
-            [claude_cmd, "-p", prompt],
-            capture_output=True,
-            text=True,
-            timeout=timeout,
-            env=env,
-        )
-        if result.returncode == 0:
-            return result.stdout.strip()
-        return None
-    except (subprocess.TimeoutExpired, FileNotFoundError):
+        response = get_gateway("claude").complete(prompt, timeout=timeout)
+    except FileNotFoundError:
         return None
+    return response.text if response.ok else None
 
 
-def categorize_unknown_posts(data: dict) -> int:
-    """hookCategory='未分類' の投稿を Claude で自動分類する。返り値は更新件数。"""
-    unknown = [p for p in data["posts"] if p.get("hookCategory") == "未分類"]
-    if not unknown:
-        return 0
+def _normalize_category(raw: str) -> Optional[str]:
+    """LLM の返したカテゴリ名を正規化する（余分な文字除去・部分一致で救済）"""
+    category = str(raw).strip().strip("「」'\"")
+    if category in VALID_HOOK_CATEGORIES:
+        return category
+    return next((c for c in VALID_HOOK_CATEGORIES if c in category), None)
 
-    print(f"[categorize] 未分類: {len(unknown)}件 → Claude で分類します", flush=True)
-    updated = 0
 
-    for post in unknown:
-        prompt = f"""{CATEGORIZE_SYSTEM_PROMPT}
+def _categorize_one(post: dict) -> Optional[str]:
+    prompt = f"""{CATEGORIZE_SYSTEM_PROMPT}
 
 投稿テキスト:
 {post['text']}"""
 
-        result = _call_claude(prompt)
-        if not result:
-            print(f"  [SKIP] Claude 応答なし: {post['text'][:30]}...", flush=True)
-            continue
+    result = _call_claude(prompt)
+    if not result:
+        print(f"  [SKIP] Claude 応答なし: {post['text'][:30]}...", flush=True)
+        return None
+    category = _normalize_category(result)
+    if not category:
+        print(f"  [SKIP] 不明カテゴリ '{result.strip()}': {post['text'][:30]}...", flush=True)
+    return category
+
+
+def _categorize_batch(posts: list[dict]) -> list[Optional[str]]:
+    """posts を1回のプロンプトで分類する。分類できなかった投稿は None"""
+    items = "\n\n".join(f"[{i}] {p['text']}" for i, p in enumerate(posts, 1))
+    prompt = f"""{CATEGORIZE_BATCH_SYSTEM_PROMPT}
+
+投稿（{len(posts)}件）:
+{items}"""
 
-        # カテゴリ名を正規化（余分な文字除去）
-        category = result.strip().strip("「」'\"")
+    timeout = min(30 + CATEGORIZE_TIMEOUT_PER_ITEM * len(posts), 120)
+    result = _call_claude(prompt, timeout=timeout)
+    if not result:
+        return [None] * len(posts)
+    match = re.search(r'\[.*\]', result, re.DOTALL)
+    try:
+        parsed = json.loads(match.group()) if match else None
+    except json.JSONDecodeError:
+        parsed = None
+    if not isinstance(parsed, list) or len(parsed) != len(posts):
+        print(f"  [batch] 応答の形が不正（{len(posts)}件分の JSON 配列ではない）", flush=True)
+        return [None] * len(posts)
+    return [_normalize_category(c) if isinstance(c, str) else None for c in parsed]
+
+
+def _categorize_cached(posts: list[dict]) -> list[dict]:
+    """以前 Claude が分類した本文はキャッシュの分類を使い、残りを返す"""
+    cache = get_cache()
+    model = backend_name("claude")
+    remaining = []
+    for post in posts:
+        category = cache.get(CATEGORIZE_CACHE_TEMPLATE, model, post["text"])
         if category not in VALID_HOOK_CATEGORIES:
-            # 部分一致で救済
-            matched = next((c for c in VALID_HOOK_CATEGORIES if c in category), None)
-            if matched:
-                category = matched
-            else:
-                print(f"  [SKIP] 不明カテゴリ '{category}': {post['text'][:30]}...", flush=True)
-                continue
+            remaining.append(post)
+            continue
+        post["hookCategory"] = category
+        print(f"  [{category}] (cache) {post['text'][:50]}...", flush=True)
+    return remaining
+
+
+def _plan_batches(posts: list[dict], batch_size: int) -> list[list[dict]]:
+    """件数と本文の合計文字数の両方が上限に収まるように区切る"""
+    batches: list[list[dict]] = []
+    current: list[dict] = []
+    chars = 0
+    for post in posts:
+        length = len(post["text"])
+        if current and (len(current) >= batch_size or chars + length > CATEGORIZE_BATCH_MAX_CHARS):
+            batches.append(current)
+            current, chars = [], 0
+        current.append(post)
+        chars += length
+    if current:
+        batches.append(current)
+    return batches
+
+
+def update_classifiers(data: dict, classifiers: Optional[dict] = None) -> dict:
+    """ラベル付きの投稿でローカル分類器（通常投稿用・リプライ用）を差分学習して保存する"""
+    if HookClassifier is None:
+        return {}
+    if classifiers is None:
+        classifiers = {
+            "post": HookClassifier.load(MODEL_DIR / "post.npz", VALID_HOOK_CATEGORIES),
+            "reply": HookClassifier.load(MODEL_DIR / "reply.npz"),
+        }
+    added = {
+        "post": classifiers["post"].update(data["posts"]),
+        "reply": classifiers["reply"].update(
+            (p for p in data["posts"] if p.get("tweet_type") == "reply"), exclude=("リプライ", "未分類")
+        ),
+    }
+    for kind, classifier in classifiers.items():
+        if added[kind]:
+            classifier.save()
+    print(
+        f"[classifier] 学習 通常投稿 +{added['post']}件（計{classifiers['post'].n_docs}件）"
+        f" / リプライ +{added['reply']}件（計{classifiers['reply'].n_docs}件）",
+        flush=True,
+    )
+    return classifiers
 
+
+def _categorize_locally(posts: list[dict], classifier) -> list[dict]:
+    """確信度が MIN_CONFIDENCE 以上の投稿だけローカル分類器で分類し、残りを返す"""
+    remaining = []
+    for post in posts:
+        category, confidence = classifier.predict(post.get("text") or "")
+        if not category:
+            remaining.append(post)
+            continue
         post["hookCategory"] = category
-        print(f"  [{category}] {post['text'][:50]}...", flush=True)
-        updated += 1
+        post["categorySource"] = LOCAL_SOURCE
+        print(f"  [{category}] (local {confidence:.2f}) {post['text'][:50]}...", flush=True)
+    return remaining
+
+
+def categorize_unknown_posts(data: dict, batch_size: int = CATEGORIZE_BATCH_SIZE, classifier=None) -> int:
+    """hookCategory='未分類' の投稿を自動分類する。返り値は更新件数。
 
-    print(f"[categorize] 完了: {updated}/{len(unknown)}件 分類済み", flush=True)
+    classifier（HookClassifier）が学習済みなら先にローカルで分類し、確信度が低い投稿だけを Claude に回す。
+    以前 Claude が分類した本文（LLM キャッシュ）は呼び出さずにその分類を使う。
+    Claude には最大 batch_size 件ずつ1回のプロンプトで分類させ、分類できなかった投稿だけ1件ずつ呼び直す。
+    バッチ丸ごと失敗した（応答なし・形が不正）ときはバッチサイズを半分にしてやり直す。
+    """
+    unknown = [p for p in data["posts"] if p.get("hookCategory") == "未分類"]
+    if not unknown:
+        return 0
+
+    pending = list(unknown)
+    if classifier is not None and classifier.ready:
+        pending = _categorize_locally(pending, classifier)
+        print(f"[categorize] ローカル分類: {len(unknown) - len(pending)}/{len(unknown)}件", flush=True)
+    before_cache = len(pending)
+    pending = _categorize_cached(pending)
+    if len(pending) < before_cache:
+        print(f"[categorize] LLMキャッシュ: {before_cache - len(pending)}/{before_cache}件", flush=True)
+    updated = len(unknown) - len(pending)
+    calls = 0
+    cache = get_cache()
+    model = backend_name("claude")
+    if pending:
+        print(f"[categorize] 未分類: {len(pending)}件 → Claude で分類します（最大{batch_size}件/回）", flush=True)
+    while pending:
+        batch = _plan_batches(pending, batch_size)[0]
+        pending = pending[len(batch):]
+        calls += 1
+        if len(batch) == 1:
+            categories = [_categorize_one(batch[0])]
+        else:
+            categories = _categorize_batch(batch)
+            if not any(categories):
+                # プロンプトが長すぎた可能性があるので、小さくしてこのバッチからやり直す
+                batch_size = max(len(batch) // 2, 1)
+                print(f"[categorize] バッチ失敗 → 以降 {batch_size}件/回", flush=True)
+                pending = batch + pending
+                continue
+            for i, category in enumerate(categories):
+                if category is None:
+                    categories[i] = _categorize_one(batch[i])
+                    calls += 1
+
+        for post, category in zip(batch, categories):
+            if not category:
+                continue
+            cache.put(CATEGORIZE_CACHE_TEMPLATE, model, post["text"], category, ttl=CATEGORIZE_CACHE_TTL)
+            post["hookCategory"] = category
+            print(f"  [{category}] {post['text'][:50]}...", flush=True)
+            updated += 1
+
+    print(f"[categorize] 完了: {updated}/{len(unknown)}件 分類済み（Claude 呼び出し {calls}回）", flush=True)
     return updated
 
 
 def print_recommend(data: dict) -> None:
     """今日の投稿カテゴリ推薦を表示（APIコールなし）"""
-    from collections import defaultdict
-
     VALID_CATEGORIES = ["脱力系", "猫写真", "鋭い一言", "日常観察", "時事ネタ", "たまに有益", "猫Meme", "猫vs人間", "シュール猫", "未分類"]
 
-    # 診断済み投稿をカテゴリ別に分類（投稿日時順）
-    categories: dict = defaultdict(list)
-    for post in data["posts"]:
-        if post.get("diagnosis"):
-            cat = post.get("hookCategory", "未分類")
-            categories[cat].append(post)
-
-    # 各カテゴリを投稿日時の新しい順にソート
-    for cat in categories:
-        categories[cat].sort(key=lambda p: p.get("postedAt", ""), reverse=True)
+    # 診断済み投稿をカテゴリ別に集計（直近2件を保持）
+    categories = group_posts((p for p in data["posts"] if p.get("diagnosis")), recent_n=2)
 
     lines_priority = []
     lines_candidate = []
@@ -365,11 +550,12 @@ def print_recommend(data: dict) -> None:
 
     seen_cats = set(categories.keys())
 
-    for cat, posts in categories.items():
-        n = len(posts)
-        avg = sum((p.get("likes") or 0) + (p.get("retweets") or 0) for p in posts) / n
-        latest_diag = posts[0].get("diagnosis", "")
-        second_diag = posts[1].get("diagnosis", "") if n >= 2 else ""
+    for cat, stats in categories.items():
+        n = stats.n
+        avg = stats.avg_likes + stats.avg_rt
+        recent = stats.recent
+        latest_diag = recent[0].get("diagnosis", "")
+        second_diag = recent[1].get("diagnosis", "") if n >= 2 else ""
 
         if n >= 2 and latest_diag == "DROP" and second_diag == "DROP":
             lines_ng.append(f"NG:   {cat} [DROP x2] avg={avg:.0f} ({n}件) ← 今日は避ける")
@@ -407,38 +593,35 @@ def print_summary(data: dict) -> None:
         print("集計対象データなし（エンゲージメント取得済みの投稿がありません）")
         return
 
-    from collections import defaultdict
-    categories: dict = defaultdict(list)
-    for post in fetched:
-        categories[post.get("hookCategory", "未分類")].append(post)
+    categories = group_posts(fetched, recent_n=0, missing_diagnosis=None)
 
     print("\n=== カテゴリ別パフォーマンス集計 ===")
-    for cat, posts in sorted(categories.items()):
-        n = len(posts)
-        avg_likes = sum(p["likes"] or 0 for p in posts) / n
-        avg_rt = sum(p["retweets"] or 0 for p in posts) / n
-        avg_imp = sum(p["impressions"] or 0 for p in posts) / n
-
-        diagnosis_counts: dict = defaultdict(int)
-        for p in posts:
-            if p.get("diagnosis"):
-                diagnosis_counts[p["diagnosis"]] += 1
-
+    for cat, stats in sorted(categories.items()):
         diag_str = " / ".join(
-            f"{k}: {v}件" for k, v in sorted(diagnosis_counts.items())
+            f"{k}: {v}件" for k, v in sorted((k, v) for k, v in stats.diagnoses.items() if k)
         )
 
         print(
-            f"\n[{cat}] {n}件  "
-            f"平均いいね:{avg_likes:.1f} / 平均RT:{avg_rt:.1f} / 平均impressions:{avg_imp:.0f}"
+            f"\n[{cat}] {stats.n}件  "
+            f"平均いいね:{stats.avg_likes:.1f} / 平均RT:{stats.avg_rt:.1f} / 平均impressions:{stats.avg_imp:.0f}"
         )
         if diag_str:
             print(f"  {diag_str}")
 
 
+def _category_summary_lines(posts: list[dict]) -> list[str]:
+    """カテゴリ別の 平均imp/いいね・診断分布・直近3件 を平均imp降順で整形する"""
+    lines = []
+    for cat, stats in by_avg_imp(group_posts(posts)):
+        lines.append(f"【{cat}】{stats.n}件 平均imp={stats.avg_imp:.0f} 平均いいね={stats.avg_likes:.1f}")
+        lines.append(f"  診断: {dict(stats.diagnoses)}")
+        for p in stats.recent:
+            lines.append(f"  - imp={p.get('impressions')} likes={p.get('likes')} 「{p['text'][:40]}」")
+    return lines
+
+
 def build_quote_analysis_summary(data: dict) -> str:
     """hook_performance.json から引用ツイートのみをカテゴリ別に集計"""
-    from collections import defaultdict, Counter
     quotes = [p for p in data["posts"]
               if p.get("engagementFetchedAt")
               and p.get("tweet_type") == "quote"
@@ -446,22 +629,8 @@ def build_quote_analysis_summary(data: dict) -> str:
     if not quotes:
         return "引用ツイートデータなし"
 
-    categories: dict = defaultdict(list)
-    for post in quotes:
-        categories[post.get("hookCategory", "未分類")].append(post)
-
     lines = [f"分析対象: 引用ツイート {len(quotes)}件\n"]
-    for cat, posts in sorted(categories.items(),
-                              key=lambda x: -(sum(p.get("impressions") or 0 for p in x[1]) / len(x[1]))):
-        n = len(posts)
-        avg_imp = sum(p.get("impressions") or 0 for p in posts) / n
-        avg_likes = sum(p.get("likes") or 0 for p in posts) / n
-        diag = Counter(p.get("diagnosis", "DROP") for p in posts)
-        recent = sorted(posts, key=lambda p: p.get("postedAt", ""), reverse=True)[:3]
-        lines.append(f"【{cat}】{n}件 平均imp={avg_imp:.0f} 平均いいね={avg_likes:.1f}")
-        lines.append(f"  診断: {dict(diag)}")
-        for p in recent:
-            lines.append(f"  - imp={p.get('impressions')} likes={p.get('likes')} 「{p['text'][:40]}」")
+    lines += _category_summary_lines(quotes)
     return "\n".join(lines)
 
 
@@ -471,8 +640,9 @@ SESSION_LOG_FILE = SCRIPT_DIR.parent / "reply_system" / "browser_automation" / "
 REPLY_STRATEGY_FILE = SCRIPT_DIR.parent / "reply_system" / "reply_strategy.json"
 
 
-def migrate_replies(data: dict) -> int:
-    """hook_performance.json の hookCategory='リプライ' を reply_log.json のカテゴリで更新する"""
+def migrate_replies(data: dict, index: Optional[PostIndex] = None, classifier=None) -> int:
+    """hook_performance.json の hookCategory='リプライ' を reply_log.json のカテゴリで更新する。
+    reply_log に見つからないリプライは、classifier（HookClassifier）の確信度が高ければその分類を使う"""
     if not REPLY_LOG_FILE.exists():
         print("[migrate] reply_log.json が見つかりません")
         return 0
@@ -496,7 +666,7 @@ def migrate_replies(data: dict) -> int:
         except (json.JSONDecodeError, OSError):
             pass
 
-    updated = 0
+    records = []
     for post in data["posts"]:
         if post.get("hookCategory") != "リプライ":
             continue
@@ -512,44 +682,38 @@ def migrate_replies(data: dict) -> int:
                     category = cat
                     break
         if category:
-            post["hookCategory"] = category
-            post["tweet_type"] = "reply"
+            records.append({"tweet_id": post["tweet_id"], "hookCategory": category, "tweet_type": "reply"})
             print(f"  [migrate] {category}: {text[:40]}...")
-            updated += 1
-
+            continue
+        if classifier is not None:
+            category, confidence = classifier.predict(text)
+            if category:
+                records.append({
+                    "tweet_id": post["tweet_id"], "hookCategory": category,
+                    "tweet_type": "reply", "categorySource": LOCAL_SOURCE,
+                })
+                print(f"  [migrate] {category} (local {confidence:.2f}): {text[:40]}...")
+
+    if index is None:
+        index = PostIndex(data)
+    _, updated = index.upsert_many(records)
     print(f"[migrate] 完了: {updated}件のリプライカテゴリを更新")
     return updated
 
 
 def build_analysis_summary(data: dict) -> str:
     """hook_performance.json からテキスト形式の分析サマリーを生成する"""
-    from collections import defaultdict
     fetched = [p for p in data["posts"] if p.get("engagementFetchedAt") and p.get("tweet_type") not in ("reply", "quote") and p.get("hookCategory") != "リプライ"]
     if not fetched:
         return "データなし"
 
-    categories: dict = defaultdict(list)
-    for post in fetched:
-        categories[post.get("hookCategory", "未分類")].append(post)
-
     lines = [f"分析対象: 通常投稿 {len(fetched)}件（リプライ・引用除く）\n"]
-    for cat, posts in sorted(categories.items(), key=lambda x: -(sum(p.get("impressions") or 0 for p in x[1]) / len(x[1]))):
-        n = len(posts)
-        avg_imp = sum(p.get("impressions") or 0 for p in posts) / n
-        avg_likes = sum(p.get("likes") or 0 for p in posts) / n
-        from collections import Counter
-        diag = Counter(p.get("diagnosis", "DROP") for p in posts)
-        recent = sorted(posts, key=lambda p: p.get("postedAt", ""), reverse=True)[:3]
-        lines.append(f"【{cat}】{n}件 平均imp={avg_imp:.0f} 平均いいね={avg_likes:.1f}")
-        lines.append(f"  診断: {dict(diag)}")
-        for p in recent:
-            lines.append(f"  - imp={p.get('impressions')} likes={p.get('likes')} 「{p['text'][:40]}」")
+    lines += _category_summary_lines(fetched)
     return "\n".join(lines)
 
 
 def build_reply_analysis_summary(data: dict) -> str:
     """hook_performance.json からリプライのみをカテゴリ別に集計"""
-    from collections import defaultdict, Counter
     replies = [p for p in data["posts"]
                if p.get("engagementFetchedAt")
                and p.get("tweet_type") == "reply"
@@ -557,22 +721,8 @@ def build_reply_analysis_summary(data: dict) -> str:
     if not replies:
         return "リプライデータなし"
 
-    categories: dict = defaultdict(list)
-    for post in replies:
-        categories[post.get("hookCategory", "未分類")].append(post)
-
     lines = [f"分析対象: リプライ {len(replies)}件\n"]
-    for cat, posts in sorted(categories.items(),
-                              key=lambda x: -(sum(p.get("impressions") or 0 for p in x[1]) / len(x[1]))):
-        n = len(posts)
-        avg_imp = sum(p.get("impressions") or 0 for p in posts) / n
-        avg_likes = sum(p.get("likes") or 0 for p in posts) / n
-        diag = Counter(p.get("diagnosis", "DROP") for p in posts)
-        recent = sorted(posts, key=lambda p: p.get("postedAt", ""), reverse=True)[:3]
-        lines.append(f"【{cat}】{n}件 平均imp={avg_imp:.0f} 平均いいね={avg_likes:.1f}")
-        lines.append(f"  診断: {dict(diag)}")
-        for p in recent:
-            lines.append(f"  - imp={p.get('impressions')} likes={p.get('likes')} 「{p['text'][:40]}」")
+    lines += _category_summary_lines(replies)
     return "\n".join(lines)
 
 
@@ -633,6 +783,10 @@ def run_act_reply(data: dict) -> None:
     print(f"  指針: {strategy.get('guidance')}", flush=True)
 
 
+def _by_avg_imp(rows: list[dict]) -> list[dict]:
+    return sorted(rows, key=lambda r: -r["avg_imp"])
+
+
 def run_act(data: dict) -> None:
     """分析データを Claude に渡して戦略を生成し strategy.json に保存する"""
     summary = build_analysis_summary(data)
@@ -713,15 +867,12 @@ def run_act(data: dict) -> None:
             "",
             "**カテゴリ別インプレッション（通常投稿）**",
         ]
-        # カテゴリ集計を追加
-        from collections import defaultdict
-        posts = [p for p in data["posts"] if p.get("engagementFetchedAt") and p.get("tweet_type") not in ("reply", "quote") and p.get("hookCategory") not in ("リプライ", "未分類")]
-        cats: dict = defaultdict(list)
-        for p in posts:
-            cats[p["hookCategory"]].append(p)
-        for cat, ps in sorted(cats.items(), key=lambda x: -(sum(p.get("impressions") or 0 for p in x[1]) / len(x[1]))):
-            avg_imp = sum(p.get("impressions") or 0 for p in ps) / len(ps)
-            lines.append(f"- `{cat}`: 平均imp {avg_imp:.0f} ({len(ps)}件)")
+        # カテゴリ集計を追加（engagement_rollup から引く）
+        store = _get_store()
+        for row in _by_avg_imp(store.rollup(
+            exclude_tweet_types=("reply", "quote"), exclude_categories=("リプライ", "未分類"),
+        )):
+            lines.append(f"- `{row['hookCategory']}`: 平均imp {row['avg_imp']:.0f} ({row['n']}件)")
         lines += [
             "",
             "**📌 明日の投稿戦略**",
@@ -731,16 +882,11 @@ def run_act(data: dict) -> None:
             f"根拠: {reason}",
         ]
         # 引用ツイートセクション
-        quote_posts = [p for p in data["posts"] if p.get("engagementFetchedAt") and p.get("tweet_type") == "quote" and p.get("hookCategory") not in ("未分類",)]
-        if quote_posts:
-            quote_cats: dict = defaultdict(list)
-            for p in quote_posts:
-                quote_cats[p["hookCategory"]].append(p)
+        quote_rows = store.rollup(tweet_types=("quote",), exclude_categories=("未分類",))
+        if quote_rows:
             lines += ["", "**🔁 引用ツイート パフォーマンス**"]
-            for cat, ps in sorted(quote_cats.items(), key=lambda x: -(sum(p.get("impressions") or 0 for p in x[1]) / len(x[1]))):
-                avg_imp = sum(p.get("impressions") or 0 for p in ps) / len(ps)
-                avg_likes = sum(p.get("likes") or 0 for p in ps) / len(ps)
-                lines.append(f"- `{cat}`: 平均imp {avg_imp:.0f} / 平均いいね {avg_likes:.1f} ({len(ps)}件)")
+            for row in _by_avg_imp(quote_rows):
+                lines.append(f"- `{row['hookCategory']}`: 平均imp {row['avg_imp']:.0f} / 平均いいね {row['avg_likes']:.1f} ({row['n']}件)")
         # リプライ戦略もあれば追加
         if REPLY_STRATEGY_FILE.exists():
             try:
@@ -754,15 +900,11 @@ def run_act(data: dict) -> None:
                     "**💬 リプライ戦略**",
                 ]
                 # リプライのカテゴリ別インプレッション
-                reply_posts = [p for p in data["posts"] if p.get("engagementFetchedAt") and p.get("tweet_type") == "reply" and p.get("hookCategory") not in ("リプライ", "未分類")]
-                reply_cats: dict = defaultdict(list)
-                for p in reply_posts:
-                    reply_cats[p["hookCategory"]].append(p)
-                if reply_cats:
+                reply_rows = store.rollup(tweet_types=("reply",), exclude_categories=("リプライ", "未分類"))
+                if reply_rows:
                     lines.append("**カテゴリ別インプレッション（リプライ）**")
-                    for cat, ps in sorted(reply_cats.items(), key=lambda x: -(sum(p.get("impressions") or 0 for p in x[1]) / len(x[1]))):
-                        avg_imp = sum(p.get("impressions") or 0 for p in ps) / len(ps)
-                        lines.append(f"- `{cat}`: 平均imp {avg_imp:.0f} ({len(ps)}件)")
+                    for row in _by_avg_imp(reply_rows):
+                        lines.append(f"- `{row['hookCategory']}`: 平均imp {row['avg_imp']:.0f} ({row['n']}件)")
                     lines.append("")
                 lines += [
                     f"優先: `{r_preferred}`",
@@ -804,6 +946,14 @@ def main():
         '--sync', action='store_true',
         help='タイムラインを取得してエンゲージメントを一括sync（通常投稿+リプライ）'
     )
+    parser.add_argument(
+        '--first-sync-days', type=int, default=FIRST_SYNC_DAYS,
+        help=f'初回 --sync で遡る日数（デフォルト: {FIRST_SYNC_DAYS}、0で取得できる全履歴）'
+    )
+    parser.add_argument(
+        '--categorize-batch', type=int, default=CATEGORIZE_BATCH_SIZE,
+        help=f'--sync 後の未分類投稿を何件ずつ1回で分類するか（デフォルト: {CATEGORIZE_BATCH_SIZE}、1で1件ずつ）'
+    )
     parser.add_argument(
         '--act', action='store_true',
         help='エンゲージメントデータを分析してClaude が戦略を生成し strategy.json に保存'
@@ -812,12 +962,22 @@ def main():
         '--migrate-replies', action='store_true',
         help='hook_performance.json のリプライを reply_log.json のカテゴリで更新'
     )
+    parser.add_argument(
+        '--adaptive', action='store_true',
+        help='取得済み投稿も経過時間に応じた間隔で再取得する（--read-budget-usd の範囲内）'
+    )
+    parser.add_argument(
+        '--read-budget-usd', type=float, default=0.25,
+        help='--adaptive 1回あたりの post_read 予算 USD（デフォルト: 0.25）'
+    )
     args = parser.parse_args()
 
     data = load_perf_data()
+    index = PostIndex(data)
 
     if args.migrate_replies:
-        migrate_replies(data)
+        classifiers = update_classifiers(data)
+        migrate_replies(data, index, classifiers.get("reply"))
         save_perf_data(data)
         return
 
@@ -831,8 +991,15 @@ def main():
         except ValueError as e:
             print(f"[ERROR] {e}")
             sys.exit(1)
-        sync_timeline(api_client, data)
-        categorize_unknown_posts(data)
+        try:
+            sync_timeline(api_client, data, index, first_sync_days=args.first_sync_days)
+        except UNAVAILABLE_ERRORS as e:
+            # sync_checkpoint は保存済みなので次回はこのページから再開する
+            print(f"[sync] 中断: {e}")
+        # 新しく付いたラベルを学習 → ローカル分類 → 残りを LLM → LLM が付けたラベルも学習
+        classifiers = update_classifiers(data)
+        categorize_unknown_posts(data, batch_size=max(args.categorize_batch, 1), classifier=classifiers.get("post"))
+        update_classifiers(data, classifiers)
         save_perf_data(data)
         if args.act:
             run_act_reply(data)
@@ -848,13 +1015,27 @@ def main():
         print_summary(data)
         return
 
-    pending = get_pending_posts(data, args.threshold_hours)
+    if args.adaptive:
+        # 1回分の予算は日次・月次の残り予算（投稿用の取り置きを除く）を超えない
+        budget_usd = min(args.read_budget_usd, BUDGET_GUARD.remaining_usd(essential=False))
+        plan = plan_refresh(data["posts"], budget_usd=budget_usd)
+        pending = [index.get(tid) for tid in plan.tweet_ids]
+        if not pending:
+            print("再取得対象なし（adaptive）")
+            return
+        print(
+            f"対象: {len(pending)}件 / 期限到来 {plan.due}件 "
+            f"（{len(plan.batches)}バッチ, 見積 ${plan.estimated_usd:.3f} / 予算 ${budget_usd:.3f}）"
+        )
+    else:
+        pending = get_pending_posts(data, args.threshold_hours)
 
-    if not pending:
-        print(f"対象投稿なし（閾値: {args.threshold_hours}時間, 未取得投稿数: 0）")
-        return
+        if not pending:
+            print(f"対象投稿なし（閾値: {args.threshold_hours}時間, 未取得投稿数: 0）")
+            return
+
+        print(f"対象: {len(pending)}件（閾値: {args.threshold_hours}時間経過済み）")
 
-    print(f"対象: {len(pending)}件（閾値: {args.threshold_hours}時間経過済み）")
     for p in pending:
         print(f"  - [{p['hookCategory']}] {p['postedAt']} | {p['text'][:30]}...")
 
@@ -869,9 +1050,9 @@ def main():
         sys.exit(1)
 
     # pending posts を data["posts"] 内の同一オブジェクト参照で更新
-    fetch_engagement(api_client, pending)
+    fetch_engagement(api_client, pending, index)
     save_perf_data(data)
-    print(f"\n[完了] {len(pending)}件を更新しました → {HOOK_PERF_FILE}")
+    print(f"\n[完了] {len(pending)}件を更新しました → {HOOK_PERF_DB}")
 
 
 if __name__ == "__main__":
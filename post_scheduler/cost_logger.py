@@ -1,17 +1,39 @@
 #!/usr/bin/env python3
 """
 X API usage/cost logger.
-Logs per-call usage in JSONL for later daily aggregation.
+Logs per-call usage in JSONL for later daily aggregation, one partition per day
+(analytics/x_api_usage/YYYY-MM-DD.jsonl). When a day is over, its partition is
+closed: a summary sidecar (YYYY-MM-DD.summary.json) is written and the records
+are optionally gzipped, so reports for past days read one small file.
+
+Records are buffered in memory and appended by a background thread every
+FLUSH_INTERVAL_SECONDS (and at exit), so a crash loses at most that window.
+Each flush is whole-line O_APPEND writes, which keeps the file line-intact when
+several processes log at once. Appends hold a shared flock on the partition
+directory and closing a day holds it exclusively, so a day is never summarised
+or gzipped while another process is still writing to it.
 """
 
+import atexit
+import fcntl
+import gzip
 import json
+import os
+import shutil
+import sys
+import threading
+from contextlib import contextmanager
 from pathlib import Path
-from datetime import datetime, date
-from typing import Any, Optional
+from datetime import datetime, date, time as dt_time, timedelta
+from typing import Any, Callable, Iterator, Optional
+
+from usage_summary import UsageSummary
 
 PROJECT_DIR = Path(__file__).resolve().parent.parent
 LOG_DIR = PROJECT_DIR / "analytics"
+# Single-file log from before the per-day partitions; still read for days that were never split
 LOG_FILE = LOG_DIR / "x_api_usage.jsonl"
+PARTITION_DIRNAME = "x_api_usage"
 
 # Unit prices are based on docs/X_API_PRICING.md
 UNIT_PRICES = {
@@ -24,6 +46,329 @@ UNIT_PRICES = {
 }
 
 
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+# Longest time a record may sit in memory (the crash-loss window). 0 = write through.
+FLUSH_INTERVAL_SECONDS = _env_float("X_API_USAGE_FLUSH_SECONDS", 1.0)
+# Bounded buffer: the logging thread flushes itself once this many records are pending
+MAX_BUFFERED_RECORDS = 1000
+# fsync after every flush (survives power loss, not just process crashes)
+FSYNC = os.getenv("X_API_USAGE_FSYNC", "").lower() in ("1", "true", "yes")
+# Upper bound of a single write(); always a whole number of lines
+WRITE_CHUNK_BYTES = 64 * 1024
+# A day is closed this long after midnight, so records still buffered elsewhere land first
+CLOSE_GRACE_SECONDS = 10 * 60
+# gzip the records of closed days (the summary sidecar stays plain JSON)
+GZIP_CLOSED_DAYS = os.getenv("X_API_USAGE_GZIP", "").lower() in ("1", "true", "yes")
+
+# Called with each record when it is logged (budget_guard keeps its running totals this way)
+_USAGE_HOOKS: list[Callable[[dict[str, Any]], None]] = []
+
+
+def add_usage_hook(hook: Callable[[dict[str, Any]], None]) -> None:
+    _USAGE_HOOKS.append(hook)
+
+
+@contextmanager
+def _locked_dir(directory: Path, exclusive: bool) -> Iterator[None]:
+    """flock on the directory itself: shared while appending, exclusive while closing a day."""
+    directory.mkdir(parents=True, exist_ok=True)
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        yield
+    finally:
+        os.close(fd)
+
+
+def _append_lines(path: Path, lines: list[bytes], fsync: bool) -> None:
+    """Append whole lines with O_APPEND, at most WRITE_CHUNK_BYTES per write()."""
+    with _locked_dir(path.parent, exclusive=False):
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            chunk: list[bytes] = []
+            size = 0
+            for line in lines:
+                if chunk and size + len(line) > WRITE_CHUNK_BYTES:
+                    os.write(fd, b"".join(chunk))
+                    chunk, size = [], 0
+                chunk.append(line)
+                size += len(line)
+            if chunk:
+                os.write(fd, b"".join(chunk))
+            if fsync:
+                os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+class _BufferedWriter:
+    def __init__(self, interval: float, max_records: int, fsync: bool):
+        self.interval = interval
+        self.max_records = max_records
+        self.fsync = fsync
+        self._reset()
+
+    def _reset(self) -> None:
+        self._buffer: list[tuple[Path, bytes]] = []
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def append(self, path: Path, line: bytes) -> None:
+        if self.interval <= 0:
+            with self._write_lock:
+                _append_lines(path, [line], self.fsync)
+            return
+        with self._lock:
+            self._buffer.append((path, line))
+            full = len(self._buffer) >= self.max_records
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="cost-logger-flush", daemon=True)
+                self._thread.start()
+        if full:
+            self.flush()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.flush()
+
+    def flush(self) -> None:
+        # _write_lock keeps batches in log order across the caller and flush thread
+        with self._write_lock:
+            with self._lock:
+                pending, self._buffer = self._buffer, []
+            if not pending:
+                return
+            by_path: dict[Path, list[bytes]] = {}
+            for path, line in pending:
+                by_path.setdefault(path, []).append(line)
+            for path, lines in by_path.items():
+                try:
+                    _append_lines(path, lines, self.fsync)
+                except OSError as e:
+                    # Keep the records for the next flush, within the buffer bound
+                    print(f"[cost_logger] write failed ({e}); {len(lines)} records kept for retry", file=sys.stderr)
+                    with self._lock:
+                        self._buffer[:0] = [(path, line) for line in lines]
+                        del self._buffer[:-self.max_records]
+
+    def close(self) -> None:
+        self._stop.set()
+        # Anything logged after exit starts (other atexit handlers) is written through
+        self.interval = 0
+        self.flush()
+
+
+_WRITER = _BufferedWriter(FLUSH_INTERVAL_SECONDS, MAX_BUFFERED_RECORDS, FSYNC)
+atexit.register(_WRITER.close)
+if hasattr(os, "register_at_fork"):
+    # A forked child must not re-write the parent's pending records
+    os.register_at_fork(after_in_child=_WRITER._reset)
+
+
+def flush() -> None:
+    """Write all buffered records now (before reading the log in-process)."""
+    _WRITER.flush()
+
+
+# ---- partitions ----
+def partition_dir() -> Path:
+    return LOG_DIR / PARTITION_DIRNAME
+
+
+def partition_path(day: str) -> Path:
+    return partition_dir() / f"{day}.jsonl"
+
+
+def summary_path(day: str) -> Path:
+    return partition_dir() / f"{day}.summary.json"
+
+
+def _parse_lines(f) -> Iterator[dict]:
+    for line in f:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError:
+            continue
+
+
+# ((path, mtime, size) of the legacy file, its records by day), so it is read once per change
+_legacy_index: Optional[tuple[tuple[str, int, int], dict[str, list[dict]]]] = None
+
+
+def _legacy_records(day: str) -> list[dict]:
+    """Records of `day` in the legacy single-file log, indexed by day in one pass."""
+    global _legacy_index
+    try:
+        st = LOG_FILE.stat()
+    except OSError:
+        return []
+    key = (str(LOG_FILE), st.st_mtime_ns, st.st_size)
+    if _legacy_index is None or _legacy_index[0] != key:
+        by_day: dict[str, list[dict]] = {}
+        with open(LOG_FILE, "r", encoding="utf-8") as f:
+            for rec in _parse_lines(f):
+                by_day.setdefault(str(rec.get("date") or ""), []).append(rec)
+        _legacy_index = (key, by_day)
+    return _legacy_index[1].get(day, [])
+
+
+def iter_records(day: str) -> Iterator[dict]:
+    """Records of one day, from its partition (plain and/or gzipped) or the legacy file."""
+    flush()
+    return _iter_records(day)
+
+
+def _iter_records(day: str) -> Iterator[dict]:
+    path = partition_path(day)
+    gz_path = path.with_name(path.name + ".gz")
+    if gz_path.exists():
+        with gzip.open(gz_path, "rt", encoding="utf-8") as f:
+            yield from _parse_lines(f)
+    if path.exists():
+        with open(path, "r", encoding="utf-8") as f:
+            yield from _parse_lines(f)
+    if not path.exists() and not gz_path.exists():
+        yield from _legacy_records(day)
+
+
+def load_day_summary(day: str) -> dict:
+    """Summary of one day: the sidecar once the day is closed, otherwise computed from its records."""
+    try:
+        return json.loads(summary_path(day).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        pass
+    summary = UsageSummary()
+    for rec in iter_records(day):
+        summary.add(rec)
+    return summary.to_dict()
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def finalize_day(day: str, *, compress: bool = GZIP_CLOSED_DAYS) -> dict:
+    """Write the day's summary sidecar and optionally gzip its records.
+
+    Runs under an exclusive flock on the partition directory, so no process
+    appends to the day between summarising and compressing it.
+    """
+    # Our own buffered records go first: flushing takes the shared lock
+    flush()
+    with _locked_dir(partition_dir(), exclusive=True):
+        return _finalize_locked(day, compress)
+
+
+def _finalize_locked(day: str, compress: bool) -> dict:
+    summary = UsageSummary()
+    for rec in _iter_records(day):
+        summary.add(rec)
+    result = summary.to_dict()
+    result["date"] = day
+    result["finalized_at"] = datetime.now().isoformat()
+    _write_atomic(summary_path(day), json.dumps(result, ensure_ascii=False, indent=2).encode("utf-8"))
+
+    path = partition_path(day)
+    if compress and path.exists():
+        gz_path = path.with_name(path.name + ".gz")
+        tmp = gz_path.with_name(f"{gz_path.name}.{os.getpid()}.tmp")
+        with open(tmp, "wb") as out:
+            # A gzip file may hold several members; keep what was compressed before
+            if gz_path.exists():
+                with open(gz_path, "rb") as prev:
+                    shutil.copyfileobj(prev, out)
+            with open(path, "rb") as src, gzip.GzipFile(fileobj=out, mode="wb") as gz:
+                shutil.copyfileobj(src, gz)
+        os.replace(tmp, gz_path)
+        path.unlink()
+    return result
+
+
+def _needs_close(day: str, path: Path) -> bool:
+    """True unless the sidecar is newer than every record appended to the partition."""
+    if GZIP_CLOSED_DAYS:
+        # A plain partition left next to the gzip holds records that arrived late
+        return True
+    try:
+        return summary_path(day).stat().st_mtime_ns < path.stat().st_mtime_ns
+    except OSError:
+        return True
+
+
+def close_past_days(now: Optional[datetime] = None) -> list[str]:
+    """Finalize every partition whose day ended more than CLOSE_GRACE_SECONDS ago,
+    and again when records arrived after its sidecar was written."""
+    now = now or datetime.now()
+    closed = []
+    for path in sorted(partition_dir().glob("*.jsonl")):
+        day = path.stem
+        try:
+            day_end = datetime.combine(date.fromisoformat(day) + timedelta(days=1), dt_time.min)
+        except ValueError:
+            continue
+        if (now - day_end).total_seconds() < CLOSE_GRACE_SECONDS:
+            continue
+        if not _needs_close(day, path):
+            continue
+        finalize_day(day)
+        closed.append(day)
+    return closed
+
+
+def split_legacy_log() -> dict[str, int]:
+    """Move records of the legacy single-file log into day partitions. Returns records per day."""
+    if not LOG_FILE.exists():
+        return {}
+    flush()
+    by_day: dict[str, list[bytes]] = {}
+    with open(LOG_FILE, "r", encoding="utf-8") as f:
+        for rec in _parse_lines(f):
+            day = str(rec.get("date") or "")
+            if day:
+                by_day.setdefault(day, []).append((json.dumps(rec, ensure_ascii=False) + "\n").encode("utf-8"))
+    for day, lines in sorted(by_day.items()):
+        _append_lines(partition_path(day), lines, FSYNC)
+    LOG_FILE.rename(LOG_FILE.with_name(LOG_FILE.name + ".migrated"))
+    # Days already closed get their sidecar rebuilt with the migrated records
+    for day in by_day:
+        if summary_path(day).exists():
+            finalize_day(day)
+    close_past_days()
+    return {day: len(lines) for day, lines in by_day.items()}
+
+
+# (LOG_DIR, day, partition path) of the last record, so the hot path skips Path building
+_open_partition: Optional[tuple[Path, str, Path]] = None
+
+
+def _rollover(day: str) -> Path:
+    """Partition for a record of `day`. On the first record of a new day (per process),
+    close the days that have ended."""
+    global _open_partition
+    current = _open_partition
+    if current is not None and current[0] is LOG_DIR and current[1] == day:
+        return current[2]
+    _open_partition = (LOG_DIR, day, partition_path(day))
+    try:
+        close_past_days()
+    except OSError as e:
+        print(f"[cost_logger] closing past days failed: {e}", file=sys.stderr)
+    return _open_partition[2]
+
+
 def log_api_usage(
     usage_type: str,
     units: int,
@@ -33,7 +378,7 @@ def log_api_usage(
     context: str = "",
     metadata: Optional[dict[str, Any]] = None,
 ) -> None:
-    """Append one usage record to analytics/x_api_usage.jsonl."""
+    """Append one usage record to the day's partition (analytics/x_api_usage/YYYY-MM-DD.jsonl)."""
     unit_price = UNIT_PRICES.get(usage_type, 0.0)
     units = max(int(units), 0)
     request_count = max(int(request_count), 1)
@@ -52,6 +397,8 @@ def log_api_usage(
         "metadata": metadata or {},
     }
 
-    LOG_DIR.mkdir(parents=True, exist_ok=True)
-    with open(LOG_FILE, "a", encoding="utf-8") as f:
-        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    path = _rollover(record["date"])
+    _WRITER.append(path, (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8"))
+
+    for hook in _USAGE_HOOKS:
+        hook(record)
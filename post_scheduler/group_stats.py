@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+ホッケ カテゴリ別集計エンジン
+投稿リストを1回走査するだけで、カテゴリごとの平均 imp/いいね/RT・診断分布・
+直近N件（上限付きヒープ）を揃える。check_engagement の各サマリーと推薦が共有する。
+"""
+
+import heapq
+from collections import Counter
+from typing import Any, Iterable
+
+
+class GroupStats:
+    """1グループ分の集計。add() で1件ずつ積み上げる"""
+
+    __slots__ = ("n", "imp_sum", "likes_sum", "rt_sum", "diagnoses", "_recent_n", "_heap", "_seq")
+
+    def __init__(self, recent_n: int = 3):
+        self.n = 0
+        self.imp_sum = 0
+        self.likes_sum = 0
+        self.rt_sum = 0
+        self.diagnoses: Counter = Counter()
+        self._recent_n = recent_n
+        # (postedAt, -追加順, post) の min-heap。同時刻なら先に追加した方を残す
+        self._heap: list[tuple[str, int, dict]] = []
+        self._seq = 0
+
+    def add(self, post: dict, missing_diagnosis: Any = "DROP") -> None:
+        self.n += 1
+        self.imp_sum += post.get("impressions") or 0
+        self.likes_sum += post.get("likes") or 0
+        self.rt_sum += post.get("retweets") or 0
+        self.diagnoses[post.get("diagnosis", missing_diagnosis)] += 1
+
+        if self._recent_n <= 0:
+            return
+        item = (post.get("postedAt") or "", -self._seq, post)
+        self._seq += 1
+        if len(self._heap) < self._recent_n:
+            heapq.heappush(self._heap, item)
+        elif item[:2] > self._heap[0][:2]:
+            heapq.heapreplace(self._heap, item)
+
+    @property
+    def avg_imp(self) -> float:
+        return self.imp_sum / self.n if self.n else 0.0
+
+    @property
+    def avg_likes(self) -> float:
+        return self.likes_sum / self.n if self.n else 0.0
+
+    @property
+    def avg_rt(self) -> float:
+        return self.rt_sum / self.n if self.n else 0.0
+
+    @property
+    def recent(self) -> list[dict]:
+        """postedAt の新しい順で最大 recent_n 件"""
+        return [post for *_, post in sorted(self._heap, key=lambda x: x[:2], reverse=True)]
+
+
+def group_posts(
+    posts: Iterable[dict],
+    *,
+    key: str = "hookCategory",
+    default: str = "未分類",
+    recent_n: int = 3,
+    missing_diagnosis: Any = "DROP",
+) -> dict[str, GroupStats]:
+    """posts を key で1回だけ走査してグループ別の GroupStats を返す（初出順）"""
+    groups: dict[str, GroupStats] = {}
+    for post in posts:
+        name = post.get(key, default)
+        stats = groups.get(name)
+        if stats is None:
+            stats = groups[name] = GroupStats(recent_n)
+        stats.add(post, missing_diagnosis)
+    return groups
+
+
+def by_avg_imp(groups: dict[str, GroupStats]) -> list[tuple[str, GroupStats]]:
+    """平均 imp の降順（同値は初出順）"""
+    return sorted(groups.items(), key=lambda x: -x[1].avg_imp)
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+ホッケ ローカル hookCategory 分類器
+文字 n-gram（1〜3文字）を zlib.crc32 で 2^16 次元に落とし、TF-IDF 重みの
+多項ナイーブベイズで分類する（NumPy のみ）。
+
+- クラスごとの TF 合計と文書頻度だけを持つので、投稿1件ずつ学習・取り消しできる
+  （IDF はクラス合計に後から掛けられるので、再学習なしで最新の文書数に追従する）
+- 確信度（事後確率）が MIN_CONFIDENCE 未満なら None を返し、呼び出し側が LLM に回す
+- 分類器自身が付けたラベル（categorySource="local"）は学習に使わない
+"""
+
+import math
+import re
+import unicodedata
+import zlib
+from pathlib import Path
+from typing import Iterable, Optional
+
+import numpy as np
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+PROJECT_DIR = SCRIPT_DIR.parent
+MODEL_DIR = PROJECT_DIR / "analytics" / "hook_classifier"
+
+N_FEATURES = 2 ** 16
+NGRAM_RANGE = (1, 3)
+# この事後確率以上のときだけローカルの分類結果を採用する
+MIN_CONFIDENCE = 0.8
+# 学習件数がこれ未満の間は分類しない（全件 LLM）
+MIN_TRAINING_DOCS = 20
+ALPHA = 0.1
+LOCAL_SOURCE = "local"
+
+_URL_RE = re.compile(r"https?://\S+")
+_MENTION_RE = re.compile(r"@\w+")
+
+
+def normalize_text(text: str) -> str:
+    text = unicodedata.normalize("NFKC", text or "")
+    text = _URL_RE.sub(" ", text)
+    text = _MENTION_RE.sub(" ", text)
+    return " ".join(text.lower().split())
+
+
+def featurize(text: str) -> tuple[np.ndarray, np.ndarray]:
+    """(特徴インデックス, 1+log(出現回数)) を返す。インデックスは重複なし"""
+    text = normalize_text(text)
+    hashes = [
+        zlib.crc32(text[i:i + n].encode("utf-8")) & (N_FEATURES - 1)
+        for n in range(NGRAM_RANGE[0], NGRAM_RANGE[1] + 1)
+        for i in range(len(text) - n + 1)
+        if not text[i:i + n].isspace()
+    ]
+    if not hashes:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+    idx, counts = np.unique(np.asarray(hashes, dtype=np.int64), return_counts=True)
+    return idx, 1.0 + np.log(counts)
+
+
+class HookClassifier:
+    """labels を渡すとそのラベルだけ学習する（None なら出てきたラベルをすべて学習）"""
+
+    def __init__(self, labels: Optional[Iterable[str]] = None, path: Optional[Path] = None):
+        self.fixed_labels = list(labels) if labels is not None else None
+        self.path = path
+        self.labels: list[str] = list(self.fixed_labels or [])
+        self.class_tf = np.zeros((len(self.labels), N_FEATURES), dtype=np.float64)
+        self.class_docs = np.zeros(len(self.labels), dtype=np.int64)
+        self.df = np.zeros(N_FEATURES, dtype=np.int64)
+        # tweet_id → 学習したラベル（ラベルが変わったら取り消して学習し直す）
+        self.learned: dict[str, str] = {}
+        self._log_prob: Optional[np.ndarray] = None
+
+    # ---- 永続化 ----
+    @classmethod
+    def load(cls, path: Path, labels: Optional[Iterable[str]] = None) -> "HookClassifier":
+        model = cls(labels, path)
+        if not path.exists():
+            return model
+        try:
+            with np.load(path, allow_pickle=False) as z:
+                stored = [str(x) for x in z["labels"]]
+                if z["class_tf"].shape[1] != N_FEATURES:
+                    return model
+                model.labels = stored
+                model.class_tf = z["class_tf"].astype(np.float64)
+                model.class_docs = z["class_docs"].astype(np.int64)
+                model.df = z["df"].astype(np.int64)
+                model.learned = dict(zip((str(x) for x in z["ids"]), (str(x) for x in z["id_labels"])))
+        except (OSError, KeyError, ValueError):
+            return cls(labels, path)
+        for label in model.fixed_labels or []:
+            model._label_index(label)
+        return model
+
+    def save(self, path: Optional[Path] = None) -> None:
+        path = path or self.path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.stem + ".tmp.npz")
+        ids = list(self.learned)
+        np.savez_compressed(
+            tmp,
+            labels=np.array(self.labels, dtype=str),
+            class_tf=self.class_tf,
+            class_docs=self.class_docs,
+            df=self.df,
+            ids=np.array(ids, dtype=str),
+            id_labels=np.array([self.learned[i] for i in ids], dtype=str),
+        )
+        tmp.replace(path)
+
+    # ---- 学習 ----
+    @property
+    def n_docs(self) -> int:
+        return int(self.class_docs.sum())
+
+    @property
+    def ready(self) -> bool:
+        return self.n_docs >= MIN_TRAINING_DOCS and int((self.class_docs > 0).sum()) >= 2
+
+    def _label_index(self, label: str) -> int:
+        if label not in self.labels:
+            self.labels.append(label)
+            self.class_tf = np.vstack([self.class_tf, np.zeros((1, N_FEATURES))])
+            self.class_docs = np.append(self.class_docs, 0)
+        return self.labels.index(label)
+
+    def _apply(self, text: str, label: str, sign: int) -> None:
+        idx, tf = featurize(text)
+        c = self._label_index(label)
+        self.class_tf[c, idx] = np.maximum(self.class_tf[c, idx] + sign * tf, 0.0)
+        self.class_docs[c] = max(self.class_docs[c] + sign, 0)
+        self.df[idx] = np.maximum(self.df[idx] + sign, 0)
+        self._log_prob = None
+
+    def learn(self, doc_id: str, text: str, label: str) -> bool:
+        """1件学習する。同じ doc_id が別ラベルで学習済みなら取り消してから学習し直す"""
+        if self.fixed_labels is not None and label not in self.fixed_labels:
+            return False
+        previous = self.learned.get(doc_id)
+        if previous == label:
+            return False
+        if previous is not None:
+            self._apply(text, previous, -1)
+        self._apply(text, label, +1)
+        self.learned[doc_id] = label
+        return True
+
+    def update(self, posts: Iterable[dict], *, exclude: Iterable[str] = ()) -> int:
+        """ラベル付きの投稿のうち未学習（またはラベルが変わった）ものだけを学習する"""
+        exclude = set(exclude)
+        added = 0
+        for post in posts:
+            label = post.get("hookCategory")
+            text = post.get("text")
+            if not label or not text or label in exclude or post.get("categorySource") == LOCAL_SOURCE:
+                continue
+            added += self.learn(str(post["tweet_id"]), text, label)
+        return added
+
+    # ---- 推論 ----
+    def _feature_log_prob(self) -> np.ndarray:
+        if self._log_prob is None:
+            n = max(self.n_docs, 1)
+            idf = np.log((1.0 + n) / (1.0 + self.df)) + 1.0
+            weighted = self.class_tf * idf + ALPHA
+            self._log_prob = np.log(weighted) - np.log(weighted.sum(axis=1, keepdims=True))
+        return self._log_prob
+
+    def predict_proba(self, text: str) -> dict[str, float]:
+        idx, tf = featurize(text)
+        if not self.labels or not len(idx):
+            return {}
+        n = max(self.n_docs, 1)
+        x = tf * (np.log((1.0 + n) / (1.0 + self.df[idx])) + 1.0)
+        # 特徴量が多い長文ほど事後確率が極端になるので、文書ベクトルの長さを1にそろえる
+        x /= math.sqrt(float(x @ x)) or 1.0
+        prior = np.log((self.class_docs + ALPHA) / (self.class_docs.sum() + ALPHA * len(self.labels)))
+        joint = prior + self._feature_log_prob()[:, idx] @ x
+        joint[self.class_docs == 0] = -np.inf
+        probs = np.exp(joint - joint.max())
+        probs /= probs.sum()
+        return {label: float(p) for label, p in zip(self.labels, probs)}
+
+    def predict(self, text: str, min_confidence: float = MIN_CONFIDENCE) -> tuple[Optional[str], float]:
+        """(ラベル, 確信度)。学習不足か確信度が低ければラベルは None"""
+        if not self.ready:
+            return None, 0.0
+        probs = self.predict_proba(text)
+        if not probs:
+            return None, 0.0
+        label, confidence = max(probs.items(), key=lambda x: x[1])
+        return (label if confidence >= min_confidence else None), confidence
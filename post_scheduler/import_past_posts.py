@@ -3,13 +3,15 @@
 過去の投稿を hook_performance.json にインポートするスクリプト
 """
 
-import json
 import sys
 from datetime import datetime
 from pathlib import Path
 
+from perf_store import PerfStore
+
 SCRIPT_DIR = Path(__file__).parent
 HOOK_PERF_FILE = SCRIPT_DIR.parent / "hook_performance.json"
+HOOK_PERF_DB = SCRIPT_DIR.parent / "hook_performance.db"
 
 # 過去の投稿データ（memory/2026-02-18.md から抽出）
 PAST_POSTS = [
@@ -33,24 +35,13 @@ PAST_POSTS = [
     },
 ]
 
-def load_perf_data() -> dict:
-    if not HOOK_PERF_FILE.exists():
-        return {"version": "1.0", "posts": []}
-    with open(HOOK_PERF_FILE, 'r', encoding='utf-8') as f:
-        return json.load(f)
-
-def save_perf_data(data: dict) -> None:
-    with open(HOOK_PERF_FILE, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-
 def main():
-    data = load_perf_data()
-
-    existing_ids = set(p.get("tweet_id") for p in data["posts"])
+    store = PerfStore(HOOK_PERF_DB, HOOK_PERF_FILE)
+    new_entries = []
     new_count = 0
 
     for post in PAST_POSTS:
-        if post["tweet_id"] in existing_ids:
+        if store.get(post["tweet_id"]) is not None:
             print(f"[SKIP] 既存: {post['tweet_id']}")
             continue
 
@@ -67,7 +58,7 @@ def main():
             "diagnosis": None
         }
 
-        data["posts"].append(entry)
+        new_entries.append(entry)
         print(f"[ADD] {post['hookCategory']} | {post['text'][:30]}...")
         new_count += 1
 
@@ -75,8 +66,8 @@ def main():
         print("追加する投稿はありませんでした")
         return
 
-    save_perf_data(data)
-    print(f"\n[完了] {new_count}件をインポートしました → {HOOK_PERF_FILE}")
+    store.upsert_posts(new_entries)
+    print(f"\n[完了] {new_count}件をインポートしました → {HOOK_PERF_DB}")
 
 if __name__ == "__main__":
     main()
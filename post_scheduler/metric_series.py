@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+ホッケ エンゲージメント時系列
+投稿ごとの (経過秒, impressions, likes, retweets) スナップショットを
+差分エンコードした int32 配列 (array('i')) の BLOB として持つ。
+
+- 同じ値が続く間は始点と終点の2サンプルだけ持つ（再取得のたびに終点を進める）
+- 古い投稿は t+1h/6h/24h の前後と最新値だけ残して間引く
+- value_at() は前後のサンプルから線形補間する（投稿時点は 0 とみなす）
+- hook_performance の日時はタイムゾーンなしなら JST とみなす（parse_jst / now_jst_str で読み書きする）
+"""
+
+from array import array
+from bisect import bisect_left
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+FIELDS = ("impressions", "likes", "retweets")
+WIDTH = 1 + len(FIELDS)
+TYPECODE = "i"
+
+# value_at() で問い合わせる基準点（経過秒）。間引き時もこの前後は必ず残す
+ANCHORS = (3600, 6 * 3600, 24 * 3600)
+# これより古い投稿に追記したら間引く
+COMPACT_AFTER = 48 * 3600
+# 若い投稿でもこれを超えたら間引く
+MAX_SAMPLES = 96
+
+Sample = tuple[int, ...]  # (経過秒, impressions, likes, retweets)
+
+JST = timezone(timedelta(hours=9))
+
+
+def parse_jst(value: object) -> Optional[datetime]:
+    """ISO 形式の日時を aware な datetime にする（タイムゾーンなしは JST 扱い。ホストのタイムゾーンに依らない）"""
+    if not value:
+        return None
+    try:
+        dt = datetime.fromisoformat(str(value))
+    except ValueError:
+        return None
+    return dt if dt.tzinfo else dt.replace(tzinfo=JST)
+
+
+def now_jst_str() -> str:
+    """postedAt / engagementFetchedAt に書く現在時刻（JST、タイムゾーンなし）"""
+    return datetime.now(JST).strftime('%Y-%m-%dT%H:%M:%S')
+
+
+def to_epoch(value: object) -> Optional[int]:
+    """ISO 形式の日時を epoch 秒に変換する（タイムゾーンなしは JST 扱い）"""
+    dt = parse_jst(value)
+    return int(dt.timestamp()) if dt else None
+
+
+def metric_values(post: dict) -> tuple[int, ...]:
+    return tuple(int(post.get(f) or 0) for f in FIELDS)
+
+
+def decode(blob: Optional[bytes]) -> list[Sample]:
+    """差分 BLOB を絶対値のサンプル列に戻す"""
+    if not blob:
+        return []
+    deltas = array(TYPECODE)
+    deltas.frombytes(blob)
+    samples = []
+    acc = [0] * WIDTH
+    for i in range(0, len(deltas), WIDTH):
+        for j in range(WIDTH):
+            acc[j] += deltas[i + j]
+        samples.append(tuple(acc))
+    return samples
+
+
+def encode(samples: list[Sample]) -> bytes:
+    deltas = array(TYPECODE)
+    prev: Sample = (0,) * WIDTH
+    for sample in samples:
+        deltas.extend(cur - old for cur, old in zip(sample, prev))
+        prev = sample
+    return deltas.tobytes()
+
+
+def downsample(samples: list[Sample], anchors: tuple[int, ...] = ANCHORS) -> list[Sample]:
+    """各基準点を挟む2サンプルと最新サンプルだけを残す（基準点での補間値は変わらない）"""
+    if len(samples) <= 2:
+        return samples
+    offsets = [s[0] for s in samples]
+    keep = {len(samples) - 1}
+    for anchor in anchors:
+        i = bisect_left(offsets, anchor)
+        if i < len(samples):
+            keep.add(i)
+        if i > 0:
+            keep.add(i - 1)
+    return [samples[i] for i in sorted(keep)]
+
+
+def append(blob: Optional[bytes], offset: int, values: tuple[int, ...]) -> Optional[bytes]:
+    """サンプルを追記した新しい BLOB を返す。最新サンプルより古ければ None
+
+    値が変わらない再取得も「その時点まで観測した」ことを残す。直前の2サンプルが
+    既に同じ値なら、増やさずに最新サンプルの経過秒を進める。
+    """
+    samples = decode(blob)
+    sample = (max(offset, 0),) + tuple(values)
+    if samples:
+        last = samples[-1]
+        if offset <= last[0]:
+            return None
+        if sample[1:] == last[1:] and len(samples) >= 2 and samples[-2][1:] == last[1:]:
+            samples[-1] = sample
+            return encode(samples)
+    samples.append(sample)
+    if offset >= COMPACT_AFTER or len(samples) > MAX_SAMPLES:
+        samples = downsample(samples)
+    return encode(samples)
+
+
+def value_at(samples: list[Sample], offset: int) -> Optional[dict]:
+    """経過 offset 秒時点の値。最新サンプルより先（未観測）なら None"""
+    if not samples or offset > samples[-1][0]:
+        return None
+    i = bisect_left([s[0] for s in samples], offset)
+    cur = samples[i]
+    prev = samples[i - 1] if i > 0 else (0,) * WIDTH
+    span = cur[0] - prev[0]
+    ratio = (offset - prev[0]) / span if span > 0 else 1.0
+    return {
+        f: round(p + (c - p) * ratio)
+        for f, p, c in zip(FIELDS, prev[1:], cur[1:])
+    }
@@ -0,0 +1,582 @@
+#!/usr/bin/env python3
+"""
+ホッケ 投稿パフォーマンスストア
+hook_performance.json の全件読み書きを SQLite (WAL) に置き換える。
+投稿1件の追加・更新が O(1) 行の書き込みで済む。
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any, Iterable, Optional
+
+import metric_series
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+PROJECT_DIR = SCRIPT_DIR.parent
+DB_FILE = PROJECT_DIR / "hook_performance.db"
+HOOK_PERF_FILE = PROJECT_DIR / "hook_performance.json"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS posts (
+    tweet_id     TEXT PRIMARY KEY,
+    postedAt     TEXT,
+    hookCategory TEXT,
+    tweet_type   TEXT,
+    data         TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_posts_posted_at ON posts(postedAt);
+CREATE INDEX IF NOT EXISTS idx_posts_hook_category ON posts(hookCategory);
+CREATE INDEX IF NOT EXISTS idx_posts_tweet_type ON posts(tweet_type);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS engagement_rollup (
+    day          TEXT NOT NULL,
+    hour         INTEGER NOT NULL,
+    hookCategory TEXT NOT NULL,
+    tweet_type   TEXT NOT NULL,
+    posts        INTEGER NOT NULL DEFAULT 0,
+    fetched      INTEGER NOT NULL DEFAULT 0,
+    imp_sum      INTEGER NOT NULL DEFAULT 0,
+    imp_sq       INTEGER NOT NULL DEFAULT 0,
+    likes_sum    INTEGER NOT NULL DEFAULT 0,
+    likes_sq     INTEGER NOT NULL DEFAULT 0,
+    rt_sum       INTEGER NOT NULL DEFAULT 0,
+    rt_sq        INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, hour, hookCategory, tweet_type)
+);
+CREATE TABLE IF NOT EXISTS metric_series (
+    tweet_id  TEXT PRIMARY KEY,
+    posted_ts INTEGER NOT NULL,
+    data      BLOB NOT NULL
+);
+"""
+
+# PRAGMA user_version。上げたら _migrate() に手順を足す
+SCHEMA_VERSION = 1
+
+# engagement_rollup の集計キー・値を posts の行から導出する式。
+# エンゲージメント未取得の投稿は posts だけ数え、指標は 0 として扱う。
+_ROLLUP_KEYS = ("day", "hour", "hookCategory", "tweet_type")
+_ROLLUP_VALUES = ("posts", "fetched", "imp_sum", "imp_sq", "likes_sum", "likes_sq", "rt_sum", "rt_sq")
+
+
+def _rollup_exprs(a: str) -> list[str]:
+    fetched = f"(json_extract({a}.data, '$.engagementFetchedAt') IS NOT NULL)"
+
+    def metric(key: str) -> str:
+        return f"(CASE WHEN {fetched} THEN COALESCE(json_extract({a}.data, '$.{key}'), 0) ELSE 0 END)"
+
+    imp, likes, rt = metric("impressions"), metric("likes"), metric("retweets")
+    return [
+        f"COALESCE(substr({a}.postedAt, 1, 10), '')",
+        f"(CASE WHEN length({a}.postedAt) >= 13 THEN CAST(substr({a}.postedAt, 12, 2) AS INTEGER) ELSE -1 END)",
+        f"COALESCE({a}.hookCategory, '未分類')",
+        f"COALESCE({a}.tweet_type, '')",
+        "1", f"{fetched}",
+        imp, f"{imp} * {imp}",
+        likes, f"{likes} * {likes}",
+        rt, f"{rt} * {rt}",
+    ]
+
+
+def _rollup_add_sql(a: str) -> str:
+    cols = ", ".join(_ROLLUP_KEYS + _ROLLUP_VALUES)
+    sets = ", ".join(f"{c} = {c} + excluded.{c}" for c in _ROLLUP_VALUES)
+    return (
+        f"INSERT INTO engagement_rollup ({cols}) VALUES ({', '.join(_rollup_exprs(a))}) "
+        f"ON CONFLICT({', '.join(_ROLLUP_KEYS)}) DO UPDATE SET {sets};"
+    )
+
+
+def _rollup_sub_sql(a: str) -> str:
+    exprs = _rollup_exprs(a)
+    keys = dict(zip(_ROLLUP_KEYS, exprs))
+    vals = dict(zip(_ROLLUP_VALUES, exprs[len(_ROLLUP_KEYS):]))
+    where = " AND ".join(f"{k} = {e}" for k, e in keys.items())
+    sets = ", ".join(f"{c} = {c} - {e}" for c, e in vals.items())
+    return (
+        f"UPDATE engagement_rollup SET {sets} WHERE {where}; "
+        f"DELETE FROM engagement_rollup WHERE posts <= 0 AND {where};"
+    )
+
+
+# posts への書き込みごとに engagement_rollup を差分更新する
+ROLLUP_TRIGGERS = f"""
+CREATE TRIGGER IF NOT EXISTS posts_rollup_ai AFTER INSERT ON posts BEGIN
+    {_rollup_add_sql("NEW")}
+END;
+CREATE TRIGGER IF NOT EXISTS posts_rollup_ad AFTER DELETE ON posts BEGIN
+    {_rollup_sub_sql("OLD")}
+END;
+CREATE TRIGGER IF NOT EXISTS posts_rollup_au AFTER UPDATE ON posts BEGIN
+    {_rollup_sub_sql("OLD")}
+    {_rollup_add_sql("NEW")}
+END;
+"""
+
+_ROLLUP_REBUILD_SQL = f"""
+INSERT INTO engagement_rollup ({", ".join(_ROLLUP_KEYS + _ROLLUP_VALUES)})
+SELECT {", ".join(_ROLLUP_KEYS)}, {", ".join(f"SUM({v})" for v in _ROLLUP_VALUES)}
+FROM (
+    SELECT {", ".join(f"{e} AS {c}" for c, e in zip(_ROLLUP_KEYS + _ROLLUP_VALUES, _rollup_exprs("p")))}
+    FROM posts AS p
+)
+GROUP BY {", ".join(_ROLLUP_KEYS)}
+"""
+
+SERIES_UPSERT_SQL = """
+INSERT INTO metric_series (tweet_id, posted_ts, data) VALUES (?, ?, ?)
+ON CONFLICT(tweet_id) DO UPDATE SET posted_ts = excluded.posted_ts, data = excluded.data
+"""
+
+UPSERT_SQL = """
+INSERT INTO posts (tweet_id, postedAt, hookCategory, tweet_type, data)
+VALUES (?, ?, ?, ?, ?)
+ON CONFLICT(tweet_id) DO UPDATE SET
+    postedAt = excluded.postedAt,
+    hookCategory = excluded.hookCategory,
+    tweet_type = excluded.tweet_type,
+    data = excluded.data
+"""
+
+
+def store_signature(db_path: Path = DB_FILE) -> tuple:
+    """DB 本体と WAL の (mtime_ns, size)。変化していなければ内容も同じとみなせる。"""
+    sig = []
+    for path in (Path(db_path), Path(f"{db_path}-wal")):
+        try:
+            st = path.stat()
+            sig.append((st.st_mtime_ns, st.st_size))
+        except OSError:
+            sig.append(None)
+    return tuple(sig)
+
+
+def _dumps(post: dict) -> str:
+    return json.dumps(post, ensure_ascii=False)
+
+
+def _row(post: dict, serialized: Optional[str] = None) -> tuple:
+    return (
+        str(post["tweet_id"]),
+        post.get("postedAt"),
+        post.get("hookCategory"),
+        post.get("tweet_type"),
+        serialized if serialized is not None else _dumps(post),
+    )
+
+
+class PostIndex:
+    """data["posts"] に対する tweet_id → post の索引。
+
+    1回の実行で1度だけ構築し、upsert_many() 経由で追加・更新することで
+    data["posts"] と索引を常に一致させる。更新は post オブジェクトを直接書き換える。
+    """
+
+    def __init__(self, data: dict):
+        self.posts: list[dict] = data.setdefault("posts", [])
+        self._by_id: dict[str, dict] = {str(p["tweet_id"]): p for p in self.posts}
+
+    def __contains__(self, tweet_id: object) -> bool:
+        return str(tweet_id) in self._by_id
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def get(self, tweet_id: str) -> Optional[dict]:
+        return self._by_id.get(str(tweet_id))
+
+    def upsert_many(self, records: Iterable[dict]) -> tuple[int, int]:
+        """records を一括 upsert する。返り値は (追加件数, 更新件数)。
+
+        既存の tweet_id は record のフィールドで上書き、未知の tweet_id は
+        record をそのまま新規投稿として末尾に追加する。
+        """
+        added = 0
+        updated = 0
+        for record in records:
+            tid = str(record["tweet_id"])
+            post = self._by_id.get(tid)
+            if post is None:
+                post = dict(record)
+                post["tweet_id"] = tid
+                self.posts.append(post)
+                self._by_id[tid] = post
+                added += 1
+            else:
+                post.update(record)
+                updated += 1
+        return added, updated
+
+
+class PerfStore:
+    """hook_performance の SQLite バックエンド。
+
+    load() は従来の hook_performance.json と同じ形の dict を返すので、
+    既存の data["posts"] を操作するコードはそのまま動く。
+    save() は load() 時点から変化した投稿だけを書き戻す。
+    """
+
+    def __init__(
+        self,
+        db_path: Path = DB_FILE,
+        json_path: Path = HOOK_PERF_FILE,
+        *,
+        auto_import: bool = True,
+    ):
+        self.db_path = Path(db_path)
+        self.json_path = Path(json_path)
+        self._conn: Optional[sqlite3.Connection] = None
+        # tweet_id -> load() 時点のシリアライズ結果（差分書き込み用）
+        self._snapshot: dict[str, str] = {}
+        # load() 時点のメタ情報のキー（data から消したキーを save() で削除する）
+        self._meta_keys: set[str] = set()
+
+        # 初回のみ既存の JSON を取り込む
+        if auto_import and self.count() == 0 and self.json_path.exists():
+            imported = self.import_json(self.json_path)
+            print(f"[PerfStore] {self.json_path.name} から {imported}件をインポート", file=sys.stderr)
+
+    # ---- connection ----
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.db_path), timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            conn.executescript(ROLLUP_TRIGGERS)
+            self._migrate(conn)
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def _migrate(conn: sqlite3.Connection) -> None:
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version >= SCHEMA_VERSION:
+            return
+        with conn:
+            if version < 1:
+                # engagement_rollup 導入前の DB: 既存投稿から集計を作り直す
+                conn.execute("DELETE FROM engagement_rollup")
+                conn.execute(_ROLLUP_REBUILD_SQL)
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def __enter__(self) -> "PerfStore":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    # ---- meta ----
+
+    def get_meta(self, key: str, default: Any = None) -> Any:
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set_meta(self, key: str, value: Any) -> None:
+        with self.conn:
+            self._write_meta({key: value})
+
+    def _write_meta(self, items: dict[str, Any]) -> None:
+        self.conn.executemany(
+            "INSERT INTO meta (key, value) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            [(k, json.dumps(v, ensure_ascii=False)) for k, v in items.items()],
+        )
+
+    def _delete_meta(self, keys: Iterable[str]) -> None:
+        self.conn.executemany("DELETE FROM meta WHERE key = ?", [(k,) for k in keys])
+
+    def _all_meta(self) -> dict[str, Any]:
+        return {k: json.loads(v) for k, v in self.conn.execute("SELECT key, value FROM meta")}
+
+    # ---- read ----
+
+    def count(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM posts").fetchone()[0]
+
+    def all_posts(self) -> list[dict]:
+        """全投稿を記録順で返す"""
+        return [json.loads(d) for (d,) in self.conn.execute("SELECT data FROM posts ORDER BY rowid")]
+
+    def recent_posts(self, n: int) -> list[dict]:
+        """記録順で末尾 n 件を返す（古い順）"""
+        rows = self.conn.execute(
+            "SELECT data FROM posts ORDER BY rowid DESC LIMIT ?", (max(int(n), 0),)
+        ).fetchall()
+        return [json.loads(d) for (d,) in reversed(rows)]
+
+    def get(self, tweet_id: str) -> Optional[dict]:
+        row = self.conn.execute(
+            "SELECT data FROM posts WHERE tweet_id = ?", (str(tweet_id),)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def rollup(
+        self,
+        *,
+        group_by: Iterable[str] = ("hookCategory",),
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        days: Optional[int] = None,
+        tweet_types: Optional[Iterable[str]] = None,
+        exclude_tweet_types: Iterable[str] = (),
+        exclude_categories: Iterable[str] = (),
+        fetched_only: bool = True,
+    ) -> list[dict]:
+        """engagement_rollup を group_by で集計して返す（O(グループ数)）。
+
+        since/until は postedAt の日付 (YYYY-MM-DD, 両端含む)。days を指定すると
+        今日を含む直近 days 日を対象にする。fetched_only=False なら未取得の投稿も
+        件数に含める（指標は 0 扱い）。各行は group_by のキーに加えて
+        n / *_sum / *_sq と avg_imp / avg_likes / avg_rt / std_imp を持つ。
+        """
+        group_by = tuple(group_by)
+        unknown = [k for k in group_by if k not in _ROLLUP_KEYS]
+        if unknown:
+            raise ValueError(f"group_by に使えないキー: {unknown}")
+        if days is not None:
+            since = (date.today() - timedelta(days=days - 1)).isoformat()
+
+        where = []
+        params: list[Any] = []
+        if since:
+            where.append("day >= ?")
+            params.append(since)
+        if until:
+            where.append("day <= ?")
+            params.append(until)
+        if "hour" in group_by:
+            where.append("hour >= 0")
+        for col, values, op in (
+            ("tweet_type", tweet_types, "IN"),
+            ("tweet_type", exclude_tweet_types, "NOT IN"),
+            ("hookCategory", exclude_categories, "NOT IN"),
+        ):
+            values = list(values) if values is not None else None
+            if values:
+                where.append(f"{col} {op} ({', '.join('?' * len(values))})")
+                params.extend(values)
+
+        select = ", ".join(group_by + tuple(f"SUM({v}) AS {v}" for v in _ROLLUP_VALUES))
+        sql = f"SELECT {select} FROM engagement_rollup"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        if group_by:
+            sql += f" GROUP BY {', '.join(group_by)}"
+
+        rows = []
+        cur = self.conn.execute(sql, params)
+        names = [d[0] for d in cur.description]
+        for values in cur:
+            row = dict(zip(names, values))
+            n = row["fetched"] if fetched_only else row["posts"]
+            if not n:
+                continue
+            row["n"] = n
+            row["avg_imp"] = row["imp_sum"] / n
+            row["avg_likes"] = row["likes_sum"] / n
+            row["avg_rt"] = row["rt_sum"] / n
+            row["std_imp"] = max(row["imp_sq"] / n - row["avg_imp"] ** 2, 0.0) ** 0.5
+            rows.append(row)
+        return rows
+
+    def load(self) -> dict:
+        """hook_performance.json 互換の dict を返す"""
+        data: dict[str, Any] = {"version": "1.0"}
+        meta = self._all_meta()
+        data.update(meta)
+        self._meta_keys = set(meta)
+        posts = []
+        snapshot = {}
+        for tid, raw in self.conn.execute("SELECT tweet_id, data FROM posts ORDER BY rowid"):
+            posts.append(json.loads(raw))
+            snapshot[tid] = raw
+        data["posts"] = posts
+        self._snapshot = snapshot
+        return data
+
+    # ---- write ----
+
+    def add_post(self, post: dict) -> None:
+        """投稿1件を追加（既存なら上書き）"""
+        self.upsert_posts([post])
+
+    def upsert_posts(self, posts: Iterable[dict]) -> int:
+        posts = list(posts)
+        rows = [_row(p) for p in posts]
+        if not rows:
+            return 0
+        with self.conn:
+            self.conn.executemany(UPSERT_SQL, rows)
+            self._append_series(posts)
+        for row in rows:
+            self._snapshot[row[0]] = row[4]
+        return len(rows)
+
+    def save(self, data: dict) -> int:
+        """load() 以降に変更・追加された投稿とメタ情報だけを書き込む。返り値は書き込んだ投稿数。
+
+        data から消したメタ情報のキーは DB からも削除する。
+        """
+        rows = []
+        changed = []
+        for post in data.get("posts", []):
+            tid = str(post["tweet_id"])
+            serialized = _dumps(post)
+            if self._snapshot.get(tid) != serialized:
+                rows.append(_row(post, serialized))
+                changed.append(post)
+        meta = {k: v for k, v in data.items() if k != "posts"}
+        removed = self._meta_keys - meta.keys()
+        with self.conn:
+            if rows:
+                self.conn.executemany(UPSERT_SQL, rows)
+                self._append_series(changed)
+            if meta:
+                self._write_meta(meta)
+            if removed:
+                self._delete_meta(removed)
+        for row in rows:
+            self._snapshot[row[0]] = row[4]
+        self._meta_keys = set(meta)
+        return len(rows)
+
+    # ---- engagement time series ----
+
+    def _series_blobs(self, tweet_ids: list[str]) -> dict[str, tuple[int, bytes]]:
+        blobs = {}
+        for i in range(0, len(tweet_ids), 500):
+            chunk = tweet_ids[i:i + 500]
+            cur = self.conn.execute(
+                f"SELECT tweet_id, posted_ts, data FROM metric_series WHERE tweet_id IN ({', '.join('?' * len(chunk))})",
+                chunk,
+            )
+            blobs.update((tid, (posted_ts, data)) for tid, posted_ts, data in cur)
+        return blobs
+
+    def _append_series(self, posts: list[dict]) -> int:
+        """エンゲージメント取得済みの投稿の指標を時系列に追記する（呼び出し側のトランザクション内）"""
+        samples = {}
+        for post in posts:
+            posted_ts = metric_series.to_epoch(post.get("postedAt"))
+            fetched_ts = metric_series.to_epoch(post.get("engagementFetchedAt"))
+            if posted_ts is None or fetched_ts is None:
+                continue
+            samples[str(post["tweet_id"])] = (posted_ts, fetched_ts - posted_ts, metric_series.metric_values(post))
+        if not samples:
+            return 0
+
+        existing = self._series_blobs(list(samples))
+        rows = []
+        for tid, (posted_ts, offset, values) in samples.items():
+            blob = existing.get(tid, (None, None))[1]
+            new = metric_series.append(blob, offset, values)
+            if new is not None:
+                rows.append((tid, posted_ts, new))
+        self.conn.executemany(SERIES_UPSERT_SQL, rows)
+        return len(rows)
+
+    def series(self, tweet_id: str) -> list[tuple[int, ...]]:
+        """(経過秒, impressions, likes, retweets) のサンプル列（古い順）"""
+        row = self._series_blobs([str(tweet_id)]).get(str(tweet_id))
+        return metric_series.decode(row[1]) if row else []
+
+    def values_at(
+        self, tweet_ids: Iterable[str], hours: Iterable[int] = (1, 6, 24)
+    ) -> dict[str, dict[int, Optional[dict]]]:
+        """投稿ごとに t+hours 時点の {impressions, likes, retweets} を返す（未観測は None）"""
+        hours = tuple(hours)
+        ids = [str(t) for t in tweet_ids]
+        blobs = self._series_blobs(ids)
+        result = {}
+        for tid in ids:
+            samples = metric_series.decode(blobs[tid][1]) if tid in blobs else []
+            result[tid] = {h: metric_series.value_at(samples, h * 3600) for h in hours}
+        return result
+
+    def compact_series(self, min_age_hours: int = metric_series.COMPACT_AFTER // 3600) -> int:
+        """投稿から min_age_hours 以上経った時系列を間引く。返り値は書き換えた件数"""
+        cutoff = int(time.time()) - min_age_hours * 3600
+        rows = []
+        for tid, posted_ts, blob in self.conn.execute(
+            "SELECT tweet_id, posted_ts, data FROM metric_series WHERE posted_ts < ?", (cutoff,)
+        ):
+            samples = metric_series.decode(blob)
+            thinned = metric_series.downsample(samples)
+            if len(thinned) < len(samples):
+                rows.append((tid, posted_ts, metric_series.encode(thinned)))
+        with self.conn:
+            self.conn.executemany(SERIES_UPSERT_SQL, rows)
+        return len(rows)
+
+    # ---- JSON import / export ----
+
+    def import_json(self, path: Path = HOOK_PERF_FILE) -> int:
+        """hook_performance.json を取り込む（同じ tweet_id は JSON 側で上書き）"""
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if not isinstance(data, dict):
+            raise ValueError(f"{path} がdict以外: {type(data).__name__}")
+        posts = [p for p in data.get("posts", []) if isinstance(p, dict) and p.get("tweet_id")]
+        meta = {k: v for k, v in data.items() if k != "posts"}
+        with self.conn:
+            self.conn.executemany(UPSERT_SQL, [_row(p) for p in posts])
+            self._append_series(posts)
+            if meta:
+                self._write_meta(meta)
+        return len(posts)
+
+    def export_json(self, path: Path = HOOK_PERF_FILE) -> int:
+        """従来形式の hook_performance.json を書き出す"""
+        data = self.load()
+        path = Path(path)
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, path)
+        return len(data["posts"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="hook_performance ストア管理")
+    parser.add_argument("--db", type=Path, default=DB_FILE, help=f"SQLite ファイル (default: {DB_FILE.name})")
+    parser.add_argument("--import-json", nargs="?", const=HOOK_PERF_FILE, type=Path, metavar="PATH",
+                        help="JSON を取り込む (default: hook_performance.json)")
+    parser.add_argument("--export-json", nargs="?", const=HOOK_PERF_FILE, type=Path, metavar="PATH",
+                        help="JSON に書き出す (default: hook_performance.json)")
+    parser.add_argument("--compact-series", action="store_true",
+                        help="古い投稿のエンゲージメント時系列を間引く")
+    args = parser.parse_args()
+
+    with PerfStore(args.db, auto_import=False) as store:
+        if args.import_json:
+            n = store.import_json(args.import_json)
+            print(f"インポート完了: {n}件 ← {args.import_json}")
+        if args.export_json:
+            n = store.export_json(args.export_json)
+            print(f"エクスポート完了: {n}件 → {args.export_json}")
+        if args.compact_series:
+            n = store.compact_series()
+            print(f"時系列を間引き: {n}件")
+        print(f"投稿数: {store.count()}件 ({args.db})")
+
+
+if __name__ == "__main__":
+    main()
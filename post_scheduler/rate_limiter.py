@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+X API rate-limit scheduler.
+Keeps one token bucket per endpoint, learned from the x-rate-limit-* response
+headers, and makes callers wait for the window reset instead of failing with 429.
+Bucket state is mirrored to analytics/x_rate_limits.json for the dashboard;
+routine header updates are written at most every SAVE_INTERVAL_SECONDS, while
+a new reset window or an exhausted bucket is written at once.
+"""
+
+import asyncio
+import atexit
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Mapping, Optional
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+STATE_FILE = PROJECT_DIR / "analytics" / "x_rate_limits.json"
+
+# 429 で reset ヘッダーがない時の待ち時間（X の窓は15分）
+DEFAULT_BACKOFF_SECONDS = 60.0
+# これより長く待つ必要があれば諦めて RateLimitExceeded を送出する
+DEFAULT_MAX_WAIT_SECONDS = 15 * 60 + 5
+# reset 時刻ちょうどだとまだ弾かれることがあるので少し余裕を持たせる
+RESET_MARGIN_SECONDS = 1.0
+# 残り回数が減っただけの更新はこの間隔でまとめて保存する（ダッシュボード表示用）
+SAVE_INTERVAL_SECONDS = 5.0
+
+
+class RateLimitExceeded(RuntimeError):
+    def __init__(self, endpoint: str, wait_seconds: float):
+        super().__init__(f"{endpoint}: rate limit reset まで {wait_seconds:.0f}秒（待機上限超過）")
+        self.endpoint = endpoint
+        self.wait_seconds = wait_seconds
+
+
+class TokenBucket:
+    """1エンドポイント分の枠。limit/reset はレスポンスヘッダーから学習する"""
+
+    __slots__ = ("limit", "remaining", "reset_at", "updated_at")
+
+    def __init__(self):
+        self.limit: Optional[int] = None
+        self.remaining: Optional[int] = None  # None = 未学習（制限なしとして扱う）
+        self.reset_at: Optional[float] = None
+        self.updated_at: Optional[float] = None
+
+    def _refill(self, now: float) -> None:
+        if self.reset_at is not None and now >= self.reset_at:
+            self.remaining = self.limit
+            self.reset_at = None
+
+    def reserve(self, now: float) -> float:
+        """1回分の枠を確保する。確保できれば 0、できなければ待つべき秒数を返す"""
+        self._refill(now)
+        if self.remaining is None:
+            return 0.0
+        if self.remaining > 0:
+            self.remaining -= 1
+            return 0.0
+        if self.reset_at is None:
+            # 枠切れだが reset が不明: 学習し直すまで一度だけ通す
+            self.remaining = None
+            return 0.0
+        return self.reset_at - now + RESET_MARGIN_SECONDS
+
+    def update(self, headers: Mapping[str, str], now: float) -> bool:
+        """x-rate-limit-* ヘッダーを取り込む。ヘッダーがなければ False"""
+        try:
+            limit = int(headers["x-rate-limit-limit"])
+            remaining = int(headers["x-rate-limit-remaining"])
+            reset_at = float(headers["x-rate-limit-reset"])
+        except (KeyError, TypeError, ValueError):
+            return False
+        if self.reset_at == reset_at and self.remaining is not None:
+            # 同じ窓の応答が前後して届いても枠を増やさない
+            remaining = min(remaining, self.remaining)
+        self.limit = limit
+        self.remaining = remaining
+        self.reset_at = reset_at
+        self.updated_at = now
+        return True
+
+    def exhaust(self, headers: Mapping[str, str], now: float) -> None:
+        """429 を受けた: reset まで枠を0にする"""
+        if not self.update(headers, now):
+            self.reset_at = now + DEFAULT_BACKOFF_SECONDS
+            self.updated_at = now
+        self.remaining = 0
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "remaining": self.remaining,
+            "reset_at": self.reset_at,
+            "updated_at": self.updated_at,
+        }
+
+
+class RateLimiter:
+    """エンドポイントごとの TokenBucket を持つスケジューラー（スレッド・asyncio 両対応）"""
+
+    def __init__(
+        self,
+        state_file: Optional[Path] = STATE_FILE,
+        *,
+        max_wait_seconds: float = DEFAULT_MAX_WAIT_SECONDS,
+    ):
+        self.state_file = Path(state_file) if state_file else None
+        self.max_wait_seconds = max_wait_seconds
+        self._buckets: dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        # 最後に保存した時刻と、それ以降に保存していない変更があるか
+        self._saved_at = 0.0
+        self._dirty = False
+        if self.state_file:
+            atexit.register(self.flush)
+
+    def _bucket(self, endpoint: str) -> TokenBucket:
+        bucket = self._buckets.get(endpoint)
+        if bucket is None:
+            bucket = self._buckets[endpoint] = TokenBucket()
+        return bucket
+
+    def reserve(self, endpoint: str) -> float:
+        with self._lock:
+            wait = self._bucket(endpoint).reserve(time.time())
+        if wait > self.max_wait_seconds:
+            raise RateLimitExceeded(endpoint, wait)
+        return wait
+
+    def wait(self, endpoint: str) -> float:
+        """枠が空くまでブロックする。返り値は待った秒数"""
+        waited = 0.0
+        while (delay := self.reserve(endpoint)) > 0:
+            print(f"[rate-limit] {endpoint}: {delay:.0f}秒待機")
+            time.sleep(delay)
+            waited += delay
+        return waited
+
+    async def wait_async(self, endpoint: str) -> float:
+        waited = 0.0
+        while (delay := self.reserve(endpoint)) > 0:
+            print(f"[rate-limit] {endpoint}: {delay:.0f}秒待機")
+            await asyncio.sleep(delay)
+            waited += delay
+        return waited
+
+    def update(self, endpoint: str, headers: Mapping[str, str]) -> None:
+        now = time.time()
+        with self._lock:
+            bucket = self._bucket(endpoint)
+            reset_at = bucket.reset_at
+            if not bucket.update(headers, now):
+                return
+            # 窓が変わった・枠を使い切った時はすぐ、それ以外は間隔を空けて保存する
+            urgent = bucket.reset_at != reset_at or bucket.remaining == 0
+            self._dirty = True
+        if urgent or now - self._saved_at >= SAVE_INTERVAL_SECONDS:
+            self._save()
+
+    def exhaust(self, endpoint: str, headers: Mapping[str, str]) -> None:
+        with self._lock:
+            self._bucket(endpoint).exhaust(headers, time.time())
+            self._dirty = True
+        self._save()
+
+    def flush(self) -> None:
+        """保存を間引いた変更を書き出す（終了時にも呼ぶ）"""
+        if self._dirty:
+            self._save()
+
+    def snapshot(self) -> dict[str, dict[str, Any]]:
+        with self._lock:
+            return {name: bucket.to_dict() for name, bucket in self._buckets.items()}
+
+    def _save(self) -> None:
+        if not self.state_file:
+            return
+        with self._save_lock:
+            # 他プロセスが書いたエンドポイントの状態は残し、自分の分だけ上書きする
+            buckets = load_state(self.state_file)
+            with self._lock:
+                buckets.update({name: bucket.to_dict() for name, bucket in self._buckets.items()})
+                self._dirty = False
+            self._saved_at = time.time()
+            state = {"saved_at": self._saved_at, "buckets": buckets}
+            try:
+                self.state_file.parent.mkdir(parents=True, exist_ok=True)
+                tmp = self.state_file.with_name(f"{self.state_file.name}.{os.getpid()}.tmp")
+                tmp.write_text(json.dumps(state, ensure_ascii=False, indent=2), encoding="utf-8")
+                os.replace(tmp, self.state_file)
+            except OSError:
+                pass
+
+
+def load_state(state_file: Path = STATE_FILE) -> dict[str, dict[str, Any]]:
+    """別プロセス（ダッシュボード）から最後に保存された枠の状態を読む"""
+    try:
+        state = json.loads(Path(state_file).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    buckets = state.get("buckets") if isinstance(state, dict) else None
+    return buckets if isinstance(buckets, dict) else {}
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+ホッケ エンゲージメント再取得プランナー
+check_engagement の1回の実行で再取得する tweet_id を決める。
+
+- 若い投稿ほど短い間隔で、古い投稿は経過時間に比例して間隔を広げる
+- 期限を過ぎた度合い（前回取得からの経過 / 再取得間隔）が大きい順に選ぶ
+- 1回の実行の post_read 予算（USD）を cost_logger.UNIT_PRICES で件数に換算して上限とする
+- GET /2/tweets の上限に合わせて100件ずつのバッチに詰める
+"""
+
+import math
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Optional
+
+from cost_logger import UNIT_PRICES
+from metric_series import parse_jst
+
+BATCH_SIZE = 100
+
+# 初回取得までの待ち時間（t+1h の時系列を取るため）
+MIN_AGE_HOURS = 1.0
+# 再取得間隔 = 経過時間 × INTERVAL_RATIO（MIN〜MAX に収める）
+INTERVAL_RATIO = 0.25
+MIN_INTERVAL_HOURS = 1.0
+MAX_INTERVAL_HOURS = 24.0 * 30
+# これより古い投稿は再取得しない
+MAX_AGE_DAYS = 90
+
+
+@dataclass
+class RefreshPlan:
+    tweet_ids: list[str] = field(default_factory=list)
+    due: int = 0  # 予算を無視した場合の対象件数
+    unit_price: float = 0.0
+
+    @property
+    def batches(self) -> list[list[str]]:
+        return [self.tweet_ids[i:i + BATCH_SIZE] for i in range(0, len(self.tweet_ids), BATCH_SIZE)]
+
+    @property
+    def units(self) -> int:
+        return len(self.tweet_ids)
+
+    @property
+    def estimated_usd(self) -> float:
+        return round(self.units * self.unit_price, 6)
+
+
+def refresh_interval_hours(age_hours: float) -> float:
+    return min(max(age_hours * INTERVAL_RATIO, MIN_INTERVAL_HOURS), MAX_INTERVAL_HOURS)
+
+
+def plan_refresh(
+    posts: list[dict],
+    *,
+    budget_usd: float,
+    now: Optional[datetime] = None,
+    max_age_days: int = MAX_AGE_DAYS,
+) -> RefreshPlan:
+    """再取得する tweet_id を優先度順に選び、予算内に収めた RefreshPlan を返す"""
+    now = now or datetime.now(timezone.utc)
+    unit_price = UNIT_PRICES["post_read"]
+    max_units = math.floor(budget_usd / unit_price + 1e-9) if unit_price > 0 else len(posts)
+
+    scored = []
+    for post in posts:
+        posted_at = parse_jst(post.get("postedAt"))
+        if not post.get("tweet_id") or posted_at is None:
+            continue
+        age_hours = (now - posted_at).total_seconds() / 3600
+        if age_hours < MIN_AGE_HOURS or age_hours > max_age_days * 24:
+            continue
+        fetched_at = parse_jst(post.get("engagementFetchedAt"))
+        since_hours = (now - fetched_at).total_seconds() / 3600 if fetched_at else age_hours
+        overdue = since_hours / refresh_interval_hours(age_hours)
+        if overdue >= 1.0:
+            scored.append((overdue, str(post["tweet_id"])))
+
+    scored.sort(key=lambda x: -x[0])
+    return RefreshPlan(
+        tweet_ids=[tid for _, tid in scored[:max_units]],
+        due=len(scored),
+        unit_price=unit_price,
+    )
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+X API retry layer.
+Retries transient failures with full-jitter exponential backoff and stops calling
+an endpoint that keeps failing (circuit breaker). The caller decides which
+exceptions are transient and which retry policy an endpoint class gets.
+"""
+
+import asyncio
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    max_attempts: int
+    base_delay: float
+    max_delay: float
+
+    def delay(self, retry: int) -> float:
+        """retry 回目（0始まり）の待ち秒数。0〜指数上限の一様乱数（full jitter）"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** retry)))
+
+
+# 読み取り系は何度でも安全に再送できる
+READ_RETRY = RetryPolicy(max_attempts=4, base_delay=1.0, max_delay=20.0)
+# 作成系は重複防止策（x_api_client.create_tweet）とセットでのみ再送する
+CREATE_RETRY = RetryPolicy(max_attempts=3, base_delay=2.0, max_delay=20.0)
+
+
+class CircuitOpenError(RuntimeError):
+    def __init__(self, endpoint: str, retry_after: float):
+        super().__init__(f"{endpoint}: 連続失敗のため一時停止中（あと{retry_after:.0f}秒）")
+        self.endpoint = endpoint
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """エンドポイントごとのサーキットブレーカー。
+
+    一時的な失敗が failure_threshold 回続くと open になり、reset_timeout 秒間は
+    呼び出しを即座に CircuitOpenError で断る。経過後は1回だけ試し（half-open）、
+    成功すれば closed に戻り、失敗すれば再び open になる。
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 60.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures: dict[str, int] = {}
+        self._opened_at: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def state(self, endpoint: str) -> str:
+        with self._lock:
+            opened_at = self._opened_at.get(endpoint)
+            if opened_at is None:
+                return "closed"
+            return "open" if time.monotonic() - opened_at < self.reset_timeout else "half_open"
+
+    def before_call(self, endpoint: str) -> None:
+        with self._lock:
+            opened_at = self._opened_at.get(endpoint)
+            if opened_at is None:
+                return
+            elapsed = time.monotonic() - opened_at
+            if elapsed < self.reset_timeout:
+                raise CircuitOpenError(endpoint, self.reset_timeout - elapsed)
+            # half-open: この1回だけ通し、結果が出るまで他の呼び出しは止める
+            self._opened_at[endpoint] = time.monotonic()
+
+    def record_success(self, endpoint: str) -> None:
+        with self._lock:
+            self._failures.pop(endpoint, None)
+            self._opened_at.pop(endpoint, None)
+
+    def record_failure(self, endpoint: str) -> None:
+        with self._lock:
+            count = self._failures.get(endpoint, 0) + 1
+            self._failures[endpoint] = count
+            if count >= self.failure_threshold or endpoint in self._opened_at:
+                self._opened_at[endpoint] = time.monotonic()
+
+
+def _log_retry(endpoint: str, retry: int, delay: float, error: Exception) -> None:
+    print(f"[retry] {endpoint}: {retry}回目の再試行まで {delay:.1f}秒 ({type(error).__name__}: {error})")
+
+
+def call_with_retry(
+    endpoint: str,
+    fn: Callable[[], Any],
+    *,
+    policy: RetryPolicy,
+    breaker: CircuitBreaker,
+    is_retryable: Callable[[Exception], bool],
+) -> tuple[Any, int]:
+    """fn() を policy に従って再試行する。返り値は (結果, 再試行回数)"""
+    retries = 0
+    while True:
+        breaker.before_call(endpoint)
+        try:
+            result = fn()
+        except Exception as e:
+            if not is_retryable(e):
+                raise
+            breaker.record_failure(endpoint)
+            if retries + 1 >= policy.max_attempts:
+                raise
+            delay = policy.delay(retries)
+            retries += 1
+            _log_retry(endpoint, retries, delay, e)
+            time.sleep(delay)
+            continue
+        breaker.record_success(endpoint)
+        return result, retries
+
+
+async def call_with_retry_async(
+    endpoint: str,
+    fn: Callable[[], Awaitable[Any]],
+    *,
+    policy: RetryPolicy,
+    breaker: CircuitBreaker,
+    is_retryable: Callable[[Exception], bool],
+) -> tuple[Any, int]:
+    """call_with_retry の asyncio 版"""
+    retries = 0
+    while True:
+        breaker.before_call(endpoint)
+        try:
+            result = await fn()
+        except Exception as e:
+            if not is_retryable(e):
+                raise
+            breaker.record_failure(endpoint)
+            if retries + 1 >= policy.max_attempts:
+                raise
+            delay = policy.delay(retries)
+            retries += 1
+            _log_retry(endpoint, retries, delay, e)
+            await asyncio.sleep(delay)
+            continue
+        breaker.record_success(endpoint)
+        return result, retries
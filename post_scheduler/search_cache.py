@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+On-disk response cache for X recent search.
+Entries are keyed on the normalized query and request params. A fresh entry is
+served without calling the API; a stale one is refreshed with since_id so only
+tweets newer than the cached ones are fetched (and billed).
+"""
+
+import hashlib
+import json
+import os
+import time
+import unicodedata
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Optional
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+CACHE_DIR = PROJECT_DIR / "analytics" / "x_search_cache"
+
+# この秒数以内の結果は API を呼ばずにそのまま返す
+DEFAULT_TTL_SECONDS = 30 * 60
+# recent search の since_id は直近7日以内でないと弾かれるので、それより古い結果は捨てる
+MAX_CHAIN_AGE_SECONDS = 6 * 24 * 3600
+
+
+def normalize_query(query: str) -> str:
+    """全角/半角と空白の揺れだけを吸収する（OR などの演算子は大文字小文字を区別するので触らない）"""
+    return " ".join(unicodedata.normalize("NFKC", query).split())
+
+
+def cache_key(params: dict[str, Any]) -> str:
+    normalized = {k: str(v) for k, v in params.items() if k != "since_id"}
+    normalized["query"] = normalize_query(normalized.get("query", ""))
+    raw = json.dumps(normalized, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def _id(tweet: dict) -> int:
+    try:
+        return int(tweet.get("id", 0))
+    except (TypeError, ValueError):
+        return 0
+
+
+def _created_ts(tweet: dict) -> Optional[float]:
+    try:
+        return datetime.fromisoformat(str(tweet["created_at"]).replace("Z", "+00:00")).timestamp()
+    except (KeyError, ValueError):
+        return None
+
+
+def build_response(tweets: list[dict], users: list[dict]) -> dict:
+    """X API の検索レスポンスと同じ形に組み立てる"""
+    response: dict[str, Any] = {"meta": {"result_count": len(tweets)}}
+    if tweets:
+        response["data"] = tweets
+        response["meta"]["newest_id"] = str(tweets[0].get("id"))
+        response["meta"]["oldest_id"] = str(tweets[-1].get("id"))
+    if users:
+        response["includes"] = {"users": users}
+    return response
+
+
+@dataclass
+class CacheLookup:
+    key: str
+    entry: Optional[dict]
+    fresh: bool
+    chainable: bool = True
+
+    @property
+    def since_id(self) -> Optional[str]:
+        """stale なエントリを差分取得する時の since_id"""
+        if not self.entry or self.fresh or not self.chainable:
+            return None
+        return self.entry.get("newest_id")
+
+    def response(self) -> dict:
+        entry = self.entry or {}
+        return build_response(entry.get("tweets", []), entry.get("users", []))
+
+
+class SearchCache:
+    def __init__(self, cache_dir: Path = CACHE_DIR, *, ttl_seconds: float = DEFAULT_TTL_SECONDS):
+        self.cache_dir = Path(cache_dir)
+        self.ttl_seconds = ttl_seconds
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    def lookup(self, params: dict[str, Any], *, ttl: Optional[float] = None, now: Optional[float] = None) -> CacheLookup:
+        now = time.time() if now is None else now
+        ttl = self.ttl_seconds if ttl is None else ttl
+        key = cache_key(params)
+        try:
+            entry = json.loads(self._path(key).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return CacheLookup(key, None, False)
+        age = now - float(entry.get("fetched_at", 0) or 0)
+        tweets = entry.get("tweets")
+        if not isinstance(tweets, list) or age > MAX_CHAIN_AGE_SECONDS:
+            return CacheLookup(key, None, False)
+        newest_ts = _created_ts(tweets[0]) if tweets else None
+        chainable = newest_ts is not None and now - newest_ts <= MAX_CHAIN_AGE_SECONDS
+        return CacheLookup(key, entry, age <= ttl, chainable)
+
+    def store(
+        self,
+        lookup: CacheLookup,
+        data: dict,
+        max_results: int,
+        *,
+        now: Optional[float] = None,
+    ) -> tuple[dict, dict[str, int]]:
+        """取得結果をキャッシュ済みの結果とマージして保存する。
+
+        返り値は (呼び出し元に返すレスポンス, API を呼ばずに再利用した件数
+        {"post_read": n, "user_read": m})。マージ後は新しい順に max_results 件で、
+        同じ検索を今取り直した場合と同じ結果になる。
+        """
+        now = time.time() if now is None else now
+        new_tweets = data.get("data", []) or []
+        new_users = data.get("includes", {}).get("users", []) or []
+        cached = lookup.entry if lookup.since_id else None
+
+        tweets = {str(t.get("id")): t for t in (cached or {}).get("tweets", [])}
+        tweets.update({str(t.get("id")): t for t in new_tweets})
+        merged = sorted(tweets.values(), key=_id, reverse=True)[:max_results]
+
+        users = {str(u.get("id")): u for u in (cached or {}).get("users", [])}
+        users.update({str(u.get("id")): u for u in new_users})
+        authors = {str(t.get("author_id")) for t in merged}
+        merged_users = [u for uid, u in users.items() if uid in authors]
+
+        new_tweet_ids = {str(t.get("id")) for t in new_tweets}
+        new_user_ids = {str(u.get("id")) for u in new_users}
+        saved = {
+            "post_read": sum(1 for t in merged if str(t.get("id")) not in new_tweet_ids),
+            "user_read": sum(1 for u in merged_users if str(u.get("id")) not in new_user_ids),
+        }
+
+        entry = {
+            "fetched_at": now,
+            "newest_id": str(merged[0].get("id")) if merged else (cached or {}).get("newest_id"),
+            "tweets": merged,
+            "users": merged_users,
+        }
+        self._write(lookup.key, entry)
+        self.prune(now=now)
+        return build_response(merged, merged_users), saved
+
+    def _write(self, key: str, entry: dict) -> None:
+        path = self._path(key)
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+            tmp.write_text(json.dumps(entry, ensure_ascii=False), encoding="utf-8")
+            os.replace(tmp, path)
+        except OSError:
+            pass
+
+    def prune(self, *, now: Optional[float] = None) -> int:
+        """差分取得にも使えなくなったエントリを削除する"""
+        now = time.time() if now is None else now
+        removed = 0
+        for path in self.cache_dir.glob("*.json"):
+            try:
+                if now - path.stat().st_mtime > MAX_CHAIN_AGE_SECONDS:
+                    path.unlink()
+                    removed += 1
+            except OSError:
+                continue
+        return removed
@@ -16,7 +16,7 @@ except ImportError:
     exit(1)
 
 load_dotenv()
-from x_api_client import XApiClient
+from x_api_client import UNAVAILABLE_ERRORS, XApiClient
 
 class TrendWatcher:
     """Xのトレンドを監視する"""
@@ -41,7 +41,7 @@ class TrendWatcher:
                 print(f"トレンド取得成功: {len(trends[0]['trends'])}件")
                 return trends[0]['trends']
             return []
-        except tweepy.TweepyException as e:
+        except (tweepy.TweepyException, *UNAVAILABLE_ERRORS) as e:
             print(f"トレンド取得エラー: {e}")
             return []
 
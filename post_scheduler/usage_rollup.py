@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Range and rollup analytics over the day-partitioned X API usage log.
+Days are streamed one at a time (closed days from their summary sidecar, open
+days record by record), so memory stays bounded by the number of distinct
+keys rather than the number of rows, however long the range.
+"""
+
+from datetime import date, datetime, timedelta
+from typing import Iterator, Optional
+
+import cost_logger
+from budget_guard import BudgetGuard
+from usage_summary import TOP_QUERIES, UsageSummary
+
+PERIODS = ("day", "week", "month")
+
+
+def iter_days(start: date, end: date) -> Iterator[date]:
+    day = start
+    while day <= end:
+        yield day
+        day += timedelta(days=1)
+
+
+def period_key(day: date, period: str) -> str:
+    """day → 2026-03-15 / week → 2026-W11（ISO週, 月曜始まり） / month → 2026-03"""
+    if period == "day":
+        return day.isoformat()
+    if period == "week":
+        year, week, _ = day.isocalendar()
+        return f"{year}-W{week:02d}"
+    if period == "month":
+        return day.strftime("%Y-%m")
+    raise ValueError(f"unknown period: {period}")
+
+
+def rollup(
+    start: date,
+    end: date,
+    period: Optional[str] = None,
+    *,
+    max_queries: Optional[int] = TOP_QUERIES,
+) -> dict:
+    """start〜end の合計（summarize と同じ形）と、period ごとの小計を返す。
+
+    start が end の月の月初以前なら、その月の合計を month_to_date_usd に入れる
+    （project_month_end に渡せば日別の summary を読み直さずに済む）。
+    """
+    total = UsageSummary()
+    month_first = end.replace(day=1)
+    month_usd = 0.0
+    periods: list[dict] = []
+    current: Optional[UsageSummary] = None
+    current_key = ""
+    current_from: Optional[date] = None
+
+    def _close(last: date) -> None:
+        result = current.to_dict(max_queries)
+        result.update({"period": current_key, "from": current_from.isoformat(), "to": last.isoformat()})
+        periods.append(result)
+
+    prev: Optional[date] = None
+    for day in iter_days(start, end):
+        day_summary = cost_logger.load_day_summary(day.isoformat())
+        total.merge(day_summary)
+        if day >= month_first:
+            month_usd += float(day_summary.get("estimated_total_usd", 0.0) or 0.0)
+        if period is None:
+            continue
+        key = period_key(day, period)
+        if current is None or key != current_key:
+            if current is not None:
+                _close(prev)
+            current, current_key, current_from = UsageSummary(), key, day
+        current.merge(day_summary)
+        prev = day
+    if current is not None:
+        _close(prev)
+
+    result = total.to_dict(max_queries)
+    result.update({"from": start.isoformat(), "to": end.isoformat()})
+    if start <= month_first:
+        result["month_to_date_usd"] = round(month_usd, 6)
+    if period is not None:
+        result["rollup"] = period
+        result["periods"] = periods
+    return result
+
+
+def project_month_end(
+    as_of: date,
+    now: Optional[datetime] = None,
+    *,
+    month_to_date_usd: Optional[float] = None,
+) -> dict:
+    """as_of の月の月初〜as_of の実績から、月末時点の支出を日割りで見積もる。
+
+    month_to_date_usd（rollup の結果）を渡せば日別の summary は読まない。
+    """
+    now = now or datetime.now()
+    first = as_of.replace(day=1)
+    days_in_month = ((first + timedelta(days=32)).replace(day=1) - first).days
+    if month_to_date_usd is not None:
+        spent = month_to_date_usd
+    else:
+        spent = sum(
+            float(cost_logger.load_day_summary(day.isoformat()).get("estimated_total_usd", 0.0) or 0.0)
+            for day in iter_days(first, as_of)
+        )
+    elapsed = float((as_of - first).days + 1)
+    if as_of == now.date():
+        # 今日は途中までしか使っていないので、経過した分だけ数える
+        elapsed -= 1 - (now - datetime.combine(as_of, datetime.min.time())).total_seconds() / 86400
+    # 日付が変わった直後に極端な見積もりを出さないよう、最低1時間分として扱う
+    daily_average = spent / max(elapsed, 1 / 24)
+    projected = daily_average * days_in_month
+    budget = BudgetGuard.from_env(register=False).monthly_usd
+    return {
+        "month": first.strftime("%Y-%m"),
+        "as_of": as_of.isoformat(),
+        "days_in_month": days_in_month,
+        "month_to_date_usd": round(spent, 6),
+        "daily_average_usd": round(daily_average, 6),
+        "projected_usd": round(projected, 6),
+        "monthly_budget_usd": budget,
+        "projected_over_budget": budget is not None and projected > budget,
+    }
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Mergeable X API usage summary.
+Accumulates cost-log records into totals by usage_type, endpoint, context and
+metadata query (plus the search cache counters). The same shape is used for the per-day sidecar files
+and the reports, so summaries of closed days can be merged without re-reading
+their records.
+"""
+
+from collections import defaultdict
+from typing import Any, Iterable, Optional
+
+# Queries kept in a report; sidecars keep every query so they stay mergeable
+TOP_QUERIES = 20
+
+
+def _bucket() -> dict[str, Any]:
+    return {"units": 0, "events": 0, "cost": 0.0}
+
+
+class UsageSummary:
+    def __init__(self):
+        self.events = 0
+        self.total_usd = 0.0
+        self.by_type: dict[str, dict[str, Any]] = defaultdict(_bucket)
+        self.by_endpoint: dict[str, dict[str, Any]] = defaultdict(_bucket)
+        self.by_context: dict[str, dict[str, Any]] = defaultdict(_bucket)
+        self.by_query: dict[str, dict[str, Any]] = defaultdict(_bucket)
+        self.cache_counts = {"hit": 0, "since_id": 0, "miss": 0}
+        self.units_saved: dict[str, int] = defaultdict(int)
+        self.saved_usd = 0.0
+
+    def add(self, r: dict) -> None:
+        usage_type = r.get("usage_type", "unknown")
+        endpoint = r.get("endpoint", "unknown")
+        units = int(r.get("units", 0) or 0)
+        cost = float(r.get("estimated_cost_usd", 0.0) or 0.0)
+        meta = r.get("metadata") or {}
+        buckets = [self.by_type[usage_type], self.by_endpoint[endpoint], self.by_context[r.get("context") or "unknown"]]
+        if meta.get("query"):
+            buckets.append(self.by_query[str(meta["query"])])
+        for bucket in buckets:
+            bucket["units"] += units
+            bucket["cost"] += cost
+            bucket["events"] += 1
+        self.events += 1
+        self.total_usd += cost
+
+        cache = meta.get("cache")
+        if not cache:
+            return
+        if usage_type == "post_read" and cache in self.cache_counts:
+            self.cache_counts[cache] += 1
+        saved = int(meta.get("units_saved", 0) or 0)
+        if saved:
+            self.units_saved[usage_type] += saved
+            self.saved_usd += saved * float(r.get("unit_price_usd", 0.0) or 0.0)
+
+    def merge(self, summary: dict) -> None:
+        """to_dict() の結果（日次 sidecar など）を足し込む"""
+        self.events += int(summary.get("events", 0) or 0)
+        self.total_usd += float(summary.get("estimated_total_usd", 0.0) or 0.0)
+        for key, target in (
+            ("by_type", self.by_type),
+            ("by_endpoint", self.by_endpoint),
+            ("by_context", self.by_context),
+            ("by_query", self.by_query),
+        ):
+            for name, v in (summary.get(key) or {}).items():
+                target[name]["units"] += int(v.get("units", 0) or 0)
+                target[name]["events"] += int(v.get("events", 0) or 0)
+                target[name]["cost"] += float(v.get("cost", 0.0) or 0.0)
+        cache = summary.get("search_cache") or {}
+        self.cache_counts["hit"] += int(cache.get("hits", 0) or 0)
+        self.cache_counts["since_id"] += int(cache.get("since_id", 0) or 0)
+        self.cache_counts["miss"] += int(cache.get("misses", 0) or 0)
+        for usage_type, n in (cache.get("units_saved") or {}).items():
+            self.units_saved[usage_type] += int(n or 0)
+        self.saved_usd += float(cache.get("saved_usd", 0.0) or 0.0)
+
+    def search_cache(self) -> dict:
+        """検索キャッシュの照会回数・ヒット率と、課金せずに済んだ件数/金額"""
+        lookups = sum(self.cache_counts.values())
+        return {
+            "lookups": lookups,
+            "hits": self.cache_counts["hit"],
+            "since_id": self.cache_counts["since_id"],
+            "misses": self.cache_counts["miss"],
+            "hit_rate": round(self.cache_counts["hit"] / lookups, 4) if lookups else 0.0,
+            "units_saved": dict(self.units_saved),
+            "saved_usd": round(self.saved_usd, 6),
+        }
+
+    def to_dict(self, max_queries: Optional[int] = None) -> dict:
+        """max_queries を指定すると by_query をコストの大きい順にその件数まで絞る"""
+        def _rounded(buckets: dict[str, dict[str, Any]]) -> dict:
+            return {k: {"units": v["units"], "events": v["events"], "cost": round(v["cost"], 6)} for k, v in buckets.items()}
+
+        queries = self.by_query
+        if max_queries is not None and len(queries) > max_queries:
+            top = sorted(queries.items(), key=lambda x: (x[1]["cost"], x[1]["events"]), reverse=True)[:max_queries]
+            queries = dict(top)
+        return {
+            "events": self.events,
+            "estimated_total_usd": round(self.total_usd, 6),
+            "by_type": _rounded(self.by_type),
+            "by_endpoint": _rounded(self.by_endpoint),
+            "by_context": _rounded(self.by_context),
+            "by_query": _rounded(queries),
+            "search_cache": self.search_cache(),
+        }
+
+
+def summarize(rows: Iterable[dict], max_queries: Optional[int] = None) -> dict:
+    summary = UsageSummary()
+    for r in rows:
+        summary.add(r)
+    return summary.to_dict(max_queries)
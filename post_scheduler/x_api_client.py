@@ -4,24 +4,208 @@ Shared X API client.
 All X API calls should go through this module so cost logging is never skipped.
 """
 
+import asyncio
+import html
 import os
+import re
 from pathlib import Path
-from typing import Optional, Any
+from typing import Optional, Any, Iterator
 
 import requests
 import tweepy
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
 
+from budget_guard import BudgetExceeded, BudgetGuard, unit_cost
 from cost_logger import log_api_usage
+from rate_limiter import RateLimiter, RateLimitExceeded
+from retry_policy import (
+    CREATE_RETRY,
+    READ_RETRY,
+    CircuitBreaker,
+    CircuitOpenError,
+    RetryPolicy,
+    call_with_retry,
+    call_with_retry_async,
+)
+from search_cache import DEFAULT_TTL_SECONDS as SEARCH_CACHE_TTL_SECONDS, CacheLookup, SearchCache
 
 PROJECT_DIR = Path(__file__).resolve().parent.parent
 ENV_FILE = PROJECT_DIR / ".env"
 
 load_dotenv(ENV_FILE)
 
+API_BASE_URL = "https://api.x.com"
+# 1プロセスで同時に張る api.x.com への接続数
+DEFAULT_POOL_SIZE = 10
+# (connect, read) 秒
+DEFAULT_TIMEOUT = (5.0, 30.0)
+# 429 を受けて reset まで待った後に再送する回数
+RATE_LIMIT_RETRIES = 2
+
+# プロセス内の全クライアントで共有する（同じ枠を消費するため）
+RATE_LIMITER = RateLimiter()
+CIRCUIT_BREAKER = CircuitBreaker()
+SEARCH_CACHE = SearchCache()
+BUDGET_GUARD = BudgetGuard.from_env()
+
+# 待機・再試行しても API が使えない（または予算上呼べない）時に送出される例外
+UNAVAILABLE_ERRORS = (RateLimitExceeded, CircuitOpenError, BudgetExceeded)
+
+# 検索1件あたりの見積単価（ツイートと、最悪ツイートごとに別の著者）
+SEARCH_UNIT_USD = unit_cost("post_read", "user_read")
+# X API が受け付ける max_results の下限
+SEARCH_MIN_RESULTS = 10
+USER_TWEETS_MIN_RESULTS = 5
+
+
+SEARCH_RECENT_PATH = "/2/tweets/search/recent"
+SEARCH_ENDPOINT = f"GET {SEARCH_RECENT_PATH}"
+
+
+def _search_params(query: str, max_results: int) -> dict[str, Any]:
+    return {
+        "query": f"{query} -is:retweet -is:reply lang:ja",
+        "max_results": max(10, min(max_results, 100)),
+        "tweet.fields": "author_id,created_at,public_metrics",
+        "expansions": "author_id",
+        "user.fields": "username,public_metrics",
+    }
+
+
+def _mention_params(username: str, since_id: str | None, max_results: int) -> dict[str, Any]:
+    params = {
+        "query": f"@{username} -from:{username}",
+        "max_results": max(10, min(max_results, 100)),
+        "tweet.fields": "author_id,created_at,public_metrics,conversation_id",
+        "expansions": "author_id",
+        "user.fields": "username,public_metrics",
+    }
+    if since_id:
+        params["since_id"] = since_id
+    return params
+
+
+def _log_search(
+    data: dict,
+    context: str,
+    metadata: dict[str, Any],
+    *,
+    cache: Optional[str] = None,
+    saved: Optional[dict[str, int]] = None,
+) -> None:
+    """検索レスポンスの post_read / user_read を記録する（同期・非同期共通）。
+
+    cache は "hit" / "since_id" / "miss"、saved はキャッシュから再利用して
+    課金されなかった件数で、metadata.units_saved としてコストレポートに集計される。
+    """
+    tweets = data.get("data", []) or []
+    users = data.get("includes", {}).get("users", []) or []
+    saved = saved or {}
+    for usage_type, units, endpoint in (
+        ("post_read", len(tweets), "GET /2/tweets/search/recent"),
+        ("user_read", len(users), "GET /2/tweets/search/recent (includes.users)"),
+    ):
+        if usage_type == "user_read" and not units and not saved.get(usage_type):
+            continue
+        meta = dict(metadata)
+        if cache:
+            meta["cache"] = cache
+        if saved.get(usage_type):
+            meta["units_saved"] = saved[usage_type]
+        log_api_usage(usage_type, units, endpoint, context=context, metadata=meta)
+
+
+def _search_request(
+    cache: SearchCache, query: str, max_results: int, cache_ttl: Optional[float]
+) -> tuple[dict[str, Any], Optional[CacheLookup]]:
+    """検索パラメータとキャッシュの照会結果を返す（cache_ttl=None ならキャッシュしない）"""
+    params = _search_params(query, max_results)
+    lookup = cache.lookup(params, ttl=cache_ttl) if cache_ttl is not None else None
+    return params, lookup
+
+
+def _finish_search(
+    cache: SearchCache,
+    lookup: Optional[CacheLookup],
+    query: str,
+    params: dict[str, Any],
+    data: Optional[dict],
+    retries: int,
+) -> dict:
+    """API の結果（キャッシュヒットなら None）を記録し、呼び出し元に返すレスポンスを作る"""
+    context = "x_api_client.search_recent_tweets"
+    metadata = {"query": query, "max_results": params["max_results"]}
+    if lookup is None:
+        _log_search(data, context, _with_retries(metadata, retries))
+        return data
+    if data is None:
+        result = lookup.response()
+        _log_search({}, context, metadata, cache="hit", saved={
+            "post_read": len(result.get("data", [])),
+            "user_read": len(result.get("includes", {}).get("users", [])),
+        })
+        return result
+    chained = lookup.since_id is not None
+    result, saved = cache.store(lookup, data, params["max_results"])
+    _log_search(data, context, _with_retries(metadata, retries), cache="since_id" if chained else "miss", saved=saved)
+    return result
+
+
+def _is_transient(exc: Exception) -> bool:
+    """再送すれば通る見込みのある失敗（5xx・タイムアウト・接続断）"""
+    if isinstance(exc, (tweepy.TwitterServerError, requests.ConnectionError, requests.Timeout)):
+        return True
+    status = getattr(getattr(exc, "response", None), "status_code", None)
+    return isinstance(exc, requests.HTTPError) and status is not None and status >= 500
+
+
+_URL_RE = re.compile(r"https?://\S+")
+_TRAILING_URLS_RE = re.compile(r"(?:\s*<url>)+$")
+_LEADING_MENTIONS_RE = re.compile(r"^(?:@\w+\s+)+")
+
+
+def _comparable_text(text: str) -> str:
+    """X が返す本文と投稿時の本文を比べられる形にする。
+
+    X は本文を HTML エスケープして返し、URL を t.co に置き換え、
+    添付メディアの t.co URL を末尾に足す。
+    """
+    text = _URL_RE.sub("<url>", html.unescape(text).strip())
+    return _TRAILING_URLS_RE.sub("", text).strip()
+
+
+def _same_tweet_text(posted: str, text: str) -> bool:
+    """posted（タイムラインの本文）が text として投稿したものか。リプライ先の @メンションは無視する"""
+    posted, text = _comparable_text(posted), _comparable_text(text)
+    if not text:
+        return False
+    if posted == text:
+        return True
+    prefix = posted[: -len(text)] if posted.endswith(text) else ""
+    return bool(prefix) and _LEADING_MENTIONS_RE.fullmatch(prefix) is not None
+
+
+def _with_retries(metadata: dict[str, Any], retries: int) -> dict[str, Any]:
+    if retries:
+        metadata["retries"] = retries
+    return metadata
+
 
 class XApiClient:
-    def __init__(self, require_user_auth: bool = False, require_bearer: bool = False):
+    def __init__(
+        self,
+        require_user_auth: bool = False,
+        require_bearer: bool = False,
+        *,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        timeout: tuple[float, float] = DEFAULT_TIMEOUT,
+        base_url: str = API_BASE_URL,
+        rate_limiter: Optional[RateLimiter] = None,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+        search_cache: Optional[SearchCache] = None,
+        budget_guard: Optional[BudgetGuard] = None,
+    ):
         self.api_key = os.getenv("X_API_KEY")
         self.api_secret = os.getenv("X_API_SECRET")
         self.access_token = os.getenv("X_ACCESS_TOKEN")
@@ -32,6 +216,16 @@ class XApiClient:
         self.api_v1 = None
         self.client = None
 
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.base_url = base_url.rstrip("/")
+        self._session: Optional[requests.Session] = None
+        self._bearer_client: Optional[tweepy.Client] = None
+        self.rate_limiter = rate_limiter or RATE_LIMITER
+        self.circuit_breaker = circuit_breaker or CIRCUIT_BREAKER
+        self.search_cache = search_cache or SEARCH_CACHE
+        self.budget = budget_guard or BUDGET_GUARD
+
         if require_user_auth:
             self._init_user_auth()
         if require_bearer and not self.bearer_token:
@@ -61,6 +255,41 @@ class XApiClient:
             access_token_secret=self.access_token_secret,
         )
 
+    # ---- connection pool ----
+    @property
+    def session(self) -> requests.Session:
+        """bearer エンドポイント用の keep-alive セッション（初回アクセス時に作成）"""
+        if self._session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers.update({"Accept-Encoding": "gzip, deflate"})
+            self._session = session
+        return self._session
+
+    @property
+    def bearer_client(self) -> tweepy.Client:
+        if self._bearer_client is None:
+            if not self.bearer_token:
+                raise ValueError("X_BEARER_TOKEN が未設定")
+            self._bearer_client = tweepy.Client(bearer_token=self.bearer_token)
+        return self._bearer_client
+
+    def close(self) -> None:
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+        if self._bearer_client is not None:
+            self._bearer_client.session.close()
+            self._bearer_client = None
+
+    def __enter__(self) -> "XApiClient":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
     # ---- user-auth endpoints ----
     def verify_credentials(self) -> Any:
         if not self.api_v1:
@@ -109,7 +338,37 @@ class XApiClient:
         if quote_tweet_id:
             kwargs["quote_tweet_id"] = quote_tweet_id
 
-        response = self.client.create_tweet(**kwargs)
+        recovered = False
+        maybe_sent = False
+
+        def send() -> Any:
+            nonlocal recovered, maybe_sent
+            # 直前の送信が 5xx・読み取りタイムアウト等で失敗扱いでも、X 側では
+            # 投稿済みのことがある。再送する前に自分の直近の投稿を確かめ、
+            # あれば二重投稿せずそれを返す
+            if maybe_sent:
+                existing = self._find_own_recent_tweet(text)
+                if existing is not None:
+                    recovered = True
+                    return existing
+            try:
+                return self.client.create_tweet(**kwargs)
+            except tweepy.Forbidden as e:
+                # 投稿の反映が遅れて上の確認で見つからず、再送が重複エラーになった
+                if maybe_sent and "duplicate" in str(e).lower():
+                    existing = self._find_own_recent_tweet(text)
+                    if existing is not None:
+                        recovered = True
+                        return existing
+                raise
+            except Exception as e:
+                # 接続できずに終わった送信は X に届いていない
+                if not isinstance(e, requests.ConnectTimeout):
+                    maybe_sent = True
+                raise
+
+        with self.budget.reserve("POST /2/tweets", 1, unit_usd=unit_cost("content_create"), essential=True):
+            response, retries = self._call_tweepy("POST /2/tweets", send, policy=CREATE_RETRY)
 
         endpoint = "POST /2/tweets"
         if in_reply_to_tweet_id:
@@ -126,6 +385,9 @@ class XApiClient:
             event_meta["reply_to_tweet_id"] = str(in_reply_to_tweet_id)
         if quote_tweet_id:
             event_meta["quote_tweet_id"] = str(quote_tweet_id)
+        _with_retries(event_meta, retries)
+        if recovered:
+            event_meta["recovered_duplicate"] = True
 
         log_api_usage(
             "content_create",
@@ -136,10 +398,21 @@ class XApiClient:
         )
         return response
 
+    def _find_own_recent_tweet(self, text: str) -> Any:
+        """直近の自分の投稿から text と同じものを探し、create_tweet と同じ形の Response で返す"""
+        me = self.get_me()
+        for tweet in self.get_user_tweets(str(me.data.id), max_results=5):
+            if _same_tweet_text(tweet.text or "", text):
+                return tweepy.Response({"id": str(tweet.id), "text": tweet.text}, {}, [], {})
+        return None
+
     def get_place_trends(self, woeid: int, count: int = 50) -> list[dict]:
         if not self.api_v1:
             self._init_user_auth()
-        trends = self.api_v1.get_place_trends(woeid, count=count)
+        with self.budget.reserve(
+            "GET /1.1/trends/place", count, unit_usd=unit_cost("user_read"), min_units=1
+        ) as count:
+            trends = self.api_v1.get_place_trends(woeid, count=count)
         units = 0
         if trends and trends[0]:
             units = len(trends[0].get("trends", []))
@@ -171,111 +444,275 @@ class XApiClient:
             raise ValueError("X_BEARER_TOKEN が未設定")
         return {"Authorization": f"Bearer {self.bearer_token}"}
 
-    def search_recent_tweets(self, query: str, max_results: int = 10) -> dict:
-        url = "https://api.x.com/2/tweets/search/recent"
-        safe_max_results = max(10, min(max_results, 100))
-        params = {
-            "query": f"{query} -is:retweet -is:reply lang:ja",
-            "max_results": safe_max_results,
-            "tweet.fields": "author_id,created_at,public_metrics",
-            "expansions": "author_id",
-            "user.fields": "username,public_metrics",
-        }
-        resp = requests.get(url, headers=self._bearer_headers(), params=params)
-        resp.raise_for_status()
-        data = resp.json()
+    def _bearer_get(self, path: str, params: dict[str, Any]) -> tuple[dict, int]:
+        """GET して (JSON, 再試行回数) を返す"""
+        endpoint = f"GET {path}"
+        headers = self._bearer_headers()
 
-        tweets = data.get("data", []) or []
-        users = data.get("includes", {}).get("users", []) or []
-        log_api_usage(
-            "post_read",
-            len(tweets),
-            "GET /2/tweets/search/recent",
-            context="x_api_client.search_recent_tweets",
-            metadata={"query": query, "max_results": params["max_results"]},
+        def send() -> dict:
+            for attempt in range(RATE_LIMIT_RETRIES + 1):
+                self.rate_limiter.wait(endpoint)
+                resp = self.session.get(self.base_url + path, headers=headers, params=params, timeout=self.timeout)
+                if resp.status_code != 429:
+                    self.rate_limiter.update(endpoint, resp.headers)
+                    break
+                self.rate_limiter.exhaust(endpoint, resp.headers)
+            resp.raise_for_status()
+            return resp.json()
+
+        return call_with_retry(
+            endpoint, send, policy=READ_RETRY, breaker=self.circuit_breaker, is_retryable=_is_transient
         )
-        if users:
-            log_api_usage(
-                "user_read",
-                len(users),
-                "GET /2/tweets/search/recent (includes.users)",
-                context="x_api_client.search_recent_tweets",
-                metadata={"query": query, "max_results": params["max_results"]},
-            )
-        return data
+
+    def _call_tweepy(self, endpoint: str, call: Any, *, policy: RetryPolicy = READ_RETRY) -> tuple[Any, int]:
+        """tweepy 呼び出し call() を枠に合わせて待たせ、429 なら reset 後に、
+        一時的な失敗なら policy に従って再送する。返り値は (結果, 再試行回数)"""
+
+        def send() -> Any:
+            for attempt in range(RATE_LIMIT_RETRIES + 1):
+                self.rate_limiter.wait(endpoint)
+                try:
+                    return call()
+                except tweepy.TooManyRequests as e:
+                    self.rate_limiter.exhaust(endpoint, e.response.headers)
+                    if attempt == RATE_LIMIT_RETRIES:
+                        raise
+
+        return call_with_retry(
+            endpoint, send, policy=policy, breaker=self.circuit_breaker, is_retryable=_is_transient
+        )
+
+    def search_recent_tweets(
+        self, query: str, max_results: int = 10, *, cache_ttl: Optional[float] = SEARCH_CACHE_TTL_SECONDS
+    ) -> dict:
+        """直近7日の検索。cache_ttl 秒以内の同じ検索はキャッシュから返し、
+        それより古ければキャッシュより新しいツイートだけを取得する（None でキャッシュ無効）"""
+        params, lookup = _search_request(self.search_cache, query, max_results, cache_ttl)
+        if lookup is not None and lookup.fresh:
+            return _finish_search(self.search_cache, lookup, query, params, None, 0)
+        with self.budget.reserve(
+            SEARCH_ENDPOINT, params["max_results"], unit_usd=SEARCH_UNIT_USD, min_units=SEARCH_MIN_RESULTS
+        ) as allowed:
+            params["max_results"] = allowed
+            request = dict(params, since_id=lookup.since_id) if lookup and lookup.since_id else params
+            data, retries = self._bearer_get(SEARCH_RECENT_PATH, request)
+            return _finish_search(self.search_cache, lookup, query, params, data, retries)
 
     def search_mentions(self, username: str, since_id: str | None = None, max_results: int = 10) -> dict:
         """@username のメンションを検索（since_id 対応）"""
-        url = "https://api.x.com/2/tweets/search/recent"
-        query = f"@{username} -from:{username}"
-        params = {
-            "query": query,
-            "max_results": max(10, min(max_results, 100)),
-            "tweet.fields": "author_id,created_at,public_metrics,conversation_id",
-            "expansions": "author_id",
-            "user.fields": "username,public_metrics",
-        }
-        if since_id:
-            params["since_id"] = since_id
-        resp = requests.get(url, headers=self._bearer_headers(), params=params)
-        resp.raise_for_status()
-        data = resp.json()
-        tweets = data.get("data", []) or []
-        users = data.get("includes", {}).get("users", []) or []
-        log_api_usage(
-            "post_read",
-            len(tweets),
-            "GET /2/tweets/search/recent",
-            context="x_api_client.search_mentions",
-            metadata={"query": query},
-        )
-        if users:
-            log_api_usage(
-                "user_read",
-                len(users),
-                "GET /2/tweets/search/recent (includes.users)",
-                context="x_api_client.search_mentions",
-                metadata={"query": query},
-            )
+        params = _mention_params(username, since_id, max_results)
+        with self.budget.reserve(
+            SEARCH_ENDPOINT, params["max_results"], unit_usd=SEARCH_UNIT_USD, min_units=SEARCH_MIN_RESULTS
+        ) as allowed:
+            params["max_results"] = allowed
+            data, retries = self._bearer_get(SEARCH_RECENT_PATH, params)
+            _log_search(data, "x_api_client.search_mentions", _with_retries({"query": params["query"]}, retries))
         return data
 
-    def get_user_tweets(
+    def _get_user_tweets_page(
         self,
         user_id: str,
-        max_results: int = 100,
-        since_id: Optional[str] = None,
-    ) -> list[dict]:
+        max_results: int,
+        since_id: Optional[str],
+        pagination_token: Optional[str] = None,
+        start_time: Optional[str] = None,
+    ) -> tuple[list, Optional[str]]:
         if not self.client:
             self._init_user_auth()
         params: dict[str, Any] = {
-            "max_results": max(5, min(max_results, 100)),
+            "max_results": max(USER_TWEETS_MIN_RESULTS, min(max_results, 100)),
             "tweet_fields": ["created_at", "public_metrics", "non_public_metrics", "in_reply_to_user_id", "referenced_tweets"],
             "exclude": ["retweets"],
         }
         if since_id:
             params["since_id"] = since_id
-        response = self.client.get_users_tweets(user_id, user_auth=True, **params)
+        if pagination_token:
+            params["pagination_token"] = pagination_token
+        if start_time:
+            params["start_time"] = start_time
+        with self.budget.reserve(
+            "GET /2/users/:id/tweets",
+            params["max_results"],
+            unit_usd=unit_cost("post_read"),
+            min_units=USER_TWEETS_MIN_RESULTS,
+        ) as allowed:
+            params["max_results"] = allowed
+            response, retries = self._call_tweepy(
+                "GET /2/users/:id/tweets", lambda: self.client.get_users_tweets(user_id, user_auth=True, **params)
+            )
         data = response.data or []
+        next_token = (response.meta or {}).get("next_token")
         log_api_usage(
             "post_read",
             len(data),
             f"GET /2/users/{user_id}/tweets",
             context="x_api_client.get_user_tweets",
-            metadata={"max_results": params["max_results"], "since_id": since_id},
+            metadata=_with_retries({
+                "max_results": params["max_results"],
+                "since_id": since_id,
+                "paginated": bool(pagination_token),
+            }, retries),
         )
+        return data, next_token
+
+    def get_user_tweets(
+        self,
+        user_id: str,
+        max_results: int = 100,
+        since_id: Optional[str] = None,
+    ) -> list[dict]:
+        data, _ = self._get_user_tweets_page(user_id, max_results, since_id)
         return data
 
+    def iter_user_tweets(
+        self,
+        user_id: str,
+        since_id: Optional[str] = None,
+        pagination_token: Optional[str] = None,
+        max_results: int = 100,
+        start_time: Optional[str] = None,
+    ) -> Iterator[tuple[list, Optional[str]]]:
+        """since_id まで next_token を辿り、(ページのツイート, 次ページの token) を順に返す。
+
+        next_token を保存しておけば pagination_token に渡して途中から再開できる。
+        since_id がなければ start_time（ISO 8601, UTC）以降、それも無ければ API が返せる範囲の全履歴を辿る。
+        再開時は最初と同じ start_time を渡す。
+        """
+        token = pagination_token
+        while True:
+            tweets, token = self._get_user_tweets_page(user_id, max_results, since_id, token, start_time)
+            yield tweets, token
+            if not token:
+                return
+
     def get_tweets_public_metrics(self, tweet_ids: list[str]) -> Any:
-        if not self.bearer_token:
-            raise ValueError("X_BEARER_TOKEN が未設定")
-        client = tweepy.Client(bearer_token=self.bearer_token)
-        response = client.get_tweets(tweet_ids, tweet_fields=["public_metrics"])
+        with self.budget.reserve("GET /2/tweets", len(tweet_ids), unit_usd=unit_cost("post_read")):
+            response, retries = self._call_tweepy(
+                "GET /2/tweets", lambda: self.bearer_client.get_tweets(tweet_ids, tweet_fields=["public_metrics"])
+            )
         resource_count = len(response.data or []) if response else 0
         log_api_usage(
             "post_read",
             resource_count,
             "GET /2/tweets",
             context="x_api_client.get_tweets_public_metrics",
-            metadata={"requested_ids": len(tweet_ids)},
+            metadata=_with_retries({"requested_ids": len(tweet_ids)}, retries),
         )
         return response
+
+
+class AsyncXApiClient:
+    """bearer エンドポイントの非同期版（httpx）。
+
+    XApiClient と同じメソッド名・同じ log_api_usage の記録で、複数の検索や
+    メトリクス取得を同時に投げられる。同時実行数は max_concurrency で制限する。
+    get_tweets_public_metrics は tweepy の Response ではなく JSON (dict) を返す。
+
+        async with AsyncXApiClient() as client:
+            results = await asyncio.gather(*(client.search_recent_tweets(q) for q in queries))
+    """
+
+    def __init__(
+        self,
+        *,
+        max_concurrency: int = 4,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        timeout: tuple[float, float] = DEFAULT_TIMEOUT,
+        base_url: str = API_BASE_URL,
+        rate_limiter: Optional[RateLimiter] = None,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+        search_cache: Optional[SearchCache] = None,
+        budget_guard: Optional[BudgetGuard] = None,
+    ):
+        try:
+            import httpx
+        except ImportError as e:
+            raise ImportError("AsyncXApiClient には httpx が必要です: pip install httpx") from e
+
+        self.bearer_token = os.getenv("X_BEARER_TOKEN")
+        if not self.bearer_token:
+            raise ValueError("X_BEARER_TOKEN が未設定")
+
+        connect_timeout, read_timeout = timeout
+        self._client = httpx.AsyncClient(
+            base_url=base_url.rstrip("/"),
+            headers={"Authorization": f"Bearer {self.bearer_token}", "Accept-Encoding": "gzip, deflate"},
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+        )
+        self._httpx = httpx
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.rate_limiter = rate_limiter or RATE_LIMITER
+        self.circuit_breaker = circuit_breaker or CIRCUIT_BREAKER
+        self.search_cache = search_cache or SEARCH_CACHE
+        self.budget = budget_guard or BUDGET_GUARD
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+    async def __aenter__(self) -> "AsyncXApiClient":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.aclose()
+
+    def _is_transient(self, exc: Exception) -> bool:
+        httpx = self._httpx
+        if isinstance(exc, httpx.TransportError):
+            return True
+        return isinstance(exc, httpx.HTTPStatusError) and exc.response.status_code >= 500
+
+    async def _get(self, path: str, params: dict[str, Any]) -> tuple[dict, int]:
+        endpoint = f"GET {path}"
+
+        async def send() -> dict:
+            for attempt in range(RATE_LIMIT_RETRIES + 1):
+                await self.rate_limiter.wait_async(endpoint)
+                async with self._semaphore:
+                    resp = await self._client.get(path, params=params)
+                if resp.status_code != 429:
+                    self.rate_limiter.update(endpoint, resp.headers)
+                    break
+                self.rate_limiter.exhaust(endpoint, resp.headers)
+            resp.raise_for_status()
+            return resp.json()
+
+        return await call_with_retry_async(
+            endpoint, send, policy=READ_RETRY, breaker=self.circuit_breaker, is_retryable=self._is_transient
+        )
+
+    async def search_recent_tweets(
+        self, query: str, max_results: int = 10, *, cache_ttl: Optional[float] = SEARCH_CACHE_TTL_SECONDS
+    ) -> dict:
+        params, lookup = _search_request(self.search_cache, query, max_results, cache_ttl)
+        if lookup is not None and lookup.fresh:
+            return _finish_search(self.search_cache, lookup, query, params, None, 0)
+        with self.budget.reserve(
+            SEARCH_ENDPOINT, params["max_results"], unit_usd=SEARCH_UNIT_USD, min_units=SEARCH_MIN_RESULTS
+        ) as allowed:
+            params["max_results"] = allowed
+            request = dict(params, since_id=lookup.since_id) if lookup and lookup.since_id else params
+            data, retries = await self._get(SEARCH_RECENT_PATH, request)
+            return _finish_search(self.search_cache, lookup, query, params, data, retries)
+
+    async def search_mentions(self, username: str, since_id: str | None = None, max_results: int = 10) -> dict:
+        params = _mention_params(username, since_id, max_results)
+        with self.budget.reserve(
+            SEARCH_ENDPOINT, params["max_results"], unit_usd=SEARCH_UNIT_USD, min_units=SEARCH_MIN_RESULTS
+        ) as allowed:
+            params["max_results"] = allowed
+            data, retries = await self._get(SEARCH_RECENT_PATH, params)
+            _log_search(data, "x_api_client.search_mentions", _with_retries({"query": params["query"]}, retries))
+        return data
+
+    async def get_tweets_public_metrics(self, tweet_ids: list[str]) -> dict:
+        with self.budget.reserve("GET /2/tweets", len(tweet_ids), unit_usd=unit_cost("post_read")):
+            data, retries = await self._get("/2/tweets", {"ids": ",".join(tweet_ids), "tweet.fields": "public_metrics"})
+        log_api_usage(
+            "post_read",
+            len(data.get("data", []) or []),
+            "GET /2/tweets",
+            context="x_api_client.get_tweets_public_metrics",
+            metadata=_with_retries({"requested_ids": len(tweet_ids)}, retries),
+        )
+        return data
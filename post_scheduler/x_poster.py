@@ -14,7 +14,9 @@ from pathlib import Path
 from datetime import datetime
 from typing import Optional, List, Dict
 from dotenv import load_dotenv
-from x_api_client import XApiClient
+from x_api_client import UNAVAILABLE_ERRORS, XApiClient
+from perf_store import PerfStore
+from metric_series import now_jst_str
 
 try:
     import tweepy
@@ -34,6 +36,7 @@ from notifications.discord_notifier import DiscordNotifier
 QUEUE_FILE = SCRIPT_DIR / "post_queue.json"
 IMAGES_DIR = SCRIPT_DIR.parent / "scheduled_images"
 HOOK_PERF_FILE = SCRIPT_DIR.parent / "hook_performance.json"
+HOOK_PERF_DB = SCRIPT_DIR.parent / "hook_performance.db"
 
 
 class XPoster:
@@ -53,28 +56,21 @@ class XPoster:
             return False
 
     def _record_to_hook_performance(self, tweet_id: str, text: str, hook_category: str, tweet_type: str = "post", has_image: bool = False) -> None:
-        if HOOK_PERF_FILE.exists():
-            with open(HOOK_PERF_FILE, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-        else:
-            data = {"version": "1.0", "posts": []}
-
-        data["posts"].append({
+        entry = {
             "tweet_id": str(tweet_id),
             "text": text,
             "hookCategory": hook_category,
             "tweet_type": tweet_type,
             "has_image": has_image,
-            "postedAt": datetime.now().astimezone().strftime('%Y-%m-%dT%H:%M:%S'),
+            "postedAt": now_jst_str(),
             "engagementFetchedAt": None,
             "likes": None, "retweets": None, "replies": None, "quotes": None,
             "impressions": None, "url_link_clicks": None,
             "user_profile_clicks": None, "bookmarks": None,
             "diagnosis": None
-        })
-
-        with open(HOOK_PERF_FILE, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        }
+        with PerfStore(HOOK_PERF_DB, HOOK_PERF_FILE) as store:
+            store.add_post(entry)
         print(f"[HookPerf] 記録完了: {hook_category} / tweet_id={tweet_id}")
 
     def _upload_media(self, image_path: str) -> int:
@@ -119,7 +115,7 @@ class XPoster:
             self._record_to_hook_performance(tweet_id, text, hook_category, has_image=has_image)
             self._notify_post_success(text=text, hook_category=hook_category, url=url)
             return {'success': True, 'tweet_id': tweet_id, 'url': url}
-        except tweepy.TweepyException as e:
+        except (tweepy.TweepyException, *UNAVAILABLE_ERRORS) as e:
             print(f"投稿エラー: {e}")
             return {'success': False, 'error': str(e)}
 
@@ -138,7 +134,7 @@ class XPoster:
             self._record_to_hook_performance(tweet_id, text, hook_category, has_image=True)
             self._notify_post_success(text=text, hook_category=hook_category, url=url)
             return {'success': True, 'tweet_id': tweet_id, 'url': url}
-        except (FileNotFoundError, tweepy.TweepyException) as e:
+        except (FileNotFoundError, tweepy.TweepyException, *UNAVAILABLE_ERRORS) as e:
             print(f"投稿エラー: {e}")
             return {'success': False, 'error': str(e)}
 
@@ -157,7 +153,7 @@ class XPoster:
             url = f"https://x.com/i/web/status/{tweet_id}"
             print(f"リプライ投稿成功: {url}")
             return {'success': True, 'tweet_id': tweet_id, 'url': url}
-        except tweepy.TweepyException as e:
+        except (tweepy.TweepyException, *UNAVAILABLE_ERRORS) as e:
             print(f"リプライエラー: {e}")
             return {'success': False, 'error': str(e)}
 
@@ -172,7 +168,7 @@ class XPoster:
             url = f"https://x.com/i/web/status/{tweet_id}"
             print(f"引用ツイート投稿成功: {url}")
             return {'success': True, 'tweet_id': tweet_id, 'url': url}
-        except tweepy.TweepyException as e:
+        except (tweepy.TweepyException, *UNAVAILABLE_ERRORS) as e:
             print(f"引用ツイートエラー: {e}")
             return {'success': False, 'error': str(e)}
 
@@ -16,6 +16,7 @@ import sys
 import time
 from datetime import datetime
 from pathlib import Path
+from typing import Optional
 
 SCRIPT_DIR = Path(__file__).parent
 REPLY_SYSTEM_DIR = SCRIPT_DIR.parent
@@ -23,10 +24,9 @@ PROJECT_DIR = REPLY_SYSTEM_DIR.parent
 CANDIDATES_FILE = PROJECT_DIR / "dashboard" / "reply_candidates.json"
 CONFIG_FILE = SCRIPT_DIR / "config.json"
 LOG_FILE = SCRIPT_DIR / "session_log.json"
-# reply_log.json スキーマ契約:
-#   各エントリは {"target_tweet_id": str, "status": "posted"|"dry_run"|...} を持つ。
-#   重複排除は status=="posted" かつ target_tweet_id で判定する。
-REPLY_LOG_FILE = REPLY_SYSTEM_DIR / "reply_log.json"
+
+sys.path.insert(0, str(REPLY_SYSTEM_DIR))
+from replied_index import REPLIED, SKIPPED, RepliedIndex
 
 # win_autogui.py の Windows パスを取得
 WIN_AUTOGUI_WSL = SCRIPT_DIR / "win_autogui.py"
@@ -161,34 +161,11 @@ def _load_log_entries() -> list[dict]:
         return []
 
 
-def _load_reply_log_ids() -> set[str]:
-    """reply_engine.py のログ (reply_log.json) から投稿済み tweet_id を収集"""
-    if not REPLY_LOG_FILE.exists():
-        return set()
-    try:
-        data = json.loads(REPLY_LOG_FILE.read_text(encoding="utf-8"))
-        if not isinstance(data, list):
-            return set()
-    except (json.JSONDecodeError, OSError):
-        return set()
-    return {
-        e.get("target_tweet_id", "")
-        for e in data
-        if e.get("status") == "posted"
-    } - {""}
-
-
-def load_replied_ids() -> set[str]:
-    """全ログソースから返信済み tweet_id を収集する"""
-    # browser_automation の session_log.json
-    from_session = {
-        e.get("tweet_id", "")
-        for e in _load_log_entries()
-        if e.get("status") == "success" and not e.get("dry_run")
-    } - {""}
-    # reply_engine.py の reply_log.json
-    from_reply_log = _load_reply_log_ids()
-    return from_session | from_reply_log
+def load_replied_ids(index: Optional[RepliedIndex] = None) -> set[str]:
+    """返信済み tweet_id（replied_index に session_log.json / reply_log.json の更新分を取り込んだうえで）"""
+    if index is None:
+        index = RepliedIndex()
+    return index.ids([REPLIED])
 
 
 def save_log(log_entries: list[dict]):
@@ -217,7 +194,8 @@ def main():
     candidates = load_candidates()
 
     # 返信済み & 候補内重複を除外
-    replied_ids = load_replied_ids()
+    index = RepliedIndex()
+    replied_ids = load_replied_ids(index)
     seen: set[str] = set()
     unique_candidates = []
     for c in candidates:
@@ -283,6 +261,7 @@ def main():
             if answer == "n":
                 print("  スキップ")
                 skipped += 1
+                index.record(tweet_id, SKIPPED, source="orchestrator")
                 log_entries.append({
                     "username": username,
                     "tweet_id": tweet_id,
@@ -307,6 +286,8 @@ def main():
             entry["status"] = "success"
             success += 1
             replied_ids.add(tweet_id)
+            if not args.dry_run:
+                index.record(tweet_id, REPLIED, source="orchestrator")
         else:
             entry["status"] = "failed"
             failed += 1
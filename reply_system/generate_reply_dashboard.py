@@ -3,15 +3,20 @@
 手動リプライ/引用ツイート用ダッシュボード生成
 
 検索→フィルタ→LLMリプライ生成→HTML出力
+（検索結果は上限付きキュー経由で LLM ワーカーに流し、候補は1件ごとに JSON へ追記する）
 ブラウザで開いてワンクリックでX投稿画面へ
 """
 
 import sys
 import json
+import queue
 import random
 import argparse
+import threading
+import time
 from pathlib import Path
 from datetime import datetime
+from typing import Optional
 from urllib.parse import quote as url_quote
 
 sys.stdout.reconfigure(line_buffering=True)
@@ -22,96 +27,284 @@ PROJECT_DIR = SCRIPT_DIR.parent
 sys.path.insert(0, str(PROJECT_DIR / "post_scheduler"))
 
 from x_api_client import XApiClient
-from reply_engine import ReplyEngine
+from reply_engine import REPLY_BATCH_SIZE, ReplyEngine
+from replied_index import JUDGED, RepliedIndex
+
+sys.path.insert(0, str(PROJECT_DIR))
+from llm.llm_cache import get_cache
 
 SEARCH_CONFIG = SCRIPT_DIR / "search_config.json"
 OUTPUT_DIR = PROJECT_DIR / "dashboard"
 OUTPUT_FILE = OUTPUT_DIR / "reply_candidates.html"
 
 
-def generate_candidates(max_queries: int = 3, per_query: int = 10) -> list[dict]:
-    """キーワード検索→フィルタ→リプライ生成"""
+# LLM ステージのワーカー数（search_config.json の llm_workers / --workers で変更）
+DEFAULT_LLM_WORKERS = 2
+# ワーカーがバッチを埋めるために次の候補を待つ最大秒数
+BATCH_WAIT_SECONDS = 2.0
+# キューが満杯のとき、ワーカーが生きているか確かめ直す間隔（秒）
+QUEUE_PUT_TIMEOUT = 1.0
+_DONE = object()
+
+
+class CandidateStore:
+    """reply_candidates.json の候補リスト。1件追加するたびに書き出す（既存=古い順が先）"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.candidates: list[dict] = []
+        self.added = 0
+        self._lock = threading.Lock()
+        if path.exists():
+            try:
+                data = json.loads(path.read_text(encoding="utf-8"))
+                if isinstance(data, list):
+                    self.candidates = data
+            except (json.JSONDecodeError, OSError):
+                pass
+        self._ids = {c.get("tweet_id", "") for c in self.candidates}
+
+    def add(self, candidate: dict) -> bool:
+        tid = candidate.get("tweet_id", "")
+        with self._lock:
+            if not tid or tid in self._ids:
+                return False
+            candidate["generated_at"] = datetime.now().isoformat()
+            self.candidates.append(candidate)
+            self._ids.add(tid)
+            self.added += 1
+            self._write()
+        return True
+
+    def _write(self) -> None:
+        self.path.parent.mkdir(exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(json.dumps(self.candidates, ensure_ascii=False, indent=2), encoding="utf-8")
+        tmp.replace(self.path)
+
+
+class PipelineMetrics:
+    """ステージごとの件数・所要時間とキューの深さ"""
+
+    def __init__(self, queue_size: int):
+        self.started = time.monotonic()
+        self.queue_size = queue_size
+        self.stages: dict[str, dict] = {
+            stage: {"items": 0, "seconds": 0.0, "calls": 0} for stage in ("search", "filter", "llm", "write")
+        }
+        self.depths: list[int] = []
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, items: int = 0, seconds: float = 0.0, **counts: int) -> None:
+        with self._lock:
+            st = self.stages.setdefault(stage, {"items": 0, "seconds": 0.0, "calls": 0})
+            st["items"] += items
+            st["seconds"] += seconds
+            st["calls"] += 1
+            for key, n in counts.items():
+                st[key] = st.get(key, 0) + n
+
+    def sample_queue(self, depth: int) -> None:
+        with self._lock:
+            self.depths.append(depth)
+
+    def report(self, workers: int) -> None:
+        elapsed = time.monotonic() - self.started
+        print("\n[pipeline] ステージ別")
+        for stage, st in self.stages.items():
+            rate = st["items"] / st["seconds"] if st["seconds"] > 0 else 0.0
+            extra = " ".join(f"{k}={v}" for k, v in st.items() if k not in ("items", "seconds", "calls"))
+            print(
+                f"  {stage:<7} {st['items']:>4}件 / {st['calls']}回 / 稼働 {st['seconds']:.1f}s"
+                f" ({rate:.2f}件/s){' ' + extra if extra else ''}"
+            )
+        if self.depths:
+            avg = sum(self.depths) / len(self.depths)
+            print(f"  queue   最大 {max(self.depths)} / 平均 {avg:.1f} (上限 {self.queue_size})")
+        print(f"  全体    {elapsed:.1f}s (LLM ワーカー {workers})")
+
+
+def _next_batch(q: queue.Queue, first: dict, metrics: PipelineMetrics) -> tuple[list[dict], bool]:
+    """first に続けて、BATCH_WAIT_SECONDS 以内に届いた候補を REPLY_BATCH_SIZE 件までまとめる。
+    (バッチ, 終了の合図を受け取ったか) を返す"""
+    batch = [first]
+    deadline = time.monotonic() + BATCH_WAIT_SECONDS
+    while len(batch) < REPLY_BATCH_SIZE:
+        try:
+            item = q.get(timeout=max(deadline - time.monotonic(), 0.0))
+        except queue.Empty:
+            break
+        metrics.sample_queue(q.qsize())
+        if item is _DONE:
+            return batch, True
+        batch.append(item)
+    return batch, False
+
+
+def generate_candidates(
+    max_queries: int = 3,
+    per_query: int = 10,
+    *,
+    workers: Optional[int] = None,
+    store: Optional[CandidateStore] = None,
+) -> list[dict]:
+    """キーワード検索→フィルタ→リプライ生成をパイプラインで流す。
+
+    検索結果はクエリが終わった順に上限付きキューへ流れ、workers 個の LLM ワーカーが
+    まとめて判定・生成する。store を渡すと候補ができるたびに reply_candidates.json へ追記する。
+    """
     config = json.loads(SEARCH_CONFIG.read_text(encoding="utf-8"))
     engine = ReplyEngine()
+    workers = max(workers or config.get("llm_workers", DEFAULT_LLM_WORKERS), 1)
 
     keywords = config.get("search_keywords", {})
     query_pool = [(cat, kw) for cat, kws in keywords.items() for kw in kws]
     random.shuffle(query_pool)
     queries = query_pool[:max_queries]
 
-    # 既にリプライ済みのtweet_idを収集（reply_log.json + session_log.json）
-    replied_ids: set[str] = set()
-    reply_log_file = SCRIPT_DIR / "reply_log.json"
-    session_log_file = SCRIPT_DIR / "browser_automation" / "session_log.json"
-    for log_path, id_key, status_val in [
-        (reply_log_file, "target_tweet_id", "posted"),
-        (session_log_file, "tweet_id", "success"),
-    ]:
-        if log_path.exists():
-            try:
-                data = json.loads(log_path.read_text(encoding="utf-8"))
-                if isinstance(data, list):
-                    replied_ids |= {
-                        e.get(id_key, "") for e in data
-                        if e.get("status") == status_val
-                    } - {""}
-            except (json.JSONDecodeError, OSError):
-                pass
-    if replied_ids:
-        print(f"  既リプライ済み: {len(replied_ids)}件を除外対象")
+    # リプライ済み・判定済み・スキップ済みは検索結果から外す（LLM に二度聞かない）
+    index = RepliedIndex()
+    print(f"  処理済みインデックス: {len(index)}件を除外対象")
 
-    candidates = []
+    candidates: list[dict] = []
+    candidates_lock = threading.Lock()
     seen: set[str] = set()
+    queue_size = workers * REPLY_BATCH_SIZE
+    q: queue.Queue = queue.Queue(maxsize=queue_size)
+    metrics = PipelineMetrics(queue_size)
+    searched: list[int] = []
 
-    for qi, (category, query) in enumerate(queries):
-        print(f"[{qi+1}/{len(queries)}] 検索中: '{query}' ({category})")
-        try:
-            result = engine.search_tweets(query, max_results=per_query)
-        except Exception as e:
-            print(f"  検索エラー: {e}")
-            continue
+    filter_lock = threading.Lock()
+    pool: list[threading.Thread] = []
 
+    def put(item) -> bool:
+        """キューに入れる。満杯なら空くまで待つが、ワーカーが全滅していたら諦めて False"""
+        while True:
+            try:
+                q.put(item, timeout=QUEUE_PUT_TIMEOUT)
+                return True
+            except queue.Full:
+                if not any(t.is_alive() for t in pool):
+                    return False
+
+    def on_search_result(qi: int, result: dict) -> None:
+        """検索ステージ → フィルタステージ → キュー（検索ごとにスレッドプールで動く）"""
+        category, query = queries[qi]
         tweets = result.get("data", []) or []
         users = {u["id"]: u for u in result.get("includes", {}).get("users", []) or []}
-
-        for tweet in tweets:
-            tweet_id = str(tweet.get("id", ""))
-            if not tweet_id or tweet_id in seen or tweet_id in replied_ids:
-                continue
-            seen.add(tweet_id)
-
-            author_id = tweet.get("author_id", "")
-            user = users.get(author_id, {})
-            username = user.get("username", "")
-            display_name = user.get("name", username)
-            followers = user.get("public_metrics", {}).get("followers_count", 0)
-
-            if not username or username == "cat_hokke":
-                continue
-
-            tweet_text = tweet.get("text", "")
-            if engine.is_ng(tweet_text):
-                print(f"  NG: @{username}")
+        print(f"[{qi+1}/{len(queries)}] '{query}' ({category}) {len(tweets)}件")
+
+        t0 = time.monotonic()
+        passed: list[dict] = []
+        ng = 0
+        with filter_lock:
+            searched.append(len(tweets))
+            for tweet in tweets:
+                tweet_id = str(tweet.get("id", ""))
+                if not tweet_id or tweet_id in seen or tweet_id in index:
+                    continue
+                seen.add(tweet_id)
+
+                author_id = tweet.get("author_id", "")
+                user = users.get(author_id, {})
+                username = user.get("username", "")
+                if not username or username == "cat_hokke":
+                    continue
+
+                tweet_text = tweet.get("text", "")
+                ng_keyword = engine.ng_match(tweet_text)
+                if ng_keyword is not None:
+                    print(f"  NG: @{username} ({ng_keyword})")
+                    ng += 1
+                    continue
+
+                passed.append({
+                    "tweet_id": tweet_id,
+                    "username": username,
+                    "display_name": user.get("name", username),
+                    "followers": user.get("public_metrics", {}).get("followers_count", 0),
+                    "tweet_text": tweet_text,
+                    "category": category,
+                    "query": query,
+                })
+        metrics.record("filter", len(passed), time.monotonic() - t0, ng=ng, dropped=len(tweets) - len(passed) - ng)
+
+        # キューが埋まっていたら LLM ステージが追いつくまで待つ（背圧）
+        for i, candidate in enumerate(passed):
+            if not put(candidate):
+                print(f"  LLM ワーカーが全て停止 → '{query}' の残り{len(passed) - i}件を破棄")
+                metrics.record("filter", 0, lost=len(passed) - i)
+                return
+            metrics.sample_queue(q.qsize())
+
+    def process_batch(batch: list[dict]) -> None:
+        t0 = time.monotonic()
+        drafts = engine.generate_replies([{"text": c["tweet_text"], "category": c["category"]} for c in batch])
+        ok = sum(d["ok"] for d in drafts)
+        metrics.record("llm", len(batch), time.monotonic() - t0, ok=ok, skipped=len(batch) - ok)
+
+        t0 = time.monotonic()
+        for candidate, draft in zip(batch, drafts):
+            # セルフチェックNG・判定不能はツイートへの判定ではないので、次回また候補にする
+            if draft["judged"]:
+                index.record(candidate["tweet_id"], JUDGED, source="dashboard", reason=draft["reason"] or "")
+            if not draft["ok"]:
+                print(f"  スキップ: @{candidate['username']} ({draft['reason']})")
                 continue
-
-            # generate_reply は内部で judge_tweet + 生成 + セルフチェックを行う
-            reply = engine.generate_reply(tweet_text, category)
-            if not reply:
-                print(f"  スキップ: @{username}")
-                continue
-
-            candidates.append({
-                "tweet_id": tweet_id,
-                "username": username,
-                "display_name": display_name,
-                "followers": followers,
-                "tweet_text": tweet_text,
-                "reply_text": reply,
-                "category": category,
-                "query": query,
-            })
-            print(f"  ✓ @{username}: {reply[:50]}...")
-
+            candidate["reply_text"] = draft["reply"]
+            with candidates_lock:
+                candidates.append(candidate)
+            if store is not None:
+                store.add(candidate)
+            print(f"  ✓ @{candidate['username']}: {draft['reply'][:50]}...")
+        metrics.record("write", ok, time.monotonic() - t0)
+
+    def llm_worker() -> None:
+        """LLM ステージ（判定 + 生成 + セルフチェック）→ 書き出しステージ。
+        バッチの処理で例外が出てもそのバッチを飛ばすだけで、ワーカーは止めない"""
+        done = False
+        while not done:
+            item = q.get()
+            metrics.sample_queue(q.qsize())
+            if item is _DONE:
+                return
+            batch, done = _next_batch(q, item, metrics)
+            try:
+                process_batch(batch)
+            except Exception as e:
+                print(f"  [pipeline] バッチ失敗 ({len(batch)}件スキップ): {type(e).__name__}: {e}")
+                metrics.record("llm", 0, failed=len(batch))
+
+    pool.extend(threading.Thread(target=llm_worker, name=f"reply-llm-{i}", daemon=True) for i in range(workers))
+    for t in pool:
+        t.start()
+
+    # 検索は全クエリ同時に投げ、終わったクエリから順にキューへ流す
+    print(f"{len(queries)}クエリを並列検索中... (LLM ワーカー {workers})")
+    # 同じキーワードの再検索はキャッシュ＋since_id の差分取得で課金を抑える
+    ttl_minutes = config.get("search_cache_ttl_minutes", 30)
+    cache_ttl = ttl_minutes * 60 if ttl_minutes is not None else None
+    t0 = time.monotonic()
+    try:
+        engine.search_many(
+            [query for _, query in queries], max_results=per_query, cache_ttl=cache_ttl, on_result=on_search_result
+        )
+    finally:
+        # 検索は並列なので、件数はクエリ合計・時間は全体の経過時間で数える
+        metrics.record("search", sum(searched), time.monotonic() - t0, queries=len(searched))
+        for _ in pool:
+            if not put(_DONE):
+                break
+        for t in pool:
+            t.join()
+
+    metrics.report(workers)
+    for label, matcher in (("NG", engine.ng_matcher), ("セルフチェックNG", engine.reply_ng_matcher)):
+        if matcher.hits:
+            top = ", ".join(f"{kw}×{n}" for kw, n in matcher.hits.most_common(5))
+            print(f"  {label}内訳 {top}")
+    cache = get_cache().stats()
+    print(f"  LLMキャッシュ ヒット {cache['hits']} / ミス {cache['misses']} (ヒット率 {cache['hit_rate']:.0%})")
     return candidates
 
 
@@ -291,48 +484,24 @@ def main():
     parser = argparse.ArgumentParser(description="手動リプライ用ダッシュボード生成")
     parser.add_argument("--queries", type=int, default=3, help="検索クエリ数 (default: 3)")
     parser.add_argument("--per-query", type=int, default=10, help="クエリあたり検索数 (default: 10)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help=f"LLM ワーカー数 (default: search_config の llm_workers、なければ {DEFAULT_LLM_WORKERS})")
     args = parser.parse_args()
 
     print("=== リプライ候補ダッシュボード生成 ===\n")
-    new_candidates = generate_candidates(max_queries=args.queries, per_query=args.per_query)
-
     OUTPUT_DIR.mkdir(exist_ok=True)
     json_file = OUTPUT_DIR / "reply_candidates.json"
 
-    # 既存の未使用候補を読み込んでマージ（古い順を維持）
-    existing = []
-    existing_ids: set[str] = set()
-    if json_file.exists():
-        try:
-            data = json.loads(json_file.read_text(encoding="utf-8"))
-            if isinstance(data, list):
-                existing = data
-                existing_ids = {c.get("tweet_id", "") for c in existing}
-        except (json.JSONDecodeError, OSError):
-            pass
-
-    # 新規候補のうち既存にないものだけ追加（既存=古い順が先）
-    added = 0
-    for c in new_candidates:
-        tid = c.get("tweet_id", "")
-        if tid and tid not in existing_ids:
-            c["generated_at"] = datetime.now().isoformat()
-            existing.append(c)
-            existing_ids.add(tid)
-            added += 1
-
-    merged = existing
-
-    # JSON出力
-    json_file.write_text(
-        json.dumps(merged, ensure_ascii=False, indent=2), encoding="utf-8"
-    )
+    # 既存の未使用候補に、できた候補から順に追記していく（古い順を維持）
+    store = CandidateStore(json_file)
+    generate_candidates(max_queries=args.queries, per_query=args.per_query, workers=args.workers, store=store)
+    merged = store.candidates
 
     # HTML は全候補で生成
     html = build_html(merged)
     OUTPUT_FILE.write_text(html, encoding="utf-8")
 
-    print(f"\n完了: 新規{added}件追加 / 合計{len(merged)}件の候補")
+    print(f"\n完了: 新規{store.added}件追加 / 合計{len(merged)}件の候補")
     print(f"HTML: {OUTPUT_FILE}")
     print(f"JSON: {json_file}")
 
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+ホッケ NGキーワード照合（Aho-Corasick）
+
+ng_keywords.json のキーワードを1つのオートマトンにまとめ、本文を1回なめるだけで
+どのキーワードに当たったかを返す。キーワード数に関係なく O(len(text))。
+
+- 本文もキーワードも NFKC + casefold で正規化する（全角/半角・大文字小文字の揺れを吸収）
+- ファイルの mtime が変わったら次の照合時に作り直す（プロセスを再起動しなくてよい）
+- 起動時にファイルが壊れていたら ValueError（default を渡していればそれを使う）。
+  更新後に壊れたときだけ、前のオートマトンを使い続ける
+- 当たったキーワードごとの件数を hits に数える
+"""
+
+import json
+import threading
+import unicodedata
+from collections import Counter, deque
+from pathlib import Path
+from typing import Iterable, Optional
+
+
+def normalize(text: str) -> str:
+    return unicodedata.normalize("NFKC", text or "").casefold()
+
+
+class AhoCorasick:
+    """patterns（元の表記のまま）を正規化して登録する。正規化後に同じになるものは先勝ち"""
+
+    def __init__(self, patterns: Iterable[str]):
+        self.patterns: list[str] = []
+        self._goto: list[dict[str, int]] = [{}]
+        # 状態ごとの出力（その状態で終わるパターン番号、無ければ -1）と、
+        # 出力を持つ最寄りの suffix 状態（find_all で同じ位置に終わる短いパターンを拾う）
+        self._out: list[int] = [-1]
+        self._fail: list[int] = [0]
+        self._link: list[int] = [0]
+        for pattern in patterns:
+            self._add(pattern)
+        self._build()
+
+    def __len__(self) -> int:
+        return len(self.patterns)
+
+    def _add(self, pattern: str) -> None:
+        key = normalize(pattern)
+        if not key:
+            return
+        state = 0
+        for ch in key:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._out.append(-1)
+                self._fail.append(0)
+                self._link.append(0)
+            state = nxt
+        if self._out[state] == -1:
+            self._out[state] = len(self.patterns)
+            self.patterns.append(pattern)
+
+    def _build(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                f = self._fail[nxt]
+                self._link[nxt] = f if self._out[f] != -1 else self._link[f]
+                queue.append(nxt)
+
+    def _step(self, state: int, ch: str) -> int:
+        goto = self._goto
+        while state and ch not in goto[state]:
+            state = self._fail[state]
+        return goto[state].get(ch, 0)
+
+    def find(self, text: str) -> Optional[str]:
+        """最初に当たった（終わる位置が一番前の）キーワード。無ければ None"""
+        state = 0
+        for ch in normalize(text):
+            state = self._step(state, ch)
+            s = state if self._out[state] != -1 else self._link[state]
+            if s:
+                return self.patterns[self._out[s]]
+        return None
+
+    def find_all(self, text: str) -> list[str]:
+        """当たったキーワードを重複なしで、出てきた順に返す"""
+        found: dict[int, None] = {}
+        state = 0
+        for ch in normalize(text):
+            state = self._step(state, ch)
+            s = state if self._out[state] != -1 else self._link[state]
+            while s:
+                found.setdefault(self._out[s], None)
+                s = self._link[s]
+        return [self.patterns[i] for i in found]
+
+
+class NGMatcher:
+    """JSON ファイルの key にあるキーワードの照合器。ファイルが更新されたら作り直す。
+    default はファイルが無い・読めない・key が無いときに使うキーワード"""
+
+    def __init__(self, path: Path, key: str, default: Optional[Iterable[str]] = None):
+        self.path = Path(path)
+        self.key = key
+        self.default = list(default) if default is not None else None
+        self.hits: Counter = Counter()
+        self._lock = threading.Lock()
+        self._mtime: Optional[float] = None
+        self._automaton = AhoCorasick(())
+        self._loaded = False
+        self._reload_if_changed()
+
+    def _reload_if_changed(self) -> None:
+        try:
+            mtime = self.path.stat().st_mtime
+        except OSError:
+            mtime = None
+        if self._loaded and mtime == self._mtime:
+            return
+        patterns = list(self.default or [])
+        if mtime is not None:
+            try:
+                data = json.loads(self.path.read_text(encoding="utf-8"))
+                if self.key in data or self.default is None:
+                    patterns = [str(p) for p in data.get(self.key, [])]
+            except (OSError, ValueError, AttributeError) as e:
+                if self._loaded:
+                    # 編集途中の壊れた JSON では作り直さず、前のオートマトンを使い続ける
+                    return
+                if self.default is None:
+                    # 起動時に黙って全件素通しにしない
+                    raise ValueError(f"{self.path} を読み込めない: {e}") from e
+        self._automaton = AhoCorasick(patterns)
+        self._mtime = mtime
+        self._loaded = True
+
+    @property
+    def patterns(self) -> list[str]:
+        return list(self._automaton.patterns)
+
+    def match(self, text: str) -> Optional[str]:
+        """当たったキーワード（無ければ None）。当たったら hits に数える"""
+        with self._lock:
+            self._reload_if_changed()
+            automaton = self._automaton
+        keyword = automaton.find(text)
+        if keyword is not None:
+            with self._lock:
+                self.hits[keyword] += 1
+        return keyword
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+ホッケ リプライ済みツイートのインデックス
+
+リプライ済み・LLM判定済み・手動スキップのツイートIDを SQLite (WAL) に無期限で記録し、
+generate_reply_dashboard.py と orchestrator.py の重複排除で共有する。
+
+- 起動時に全IDからメモリ上の Bloom filter を作る。載っていないIDは DB を引かずに「未処理」と判定できる
+- reply_log.json / session_log.json は更新されていたときだけ読み込んで取り込む
+  （session_log.json は500件で切り捨てられるが、取り込んだIDはインデックスに残る）
+- 同じIDの状態は replied > skipped > judged の順にだけ上書きする
+"""
+
+import hashlib
+import json
+import math
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, Optional
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+DB_FILE = SCRIPT_DIR / "replied_index.db"
+# reply_log.json スキーマ契約:
+#   各エントリは {"target_tweet_id": str, "status": "posted"|"dry_run"|...} を持つ。
+#   重複排除は status=="posted" かつ target_tweet_id で判定する。
+REPLY_LOG_FILE = SCRIPT_DIR / "reply_log.json"
+SESSION_LOG_FILE = SCRIPT_DIR / "browser_automation" / "session_log.json"
+
+REPLIED = "replied"   # リプライ済み（orchestrator 成功 / reply_log の posted）
+SKIPPED = "skipped"   # orchestrator の確認で人がスキップ
+JUDGED = "judged"     # LLM がツイートを判定済み（リプ可・リプ不可。セルフチェックNG・判定不能は含まない）
+_RANK = {JUDGED: 0, SKIPPED: 1, REPLIED: 2}
+
+# Bloom filter の偽陽性率と最小容量（件数が容量を超えたら倍にして作り直す）
+BLOOM_ERROR_RATE = 0.01
+BLOOM_MIN_CAPACITY = 100_000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tweets (
+    tweet_id    TEXT PRIMARY KEY,
+    status      TEXT NOT NULL,
+    source      TEXT NOT NULL DEFAULT '',
+    reason      TEXT NOT NULL DEFAULT '',
+    recorded_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+class BloomFilter:
+    def __init__(self, capacity: int, error_rate: float = BLOOM_ERROR_RATE):
+        self.capacity = max(capacity, 1)
+        self.n_bits = max(int(-self.capacity * math.log(error_rate) / math.log(2) ** 2), 8)
+        self.n_hashes = max(round(self.n_bits / self.capacity * math.log(2)), 1)
+        self.bits = bytearray((self.n_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str) -> Iterable[int]:
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.n_bits for i in range(self.n_hashes))
+
+    def add(self, key: str) -> None:
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+def _read_log(path: Path) -> list[dict]:
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (json.JSONDecodeError, OSError):
+        return []
+    return [e for e in data if isinstance(e, dict)] if isinstance(data, list) else []
+
+
+def _reply_log_records(path: Path) -> list[tuple[str, str]]:
+    """reply_log.json（スキーマ契約: status=="posted" かつ target_tweet_id）"""
+    return [
+        (str(e.get("target_tweet_id") or ""), REPLIED)
+        for e in _read_log(path)
+        if e.get("status") == "posted"
+    ]
+
+
+def _session_log_records(path: Path) -> list[tuple[str, str]]:
+    """session_log.json（dry_run 以外の success と、人がスキップしたもの）"""
+    records = []
+    for e in _read_log(path):
+        if e.get("status") == "success" and not e.get("dry_run"):
+            records.append((str(e.get("tweet_id") or ""), REPLIED))
+        elif e.get("status") == "skipped":
+            records.append((str(e.get("tweet_id") or ""), SKIPPED))
+    return records
+
+
+LOG_SOURCES = {
+    "reply_log": (REPLY_LOG_FILE, _reply_log_records),
+    "session_log": (SESSION_LOG_FILE, _session_log_records),
+}
+
+
+class RepliedIndex:
+    def __init__(self, path: Path = DB_FILE, *, sources: Optional[dict] = None):
+        self.path = Path(path)
+        self.sources = LOG_SOURCES if sources is None else sources
+        self._lock = threading.Lock()
+        # generate_reply_dashboard の LLM ワーカー（スレッド）から記録する
+        self._conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._rebuild_bloom()
+        self.sync_logs()
+
+    def _rebuild_bloom(self, capacity: int = 0) -> None:
+        n = self._conn.execute("SELECT COUNT(*) FROM tweets").fetchone()[0]
+        self._bloom = BloomFilter(max(capacity, 2 * n, BLOOM_MIN_CAPACITY))
+        for (tweet_id,) in self._conn.execute("SELECT tweet_id FROM tweets"):
+            self._bloom.add(tweet_id)
+
+    # ---- 記録 ----
+    def record_many(self, records: Iterable[tuple[str, str]], *, source: str = "", reason: str = "") -> int:
+        """(tweet_id, status) を記録する。返り値は新規または状態が上がった件数"""
+        now = datetime.now().isoformat()
+        changed = 0
+        with self._lock, self._conn:
+            for tweet_id, status in records:
+                tweet_id = str(tweet_id or "")
+                if not tweet_id or status not in _RANK:
+                    continue
+                current = self._status(tweet_id)
+                if current is not None and _RANK[current] >= _RANK[status]:
+                    continue
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO tweets (tweet_id, status, source, reason, recorded_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (tweet_id, status, source, reason, now),
+                )
+                if current is None:
+                    self._bloom.add(tweet_id)
+                changed += 1
+            if self._bloom.count > self._bloom.capacity:
+                self._rebuild_bloom(2 * self._bloom.capacity)
+        return changed
+
+    def record(self, tweet_id: str, status: str, *, source: str = "", reason: str = "") -> bool:
+        return self.record_many([(tweet_id, status)], source=source, reason=reason) > 0
+
+    def sync_logs(self) -> int:
+        """前回から更新されたログファイルだけ読み込んで取り込む"""
+        added = 0
+        for name, (path, parse) in self.sources.items():
+            try:
+                st = Path(path).stat()
+            except OSError:
+                continue
+            stamp = f"{st.st_mtime_ns}:{st.st_size}"
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (f"log:{name}",)).fetchone()
+            if row and row[0] == stamp:
+                continue
+            added += self.record_many(parse(Path(path)), source=name)
+            with self._lock, self._conn:
+                self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (f"log:{name}", stamp))
+        return added
+
+    # ---- 参照 ----
+    def _status(self, tweet_id: str) -> Optional[str]:
+        if tweet_id not in self._bloom:
+            return None
+        row = self._conn.execute("SELECT status FROM tweets WHERE tweet_id = ?", (tweet_id,)).fetchone()
+        return row[0] if row else None
+
+    def status(self, tweet_id: str) -> Optional[str]:
+        with self._lock:
+            return self._status(str(tweet_id))
+
+    def contains(self, tweet_id: str, statuses: Optional[Iterable[str]] = None) -> bool:
+        """statuses を省略するとどの状態でも True"""
+        status = self.status(tweet_id)
+        if status is None:
+            return False
+        return statuses is None or status in set(statuses)
+
+    def __contains__(self, tweet_id: str) -> bool:
+        return self.contains(tweet_id)
+
+    def ids(self, statuses: Optional[Iterable[str]] = None) -> set[str]:
+        query = "SELECT tweet_id FROM tweets"
+        params: tuple = ()
+        if statuses is not None:
+            statuses = tuple(statuses)
+            if not statuses:
+                return set()
+            query += f" WHERE status IN ({','.join('?' * len(statuses))})"
+            params = statuses
+        with self._lock:
+            return {row[0] for row in self._conn.execute(query, params)}
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM tweets").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
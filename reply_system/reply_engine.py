@@ -6,15 +6,14 @@ generate_reply_dashboard.py から import して使用する。
 API経由の投稿機能は廃止済み（ブラウザ自動化方式に移行）。
 """
 
+import asyncio
 import os
 import sys
 import json
 import json as json_module
-import subprocess
 import re
-import shutil
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Optional
 
 from dotenv import load_dotenv
 
@@ -30,20 +29,30 @@ REPLY_STRATEGY_FILE = SCRIPT_DIR / "reply_strategy.json"
 
 load_dotenv(ENV_FILE)
 
+sys.path.insert(0, str(SCRIPT_DIR))
+from ng_matcher import NGMatcher
+
 sys.path.insert(0, str(PROJECT_DIR / "post_scheduler"))
-from x_api_client import XApiClient
+from x_api_client import SEARCH_CACHE_TTL_SECONDS, AsyncXApiClient, XApiClient
 
+sys.path.insert(0, str(PROJECT_DIR))
+from llm.llm_cache import get_cache, template_id
+from llm.llm_gateway import backend_name, get_gateway
 
-def _load_json(path: Path):
-    if path.exists():
-        with open(path, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    return {}
+# 生成したリプライに含まれていたらボツにするフレーズ（ng_keywords.json の reply_ng_phrases が無い・読めないとき）
+DEFAULT_REPLY_NG_PHRASES = ['頑張', '応援', '素敵', 'ありがとう', '！！', '😊', '💪', '✨']
+# generate_replies で1回の呼び出しにまとめる件数と、1件あたりの追加タイムアウト（基本60秒、上限180秒）
+REPLY_BATCH_SIZE = 10
+REPLY_BATCH_TIMEOUT_PER_ITEM = 10
+# LLM の応答が読めなかったときのスキップ理由（判定結果ではないので記録・キャッシュしない）
+INVALID_RESPONSE_REASON = "判断レスポンス不正"
 
 
 class ReplyEngine:
     def __init__(self):
-        self.ng = _load_json(NG_FILE)
+        # ツイート側の NG（skip_keywords）と、生成したリプライ側の NG（reply_ng_phrases）
+        self.ng_matcher = NGMatcher(NG_FILE, "skip_keywords")
+        self.reply_ng_matcher = NGMatcher(NG_FILE, "reply_ng_phrases", default=DEFAULT_REPLY_NG_PHRASES)
         self.persona = self._load_persona()
         self.reply_strategy = self._load_reply_strategy()
 
@@ -69,67 +78,98 @@ class ReplyEngine:
 
     # --- X API 検索 ---
 
-    def search_tweets(self, query: str, max_results: int = 10) -> list:
-        """X API v2でツイートを検索"""
+    def search_tweets(
+        self, query: str, max_results: int = 10, cache_ttl: Optional[float] = SEARCH_CACHE_TTL_SECONDS
+    ) -> list:
+        """X API v2でツイートを検索（cache_ttl 秒以内の同じ検索はキャッシュを使う）"""
         try:
-            return self.x_api.search_recent_tweets(query, max_results=max_results)
+            return self.x_api.search_recent_tweets(query, max_results=max_results, cache_ttl=cache_ttl)
         except Exception as e:
             print(f"検索エラー ({query}): {e}")
             return {}
 
+    def search_many(
+        self,
+        queries: list[str],
+        max_results: int = 10,
+        max_concurrency: int = 4,
+        cache_ttl: Optional[float] = SEARCH_CACHE_TTL_SECONDS,
+        on_result: Optional[Callable[[int, dict], None]] = None,
+    ) -> list:
+        """複数クエリを並列に検索し、クエリ順の結果リストを返す（失敗したクエリは {}）。
+
+        on_result を渡すと、クエリが1件終わるたびに on_result(クエリ番号, 結果) を呼ぶ（終わった順）。
+        on_result はスレッドプールで動くので、中でブロックしても他のクエリの検索は止まらない。
+        httpx がなければ search_tweets で1件ずつ検索する。
+        """
+        try:
+            return asyncio.run(self._search_many(queries, max_results, max_concurrency, cache_ttl, on_result))
+        except ImportError as e:
+            print(f"並列検索不可、逐次検索にフォールバック: {e}")
+            out = []
+            for i, q in enumerate(queries):
+                out.append(self.search_tweets(q, max_results=max_results, cache_ttl=cache_ttl))
+                if on_result:
+                    on_result(i, out[-1])
+            return out
+
+    async def _search_many(
+        self,
+        queries: list[str],
+        max_results: int,
+        max_concurrency: int,
+        cache_ttl: Optional[float],
+        on_result: Optional[Callable[[int, dict], None]] = None,
+    ) -> list:
+        async with AsyncXApiClient(max_concurrency=max_concurrency) as client:
+            async def _one(i: int, query: str) -> dict:
+                try:
+                    result = await client.search_recent_tweets(query, max_results=max_results, cache_ttl=cache_ttl)
+                except Exception as e:
+                    print(f"検索エラー ({query}): {e}")
+                    result = {}
+                if on_result:
+                    try:
+                        await asyncio.get_running_loop().run_in_executor(None, on_result, i, result)
+                    except Exception as e:
+                        print(f"検索結果の処理エラー ({query}): {e}")
+                return result
+
+            return list(await asyncio.gather(*(_one(i, q) for i, q in enumerate(queries))))
+
     # --- NGフィルタ ---
 
+    def ng_match(self, text: str) -> Optional[str]:
+        """含まれていたNGキーワード（無ければ None）"""
+        return self.ng_matcher.match(text)
+
     def is_ng(self, text: str) -> bool:
         """NGキーワードが含まれているか"""
-        ng_words = self.ng.get('skip_keywords', [])
-        text_lower = text.lower()
-        for word in ng_words:
-            if word.lower() in text_lower:
-                return True
-        return False
+        return self.ng_match(text) is not None
 
     # --- LLM呼び出し ---
 
     def _call_claude(self, system_prompt: str, user_prompt: str, timeout: int = 45) -> Optional[str]:
-        """Claude CLI共通呼び出し"""
+        """Claude CLI共通呼び出し（llm_gateway の待機プロセスを使う）"""
         prompt = f"""# System
 {system_prompt}
 
 # User
 {user_prompt}
 """
-        claude_cmd = shutil.which("claude")
-        if not claude_cmd:
-            fallback = "/home/sekiz/.nvm/versions/node/v24.13.0/bin/claude"
-            if Path(fallback).exists():
-                claude_cmd = fallback
-            else:
-                print("  claude コマンドが見つからない")
-                return None
-
-        clean_env = {k: v for k, v in os.environ.items()
-                     if not k.startswith("CLAUDE")}
-
         try:
-            result = subprocess.run(
-                [claude_cmd, "-p", prompt],
-                capture_output=True,
-                text=True,
-                timeout=timeout,
-                env=clean_env,
-            )
-        except subprocess.TimeoutExpired:
-            print("  Claude呼び出しタイムアウト")
-            return None
+            response = get_gateway("claude").complete(prompt, timeout=timeout)
         except FileNotFoundError:
             print("  claude コマンドが見つからない")
             return None
 
-        if result.returncode != 0:
-            err = (result.stderr or "").strip()
-            print(f"  Claude実行エラー (exit={result.returncode}): {err[:200]}")
+        if response.timed_out:
+            print("  Claude呼び出しタイムアウト")
+            return None
+        if not response.ok:
+            print(f"  Claude実行エラー ({response.error})")
             return None
-        return (result.stdout or "").strip()
+        return response.text
 
     def _extract_reply_text(self, raw: str) -> str:
         """Model output sanitization for reply body."""
@@ -150,12 +190,8 @@ class ReplyEngine:
 
     # --- 判定・生成 ---
 
-    def judge_tweet(self, tweet_text: str) -> Optional[str]:
-        """ツイートにリプすべきか判断。None=OK, str=スキップ理由"""
-        system_prompt = """あなたはSNS投稿の安全性を判断するモデレーターです。
-以下のツイートに、猫キャラクターのアカウントがリプライしても問題ないか判断してください。
-
-## スキップすべきケース
+    def _judge_rules(self) -> str:
+        return """## スキップすべきケース
 - 訃報・お悔やみ・死亡に関する内容
 - 深刻な病気・入院・事故の報告
 - 炎上中・論争中の話題
@@ -165,12 +201,46 @@ class ReplyEngine:
 - 文脈がわからない（他ツイートへの返信や内輪ネタ等）
 - 怒りや悲しみが強すぎて猫がリプすると不謹慎になりそうな内容
 - 下ネタ・性的な含意があるツイート（隠語・スラング・ダブルミーニング含む）
-- 誤読リスクが高いツイート（字面と真意が異なる可能性がある）
+- 誤読リスクが高いツイート（字面と真意が異なる可能性がある）"""
+
+    def _reply_rules(self, *extra_rules: str) -> str:
+        rules = """## リプライのルール（ポストとは別の制約）
+- 1〜2文で短く返す（最大80文字程度）
+- 「すごい」「いいね」「わかる」だけの薄いリプはしない
+- 相手のツイート内容に対してホッケらしい視点でコメントする
+- 猫の視点から人間を観察するような一言が理想"""
+        for rule in extra_rules:
+            rules += f"\n- {rule}"
+        guidance = self.reply_strategy.get("guidance")
+        if guidance:
+            rules += f"\n\n## 運用戦略メモ\n{guidance}"
+        return rules
+
+    def _self_check(self, reply: str) -> tuple[Optional[str], Optional[str]]:
+        """生成したリプライの整形とNGフレーズチェック。(リプライ, NG理由) を返す"""
+        if len(reply) > 140:
+            reply = reply[:140]
+        phrase = self.reply_ng_matcher.match(reply)
+        if phrase is not None:
+            return None, f"セルフチェックNG: '{phrase}' を含む"
+        return reply, None
+
+    def judge_tweet(self, tweet_text: str) -> Optional[str]:
+        """ツイートにリプすべきか判断。None=OK, str=スキップ理由"""
+        system_prompt = f"""あなたはSNS投稿の安全性を判断するモデレーターです。
+以下のツイートに、猫キャラクターのアカウントがリプライしても問題ないか判断してください。
+
+{self._judge_rules()}
 
 ## 出力形式（厳守）
 JSON形式で出力。他の文字は一切含めないこと。
-リプOK: {"ok": true}
-スキップ: {"ok": false, "reason": "簡潔な理由"}"""
+リプOK: {{"ok": true}}
+スキップ: {{"ok": false, "reason": "簡潔な理由"}}"""
+
+        template = template_id("reply.judge", system_prompt)
+        cached = get_cache().get(template, backend_name("claude"), tweet_text)
+        if cached is not None:
+            return cached["reason"]
 
         user_prompt = f"このツイートを判断してください:\n\n{tweet_text}"
 
@@ -182,12 +252,12 @@ JSON形式で出力。他の文字は一切含めないこと。
             m = re.search(r"\{.*?\}", raw, re.DOTALL)
             payload = m.group(0) if m else raw
             result = json_module.loads(payload)
-            if result.get("ok"):
-                return None
-            return result.get("reason", "不明な理由でスキップ")
-        except (json_module.JSONDecodeError, TypeError):
+            reason = None if result.get("ok") else result.get("reason", "不明な理由でスキップ")
+        except (json_module.JSONDecodeError, TypeError, AttributeError):
             print(f"  判断JSONパース失敗: {raw}")
-            return "判断レスポンス不正"
+            return INVALID_RESPONSE_REASON
+        get_cache().put(template, backend_name("claude"), tweet_text, {"reason": reason})
+        return reason
 
     def generate_reply(self, tweet_text: str, category: str) -> Optional[str]:
         """judge_tweet → リプ生成の2段階。None=スキップ"""
@@ -203,31 +273,134 @@ JSON形式で出力。他の文字は一切含めないこと。
 
 {self.persona}
 
-## リプライのルール（ポストとは別の制約）
-- 1〜2文で短く返す（最大80文字程度）
-- 「すごい」「いいね」「わかる」だけの薄いリプはしない
-- 相手のツイート内容に対してホッケらしい視点でコメントする
-- 猫の視点から人間を観察するような一言が理想
-- リプライ本文のみを出力。説明や前置きは不要。"""
+{self._reply_rules("リプライ本文のみを出力。説明や前置きは不要。")}"""
 
-        guidance = self.reply_strategy.get("guidance")
-        if guidance:
-            system_prompt += f"\n\n## 運用戦略メモ\n{guidance}"
+        template = template_id("reply.draft", system_prompt)
+        cached = get_cache().get(template, backend_name("claude"), tweet_text)
+        if cached is not None:
+            reply = cached["reply"]
+        else:
+            user_prompt = f"以下のツイートにホッケとしてリプライしてください。\n\nツイート: {tweet_text}"
 
-        user_prompt = f"以下のツイートにホッケとしてリプライしてください。\n\nツイート: {tweet_text}"
+            reply_raw = self._call_claude(system_prompt, user_prompt, timeout=60)
+            reply = self._extract_reply_text(reply_raw or "")
+            if not reply:
+                return None
+            get_cache().put(template, backend_name("claude"), tweet_text, {"reply": reply})
 
-        reply_raw = self._call_claude(system_prompt, user_prompt, timeout=60)
-        reply = self._extract_reply_text(reply_raw or "")
-        if not reply:
+        reply, ng_reason = self._self_check(reply)
+        if ng_reason:
+            print(f"  {ng_reason}")
+            self._last_skip_reason = ng_reason
             return None
 
-        if len(reply) > 140:
-            reply = reply[:140]
+        return reply
 
-        ng_phrases = ['頑張', '応援', '素敵', 'ありがとう', '！！', '😊', '💪', '✨']
-        for phrase in ng_phrases:
-            if phrase in reply:
-                print(f"  セルフチェックNG: '{phrase}' を含む")
-                return None
+    # --- バッチ判定・生成 ---
 
-        return reply
+    def _parse_batch(self, raw: Optional[str], count: int) -> Optional[list[Optional[dict]]]:
+        """バッチ応答の JSON 配列を id ごとに取り出す。形が不正な項目は None。
+        呼び出し自体の失敗（応答なし）や JSON 配列として読めない応答は、丸ごと None を返す"""
+        if not raw:
+            return None
+        m = re.search(r"\[.*\]", raw, re.DOTALL)
+        try:
+            parsed = json_module.loads(m.group(0) if m else raw)
+        except (json_module.JSONDecodeError, TypeError):
+            return None
+        if not isinstance(parsed, list):
+            return None
+        items: list[Optional[dict]] = [None] * count
+        for entry in parsed:
+            if not isinstance(entry, dict) or not isinstance(entry.get("ok"), bool):
+                continue
+            try:
+                i = int(entry.get("id")) - 1
+            except (TypeError, ValueError):
+                continue
+            if not 0 <= i < count or items[i] is not None:
+                continue
+            if entry["ok"]:
+                reply = self._extract_reply_text(str(entry.get("reply") or ""))
+                if not reply:
+                    continue
+                items[i] = {"ok": True, "reason": None, "reply": reply}
+            else:
+                items[i] = {"ok": False, "reason": str(entry.get("reason") or "不明な理由でスキップ"), "reply": None}
+        return items
+
+    def _judge_and_draft_prompt(self) -> str:
+        return f"""あなたは「ホッケ」というキャラクターのアカウント運用担当です。
+番号付きのツイートそれぞれについて、まずリプライしても問題ないかを判断し、
+問題なければホッケとしてのリプライを書いてください。
+
+{self._judge_rules()}
+
+## ホッケのペルソナ
+{self.persona}
+
+{self._reply_rules()}
+
+## 出力形式（厳守）
+ツイートと同じ件数の JSON 配列のみを出力。他の文字は一切含めないこと。
+リプOK: {{"id": 番号, "ok": true, "reply": "リプライ本文"}}
+スキップ: {{"id": 番号, "ok": false, "reason": "簡潔な理由"}}"""
+
+    def _judge_and_draft(self, tweets: list[dict]) -> Optional[list[Optional[dict]]]:
+        """1回の呼び出しで tweets 全件を判定し、OK のものはリプライも書かせる（失敗時は None）"""
+        system_prompt = self._judge_and_draft_prompt()
+
+        items = "\n\n".join(f"[{i}] {t['text']}" for i, t in enumerate(tweets, 1))
+        user_prompt = f"以下の{len(tweets)}件のツイートを判断し、リプライしてください。\n\n{items}"
+
+        timeout = min(60 + REPLY_BATCH_TIMEOUT_PER_ITEM * len(tweets), 180)
+        raw = self._call_claude(system_prompt, user_prompt, timeout=timeout)
+        return self._parse_batch(raw, len(tweets))
+
+    def generate_replies(self, tweets: list[dict]) -> list[dict]:
+        """tweets（{"text", "category"}）をまとめて判定・生成する。
+
+        入力と同じ順で {"ok", "reason", "reply", "judged"} を返す。judged はツイート自体への判定
+        （リプ可・リプ不可）が出たときだけ True で、セルフチェックNG・判定不能は False。
+        判定済みのツイートは LLM キャッシュから返し、
+        残りを最大 REPLY_BATCH_SIZE 件ずつ1回の呼び出しにまとめ、配列は読めたが一部の項目が
+        欠けていた・不正だったときだけ、その項目を1件で呼び直す。呼び出し自体が失敗した
+        （タイムアウト・CLI なし・応答が読めない）ときは LLM が落ちているとみなし、
+        残りを全て INVALID_RESPONSE_REASON にして打ち切る。NGフレーズのセルフチェックは項目ごとに行う。
+        """
+        cache = get_cache()
+        template = template_id("reply.judge_draft", self._judge_and_draft_prompt())
+        model = backend_name("claude")
+        items: list[Optional[dict]] = [cache.get(template, model, t["text"]) for t in tweets]
+        misses = [i for i, item in enumerate(items) if item is None]
+        if len(misses) < len(tweets):
+            print(f"  LLMキャッシュ: {len(tweets) - len(misses)}/{len(tweets)}件ヒット")
+
+        for start in range(0, len(misses), REPLY_BATCH_SIZE):
+            chunk = misses[start:start + REPLY_BATCH_SIZE]
+            drafts = self._judge_and_draft([tweets[i] for i in chunk])
+            if drafts is None:
+                print(f"  バッチ呼び出し失敗 → 残り{len(misses) - start}件を判定不能として打ち切り")
+                break
+            for i, item in zip(chunk, drafts):
+                if item is None and len(chunk) > 1:
+                    print(f"  バッチ応答不正 → 単独で再判定: {tweets[i]['text'][:30]}...")
+                    item = (self._judge_and_draft([tweets[i]]) or [None])[0]
+                if item is not None:
+                    cache.put(template, model, tweets[i]["text"], item)
+                items[i] = item
+
+        results: list[dict] = []
+        for item in items:
+            if item is None:
+                item = {"ok": False, "reason": INVALID_RESPONSE_REASON, "reply": None, "judged": False}
+            elif item["ok"]:
+                reply, ng_reason = self._self_check(item["reply"])
+                if ng_reason:
+                    item = {"ok": False, "reason": ng_reason, "reply": None, "judged": False}
+                else:
+                    item = dict(item, reply=reply, judged=True)
+            else:
+                item = dict(item, judged=True)
+            results.append(item)
+        return results
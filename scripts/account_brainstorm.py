@@ -8,7 +8,6 @@ from __future__ import annotations
 
 import json
 import os
-import subprocess
 import sys
 from datetime import datetime
 from pathlib import Path
@@ -17,6 +16,7 @@ PROJECT_DIR = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(PROJECT_DIR))
 
 from notifications.discord_notifier import DiscordNotifier
+from llm.llm_gateway import get_gateway
 from dotenv import load_dotenv
 
 load_dotenv(PROJECT_DIR / ".env")
@@ -52,31 +52,16 @@ def notify_discord(title: str, description: str, color: int = 0x5865F2):
 
 
 def run_codex(prompt: str) -> str:
-    """Codex CLIを実行して結果を返す"""
+    """Codex CLIを実行して結果を返す（llm_gateway 経由。ヘッダー/フッターは除去済み）"""
     try:
-        result = subprocess.run(
-            ["/home/sekiz/.nvm/versions/node/v24.13.0/bin/codex", "exec", "--skip-git-repo-check", prompt],
-            capture_output=True, text=True, timeout=180,
-            cwd=str(PROJECT_DIR),
-        )
-        output = result.stdout
-        # codex exec の出力からヘッダーとフッターを除去
-        lines = output.split("\n")
-        content_lines = []
-        in_content = False
-        for line in lines:
-            if line.startswith("codex"):
-                in_content = True
-                continue
-            if in_content:
-                if line.startswith("tokens used"):
-                    break
-                content_lines.append(line)
-        return "\n".join(content_lines).strip() if content_lines else output
-    except subprocess.TimeoutExpired:
-        return "[ERROR] Codex タイムアウト (180秒)"
+        response = get_gateway("codex").complete(prompt, timeout=180)
     except Exception as e:
         return f"[ERROR] Codex 実行失敗: {e}"
+    if response.timed_out:
+        return "[ERROR] Codex タイムアウト (180秒)"
+    if not response.ok:
+        return f"[ERROR] Codex 実行失敗: {response.error}"
+    return response.text
 
 
 # --- Round Prompts ---
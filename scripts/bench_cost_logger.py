@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+cost_logger のオーバーヘッド ベンチマーク
+log_api_usage 1回あたりの呼び出し側の時間を、旧方式（毎回 mkdir + open("a") + close）と
+バッファ付き writer（fsync なし / あり）で比較する。ログは一時ディレクトリに書く。
+
+Usage:
+    python3 scripts/bench_cost_logger.py [--calls 5000] [--rounds 5]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+from pathlib import Path
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_DIR / "post_scheduler"))
+
+import cost_logger
+
+
+def legacy_log_api_usage(log_file: Path, usage_type: str, units: int, endpoint: str, metadata: dict) -> None:
+    """旧 log_api_usage と同じく1件ごとに mkdir + open + write + close する"""
+    unit_price = cost_logger.UNIT_PRICES.get(usage_type, 0.0)
+    record = {
+        "timestamp": datetime.now().isoformat(),
+        "date": date.today().isoformat(),
+        "usage_type": usage_type,
+        "endpoint": endpoint,
+        "units": units,
+        "unit_price_usd": unit_price,
+        "estimated_cost_usd": round(units * unit_price, 6),
+        "request_count": 1,
+        "context": "bench",
+        "metadata": metadata,
+    }
+    log_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(log_file, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def run_legacy(log_file: Path, calls: int) -> float:
+    t0 = time.perf_counter()
+    for i in range(calls):
+        legacy_log_api_usage(log_file, "post_read", 100, "GET /2/tweets", {"requested_ids": 100, "i": i})
+    return time.perf_counter() - t0
+
+
+def run_buffered(log_dir: Path, calls: int, fsync: bool) -> tuple[float, float]:
+    """(呼び出し側の合計時間, 最後の flush にかかった時間)"""
+    cost_logger.LOG_DIR = log_dir
+    cost_logger._WRITER.fsync = fsync
+    t0 = time.perf_counter()
+    for i in range(calls):
+        cost_logger.log_api_usage("post_read", 100, "GET /2/tweets", context="bench", metadata={"requested_ids": 100, "i": i})
+    elapsed = time.perf_counter() - t0
+    t1 = time.perf_counter()
+    cost_logger.flush()
+    return elapsed, time.perf_counter() - t1
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="cost_logger オーバーヘッド ベンチマーク")
+    parser.add_argument("--calls", type=int, default=5000, help="1ラウンドの log_api_usage 呼び出し回数")
+    parser.add_argument("--rounds", type=int, default=5, help="試行回数（中央値を採用）")
+    args = parser.parse_args()
+
+    tmp = Path(tempfile.mkdtemp())
+    legacy, buffered, buffered_fsync, flush_ms = [], [], [], []
+    for r in range(args.rounds):
+        legacy.append(run_legacy(tmp / f"legacy_{r}.jsonl", args.calls))
+        elapsed, flush_time = run_buffered(tmp / f"buffered_{r}", args.calls, fsync=False)
+        buffered.append(elapsed)
+        flush_ms.append(flush_time * 1000)
+        buffered_fsync.append(run_buffered(tmp / f"fsync_{r}", args.calls, fsync=True)[0])
+
+    def per_call_us(samples: list[float]) -> float:
+        return statistics.median(samples) / args.calls * 1e6
+
+    written = sum(len(p.read_text(encoding="utf-8").splitlines()) for p in (tmp / "buffered_0").rglob("*.jsonl"))
+    print(f"calls={args.calls} rounds={args.rounds} (written {written}/{args.calls} lines)")
+    print(f"  legacy (open per call)   : {per_call_us(legacy):8.2f} us/call")
+    print(f"  buffered                 : {per_call_us(buffered):8.2f} us/call  (final flush {statistics.median(flush_ms):.1f} ms)")
+    print(f"  buffered + fsync         : {per_call_us(buffered_fsync):8.2f} us/call")
+    print(f"  speedup                  : {per_call_us(legacy) / per_call_us(buffered):8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
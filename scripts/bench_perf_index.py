@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+sync_timeline の upsert ベンチマーク
+旧方式（返却ツイートごとに data["posts"] を線形走査）と PostIndex.upsert_many を
+合成履歴で比較する。
+
+Usage:
+    python3 scripts/bench_perf_index.py [--history 100000] [--tweets 100]
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_DIR / "post_scheduler"))
+
+from perf_store import PostIndex
+
+
+def make_history(n: int) -> dict:
+    return {
+        "posts": [
+            {
+                "tweet_id": str(10**18 + i),
+                "text": f"post {i}",
+                "hookCategory": "脱力系",
+                "tweet_type": "post",
+                "likes": 0,
+                "retweets": 0,
+                "impressions": 0,
+            }
+            for i in range(n)
+        ]
+    }
+
+
+def make_records(history: int, tweets: int) -> list[dict]:
+    # 直近ツイートの更新が中心 + 新規が数件、という sync の典型パターン
+    ids = [str(10**18 + history - 1 - i) for i in range(tweets - 5)]
+    ids += [str(10**18 + history + i) for i in range(5)]
+    random.shuffle(ids)
+    return [{"tweet_id": tid, "likes": 3, "retweets": 1, "impressions": 42} for tid in ids]
+
+
+def legacy_upsert(data: dict, records: list[dict]) -> tuple[int, int]:
+    """旧 sync_timeline と同じ走査パターン"""
+    existing_ids = {p["tweet_id"] for p in data["posts"]}
+    added = updated = 0
+    for rec in records:
+        tid = rec["tweet_id"]
+        if tid not in existing_ids:
+            data["posts"].append(dict(rec))
+            existing_ids.add(tid)
+            added += 1
+        else:
+            for post in data["posts"]:
+                if post["tweet_id"] == tid:
+                    post.update(rec)
+                    break
+            updated += 1
+    return added, updated
+
+
+def indexed_upsert(data: dict, records: list[dict]) -> tuple[int, int]:
+    return PostIndex(data).upsert_many(records)
+
+
+def bench(fn, history: int, records: list[dict], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        data = make_history(history)
+        t0 = time.perf_counter()
+        fn(data, records)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="sync upsert ベンチマーク")
+    parser.add_argument("--history", type=int, default=100_000, help="既存投稿数 (default: 100000)")
+    parser.add_argument("--tweets", type=int, default=100, help="1回の sync で返るツイート数 (default: 100)")
+    parser.add_argument("--repeat", type=int, default=3, help="試行回数（最良値を採用）")
+    args = parser.parse_args()
+
+    random.seed(0)
+    records = make_records(args.history, args.tweets)
+
+    legacy = bench(legacy_upsert, args.history, records, args.repeat)
+    indexed = bench(indexed_upsert, args.history, records, args.repeat)
+
+    print(f"history={args.history:,} tweets={args.tweets}")
+    print(f"  linear scan : {legacy * 1000:9.1f} ms")
+    print(f"  PostIndex   : {indexed * 1000:9.1f} ms  (索引構築込み)")
+    print(f"  speedup     : {legacy / indexed:9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
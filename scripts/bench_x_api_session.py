@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+XApiClient の接続プール ベンチマーク
+ローカルのスタブサーバーに対して、generate_candidates 1回分（複数クエリの検索）を
+旧方式（呼び出しごとの requests.get）と XApiClient の pooled Session で比較する。
+
+TLS ハンドシェイクの差も測る場合は自己署名証明書を渡す:
+    openssl req -x509 -newkey rsa:2048 -nodes -subj /CN=localhost -keyout /tmp/k.pem -out /tmp/c.pem
+    python3 scripts/bench_x_api_session.py --tls /tmp/c.pem /tmp/k.pem
+
+Usage:
+    python3 scripts/bench_x_api_session.py [--queries 12] [--rounds 5]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import ssl
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_DIR / "post_scheduler"))
+
+os.environ.setdefault("X_BEARER_TOKEN", "bench-token")
+
+import requests
+import urllib3
+
+import cost_logger
+from x_api_client import XApiClient
+
+STUB_BODY = json.dumps({
+    "data": [
+        {"id": str(i), "text": f"stub tweet {i}", "author_id": str(i), "public_metrics": {"like_count": i}}
+        for i in range(10)
+    ],
+    "includes": {"users": [{"id": str(i), "username": f"user{i}"} for i in range(10)]},
+}).encode()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive を有効にする
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(STUB_BODY)))
+        self.end_headers()
+        self.wfile.write(STUB_BODY)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_server(tls: list[str] | None) -> tuple[ThreadingHTTPServer, str]:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    scheme = "http"
+    if tls:
+        ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        ctx.load_cert_chain(tls[0], tls[1])
+        server.socket = ctx.wrap_socket(server.socket, server_side=True)
+        scheme = "https"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"{scheme}://127.0.0.1:{server.server_address[1]}"
+
+
+def legacy_search(base_url: str, query: str, verify: bool) -> dict:
+    """旧 search_recent_tweets と同じく毎回 requests.get で新規接続する"""
+    resp = requests.get(
+        base_url + "/2/tweets/search/recent",
+        headers={"Authorization": "Bearer bench-token"},
+        params={"query": f"{query} -is:retweet -is:reply lang:ja", "max_results": 10},
+        verify=verify,
+    )
+    resp.raise_for_status()
+    return resp.json()
+
+
+def run_legacy(base_url: str, queries: list[str], verify: bool) -> list[float]:
+    latencies = []
+    for q in queries:
+        t0 = time.perf_counter()
+        legacy_search(base_url, q, verify)
+        latencies.append(time.perf_counter() - t0)
+    return latencies
+
+
+def run_pooled(base_url: str, queries: list[str], verify: bool) -> list[float]:
+    latencies = []
+    with XApiClient(require_bearer=True, base_url=base_url) as client:
+        client.session.verify = verify
+        for q in queries:
+            t0 = time.perf_counter()
+            client.search_recent_tweets(q, max_results=10)
+            latencies.append(time.perf_counter() - t0)
+    return latencies
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="XApiClient 接続プール ベンチマーク")
+    parser.add_argument("--queries", type=int, default=12, help="1回の generate_candidates の検索クエリ数 (default: 12)")
+    parser.add_argument("--rounds", type=int, default=5, help="試行回数（中央値を採用）")
+    parser.add_argument("--tls", nargs=2, metavar=("CERT", "KEY"), help="自己署名証明書で HTTPS スタブを立てる")
+    args = parser.parse_args()
+
+    # ベンチの検索が本番のコストログに混ざらないようにする
+    tmp = Path(tempfile.mkdtemp())
+    cost_logger.LOG_DIR = tmp
+    urllib3.disable_warnings()
+
+    server, base_url = start_server(args.tls)
+    queries = [f"猫 クエリ{i}" for i in range(args.queries)]
+    verify = not args.tls
+
+    legacy_rounds, pooled_rounds = [], []
+    for _ in range(args.rounds):
+        legacy_rounds.append(run_legacy(base_url, queries, verify))
+        pooled_rounds.append(run_pooled(base_url, queries, verify))
+    server.shutdown()
+
+    legacy = [statistics.median(r) for r in zip(*legacy_rounds)]
+    pooled = [statistics.median(r) for r in zip(*pooled_rounds)]
+    legacy_ms = statistics.mean(legacy) * 1000
+    pooled_ms = statistics.mean(pooled) * 1000
+
+    print(f"stub={base_url} queries={args.queries} rounds={args.rounds}")
+    print(f"  requests.get (per call) : {legacy_ms:8.2f} ms/call  total {sum(legacy) * 1000:8.1f} ms")
+    print(f"  pooled Session          : {pooled_ms:8.2f} ms/call  total {sum(pooled) * 1000:8.1f} ms")
+    print(f"  1st call (pooled)       : {pooled[0] * 1000:8.2f} ms  (接続確立込み)")
+    print(f"  saving                  : {legacy_ms - pooled_ms:8.2f} ms/call")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+budget_guard（X API の事前予算チェック）の動作テスト
+実行: python3 tests/test_budget_guard.py
+"""
+
+import json
+import os
+import sys
+import tempfile
+from datetime import date
+from pathlib import Path
+
+PROJECT_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_DIR / "post_scheduler"))
+
+import cost_logger
+from budget_guard import BudgetExceeded, BudgetGuard, unit_cost
+
+PASSED = 0
+FAILED = 0
+
+
+def test(name: str, condition: bool, detail: str = ""):
+    global PASSED, FAILED
+    if condition:
+        PASSED += 1
+        print(f"  PASS: {name}")
+    else:
+        FAILED += 1
+        msg = f"  FAIL: {name}"
+        if detail:
+            msg += f" — {detail}"
+        print(msg)
+
+
+def section(title: str):
+    print(f"\n=== {title} ===")
+
+
+def write_log(rows: list[tuple[str, float]]) -> None:
+    for day, cost in rows:
+        path = cost_logger.partition_path(day)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"date": day, "usage_type": "post_read", "estimated_cost_usd": cost}) + "\n")
+            f.write("{broken\n")
+
+
+TODAY = date(2026, 3, 15)
+tmp = Path(tempfile.mkdtemp())
+cost_logger.LOG_DIR = tmp
+cost_logger.LOG_FILE = tmp / "x_api_usage.jsonl"
+write_log([("2026-03-15", 0.30), ("2026-03-15", 0.20), ("2026-03-10", 1.0), ("2026-02-28", 5.0)])
+cost_logger.finalize_day("2026-03-10")
+
+# -------------------------------------------------------
+# 1. ログからの初期化
+# -------------------------------------------------------
+section("ログからの初期化")
+
+guard = BudgetGuard(1.0, 3.0, create_reserve_usd=0.0, register=False)
+day, month = guard.spent(TODAY)
+test("当日分を集計", abs(day - 0.5) < 1e-9, f"day={day}")
+test("当月分だけを集計（締め済みの日は sidecar、先月は含めない）", abs(month - 1.5) < 1e-9, f"month={month}")
+test("残りは日次・月次の小さい方", abs(guard.remaining_usd(TODAY) - 0.5) < 1e-9)
+
+guard.record({"date": "2026-03-15", "estimated_cost_usd": 0.1})
+test("usage hook で累計を更新", abs(guard.spent(TODAY)[0] - 0.6) < 1e-9)
+
+# -------------------------------------------------------
+# 2. 事前チェック
+# -------------------------------------------------------
+section("事前チェック")
+
+search_usd = unit_cost("post_read", "user_read")
+test("単価を合算", abs(search_usd - 0.015) < 1e-9)
+
+with guard.reserve("GET /2/tweets/search/recent", 10, unit_usd=search_usd, min_units=10, today=TODAY) as n:
+    test("予算内ならそのまま", n == 10)
+    test("予約中は残りから差し引く", abs(guard.remaining_usd(TODAY) - 0.25) < 1e-9, f"{guard.remaining_usd(TODAY)}")
+test("with を抜けたら予約を解放", abs(guard.remaining_usd(TODAY) - 0.4) < 1e-9)
+
+with guard.reserve("GET /2/tweets/search/recent", 100, unit_usd=search_usd, min_units=10, today=TODAY) as n:
+    test("足りなければ max_results を縮小", n == 26, f"n={n}")
+
+try:
+    with guard.reserve("GET /2/tweets", 100, unit_usd=unit_cost("post_read"), today=TODAY):
+        pass
+    err = None
+except BudgetExceeded as e:
+    err = e
+test("min_units なしで足りなければ拒否", err is not None)
+test("日次超過は翌日に延期", err is not None and err.scope == "daily" and err.retry_at.date() == date(2026, 3, 16))
+
+# -------------------------------------------------------
+# 3. 月次予算
+# -------------------------------------------------------
+section("月次予算")
+
+guard = BudgetGuard(None, 1.6, create_reserve_usd=0.0, register=False)
+try:
+    with guard.reserve("POST /2/tweets", 20, unit_usd=unit_cost("content_create"), today=TODAY):
+        pass
+    err = None
+except BudgetExceeded as e:
+    err = e
+test("月次超過は翌月1日に延期", err is not None and err.scope == "monthly" and err.retry_at.date() == date(2026, 4, 1))
+
+guard = BudgetGuard(None, None, register=False)
+with guard.reserve("GET /2/tweets", 10_000, unit_usd=unit_cost("post_read"), today=TODAY) as n:
+    test("予算なしなら制限しない", n == 10_000)
+
+# -------------------------------------------------------
+# 4. 投稿用の取り置き・既定値
+# -------------------------------------------------------
+section("投稿用の取り置き・既定値")
+
+guard = BudgetGuard(1.0, None, create_reserve_usd=0.3, register=False)
+test("読み取り用の残りは取り置きを除く",
+     abs(guard.remaining_usd(TODAY, essential=False) - (guard.remaining_usd(TODAY) - 0.3)) < 1e-9,
+     f"{guard.remaining_usd(TODAY, essential=False)} / {guard.remaining_usd(TODAY)}")
+with guard.reserve("GET /2/tweets/search/recent", 100, unit_usd=search_usd, min_units=10, today=TODAY) as n:
+    test("読み取りは取り置きを残して縮小", n == 13, f"n={n}")
+try:
+    with guard.reserve("GET /2/tweets", 50, unit_usd=unit_cost("post_read"), today=TODAY):
+        pass
+    err = None
+except BudgetExceeded as e:
+    err = e
+test("取り置きに食い込む読み取りは拒否", err is not None)
+with guard.reserve("POST /2/tweets", 40, unit_usd=unit_cost("content_create"), today=TODAY, essential=True) as n:
+    test("投稿は取り置きまで使える", n == 40)
+
+for name in ("X_API_DAILY_BUDGET_USD", "X_API_MONTHLY_BUDGET_USD", "X_API_CREATE_RESERVE_USD"):
+    os.environ.pop(name, None)
+guard = BudgetGuard.from_env(register=False)
+test("環境変数が無ければ予算なし", guard.daily_usd is None and guard.monthly_usd is None)
+os.environ.update({"X_API_DAILY_BUDGET_USD": "2", "X_API_CREATE_RESERVE_USD": "0"})
+guard = BudgetGuard.from_env(register=False)
+test("環境変数で予算と取り置きを設定", guard.daily_usd == 2.0 and guard.create_reserve_usd == 0.0)
+
+# -------------------------------------------------------
+# 5. cost_logger 連携
+# -------------------------------------------------------
+section("cost_logger 連携")
+
+cost_logger.LOG_DIR = tmp / "logs"
+guard = BudgetGuard(1.0, None)
+before = guard.spent()[0]
+cost_logger.log_api_usage("post_read", 20, "GET /2/tweets")
+test("log_api_usage の記録が累計に入る", abs(guard.spent()[0] - before - 0.1) < 1e-9)
+
+# -------------------------------------------------------
+# サマリー
+# -------------------------------------------------------
+print(f"\n{'='*50}")
+print(f"結果: {PASSED} PASSED / {FAILED} FAILED / {PASSED + FAILED} TOTAL")
+if FAILED > 0:
+    print("FAILED テストがあります。確認してください。")
+    sys.exit(1)
+else:
+    print("全テスト PASSED")
+    sys.exit(0)
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+check_engagement の未分類投稿のバッチ分類（categorize_unknown_posts / _categorize_batch / _plan_batches）の動作テスト
+LLM は StubBackend（LLM_BACKEND=stub）に差し替え、LLM キャッシュは一時ファイルを使う。
+実行: python3 tests/test_categorize.py
+"""
+
+import json
+import os
+import re
+import sys
+import tempfile
+from pathlib import Path
+
+PROJECT_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_DIR))
+sys.path.insert(0, str(PROJECT_DIR / "post_scheduler"))
+
+from llm import llm_cache
+from llm.llm_gateway import StubBackend, register_backend
+
+llm_cache.DB_FILE = Path(tempfile.mkdtemp()) / "llm_cache.db"
+llm_cache._CACHE = None
+os.environ["LLM_BACKEND"] = "stub"
+
+import check_engagement
+from check_engagement import _categorize_batch, _plan_batches, categorize_unknown_posts
+
+PASSED = 0
+FAILED = 0
+
+
+def test(name: str, condition: bool, detail: str = ""):
+    global PASSED, FAILED
+    if condition:
+        PASSED += 1
+        print(f"  PASS: {name}")
+    else:
+        FAILED += 1
+        msg = f"  FAIL: {name}"
+        if detail:
+            msg += f" — {detail}"
+        print(msg)
+
+
+def section(title: str):
+    print(f"\n=== {title} ===")
+
+
+# プロンプトを受け取って応答を返す関数（テストごとに差し替える）
+calls: list[str] = []
+answer = lambda prompt: ""
+
+
+def responder(prompt: str) -> str:
+    calls.append(prompt)
+    return answer(prompt)
+
+
+register_backend("stub", lambda: StubBackend(responder))
+
+
+def batch_texts(prompt: str) -> list[str]:
+    """バッチプロンプト中の [番号] 投稿本文 を取り出す"""
+    return re.findall(r"^\[\d+\] (.+)$", prompt, re.MULTILINE)
+
+
+def single_text(prompt: str) -> str:
+    return prompt.split("投稿テキスト:\n", 1)[1]
+
+
+def category_of(text: str) -> str:
+    """本文の先頭に書いたカテゴリを正解とする"""
+    return text.split(":", 1)[0]
+
+
+def answer_all(prompt: str) -> str:
+    if "投稿テキスト:" in prompt:
+        return category_of(single_text(prompt))
+    return json.dumps([category_of(t) for t in batch_texts(prompt)], ensure_ascii=False)
+
+
+def posts(texts: list[str]) -> dict:
+    return {"posts": [{"text": t, "hookCategory": "未分類"} for t in texts]}
+
+
+def sizes() -> list[int]:
+    """各呼び出しの件数（1件ずつの呼び出しは 1）"""
+    return [len(batch_texts(p)) if "投稿テキスト:" not in p else 1 for p in calls]
+
+
+# -------------------------------------------------------
+# 1. _plan_batches
+# -------------------------------------------------------
+section("_plan_batches")
+
+short = [{"text": f"猫{i}"} for i in range(7)]
+test("件数の上限で区切る", [len(b) for b in _plan_batches(short, 3)] == [3, 3, 1])
+long = [{"text": "あ" * 1500} for _ in range(5)]
+test("本文の合計文字数の上限で区切る", [len(b) for b in _plan_batches(long, 20)] == [2, 2, 1])
+huge = [{"text": "あ" * (check_engagement.CATEGORIZE_BATCH_MAX_CHARS + 1)}, {"text": "猫"}]
+test("上限より長い1件も単独のバッチにする", [len(b) for b in _plan_batches(huge, 20)] == [1, 1])
+test("空なら空", _plan_batches([], 5) == [])
+
+# -------------------------------------------------------
+# 2. _categorize_batch
+# -------------------------------------------------------
+section("_categorize_batch")
+
+three = [{"text": "a"}, {"text": "b"}, {"text": "c"}]
+answer = lambda prompt: 'はい。\n["「脱力系」", "猫写真です", "犬"]\n以上'
+test("前後の説明を除いて JSON 配列を読み、カテゴリ名を正規化", _categorize_batch(three) == ["脱力系", "猫写真", None])
+answer = lambda prompt: '["脱力系", 3, null]'
+test("文字列でない項目は None", _categorize_batch(three) == ["脱力系", None, None])
+answer = lambda prompt: '["脱力系", "猫写真"]'
+test("件数が合わなければ全て None", _categorize_batch(three) == [None, None, None])
+answer = lambda prompt: "分類できませんでした"
+test("JSON 配列が無ければ全て None", _categorize_batch(three) == [None, None, None])
+
+# -------------------------------------------------------
+# 3. categorize_unknown_posts
+# -------------------------------------------------------
+section("categorize_unknown_posts")
+
+calls.clear()
+answer = answer_all
+data = posts([f"脱力系:一括{i}" for i in range(5)] + ["猫写真:一括5"])
+updated = categorize_unknown_posts(data, batch_size=6)
+test("1回の呼び出しでまとめて分類", len(calls) == 1 and updated == 6, f"calls={sizes()}")
+test("投稿に分類を書き込む", [p["hookCategory"] for p in data["posts"]] == ["脱力系"] * 5 + ["猫写真"])
+
+calls.clear()
+data = posts([f"脱力系:一括{i}" for i in range(3)])
+updated = categorize_unknown_posts(data, batch_size=6)
+test("分類済みの本文は LLM キャッシュから（呼び出さない）", not calls and updated == 3)
+
+
+def one_unknown(prompt: str) -> str:
+    if "投稿テキスト:" in prompt:
+        return answer_all(prompt)
+    return json.dumps([category_of(t) if i else "よくわからない" for i, t in enumerate(batch_texts(prompt))],
+                      ensure_ascii=False)
+
+
+calls.clear()
+answer = one_unknown
+data = posts(["日常観察:救済0", "鋭い一言:救済1", "時事ネタ:救済2"])
+updated = categorize_unknown_posts(data, batch_size=3)
+test("分類できなかった投稿だけ1件で呼び直す", sizes() == [3, 1] and updated == 3, f"calls={sizes()}")
+test("呼び直した投稿も分類される", data["posts"][0]["hookCategory"] == "日常観察")
+
+
+def short_answers(prompt: str) -> str:
+    """3件以上のバッチには件数の足りない配列を返す"""
+    if "投稿テキスト:" in prompt:
+        return answer_all(prompt)
+    texts = batch_texts(prompt)
+    cats = [category_of(t) for t in texts]
+    return json.dumps(cats[:-1] if len(texts) > 2 else cats, ensure_ascii=False)
+
+
+calls.clear()
+answer = short_answers
+data = posts([f"猫Meme:半分{i}" for i in range(5)])
+updated = categorize_unknown_posts(data, batch_size=5)
+test("件数が合わなければバッチサイズを半分にしてやり直す", sizes() == [5, 2, 2, 1], f"calls={sizes()}")
+test("半分にした後で全て分類", updated == 5 and all(p["hookCategory"] == "猫Meme" for p in data["posts"]))
+
+
+def outage(prompt: str) -> str:
+    raise RuntimeError("timeout")
+
+
+calls.clear()
+answer = outage
+data = posts([f"脱力系:障害{i}" for i in range(4)])
+updated = categorize_unknown_posts(data, batch_size=4)
+test("LLM が落ちていれば1件ずつまで縮めて諦める", sizes() == [4, 2, 1, 1, 1, 1] and updated == 0, f"calls={sizes()}")
+test("分類できなかった投稿は未分類のまま", all(p["hookCategory"] == "未分類" for p in data["posts"]))
+
+# -------------------------------------------------------
+# サマリー
+# -------------------------------------------------------
+print(f"\n{'='*50}")
+print(f"結果: {PASSED} PASSED / {FAILED} FAILED / {PASSED + FAILED} TOTAL")
+if FAILED > 0:
+    print("FAILED テストがあります。確認してください。")
+    sys.exit(1)
+else:
+    print("全テスト PASSED")
+    sys.exit(0)
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+cost_logger（バッファ付き・日別パーティションの API 利用ログ）の動作テスト
+実行: python3 tests/test_cost_logger.py
+"""
+
+import fcntl
+import gzip
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, datetime
+from pathlib import Path
+
+PROJECT_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_DIR / "post_scheduler"))
+
+import cost_logger
+
+PASSED = 0
+FAILED = 0
+
+
+def test(name: str, condition: bool, detail: str = ""):
+    global PASSED, FAILED
+    if condition:
+        PASSED += 1
+        print(f"  PASS: {name}")
+    else:
+        FAILED += 1
+        msg = f"  FAIL: {name}"
+        if detail:
+            msg += f" — {detail}"
+        print(msg)
+
+
+def section(title: str):
+    print(f"\n=== {title} ===")
+
+
+def read_lines(path: Path) -> list[dict]:
+    if not path.exists():
+        return []
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+tmp = Path(tempfile.mkdtemp())
+cost_logger.LOG_DIR = tmp
+cost_logger.LOG_FILE = tmp / "x_api_usage.jsonl"
+TODAY_FILE = cost_logger.partition_path(date.today().isoformat())
+
+# -------------------------------------------------------
+# 1. バッファ
+# -------------------------------------------------------
+section("バッファ")
+
+seen = []
+cost_logger.add_usage_hook(seen.append)
+for i in range(5):
+    cost_logger.log_api_usage("post_read", 10, "GET /2/tweets", context="test", metadata={"i": i})
+test("usage hook は記録時にすぐ呼ばれる", len(seen) == 5)
+test("interval 内はまだ書かない", len(read_lines(TODAY_FILE)) == 0)
+
+cost_logger.flush()
+rows = read_lines(TODAY_FILE)
+test("当日のパーティションに書く", TODAY_FILE.parent == tmp / "x_api_usage")
+test("flush で全件書く", len(rows) == 5)
+test("順序を保つ", [r["metadata"]["i"] for r in rows] == list(range(5)))
+test("レコード形式は従来どおり", rows[0]["estimated_cost_usd"] == 0.05 and rows[0]["units"] == 10)
+
+cost_logger.log_api_usage("post_read", 1, "GET /2/tweets")
+time.sleep(cost_logger.FLUSH_INTERVAL_SECONDS + 0.5)
+test("バックグラウンドで interval ごとに書く", len(read_lines(TODAY_FILE)) == 6)
+
+cost_logger.LOG_DIR = tmp / "other"
+cost_logger.log_api_usage("user_read", 1, "GET /2/users/me")
+cost_logger.flush()
+test("記録時点の LOG_DIR に書く", len(read_lines(cost_logger.partition_path(date.today().isoformat()))) == 1)
+cost_logger.LOG_DIR = tmp
+
+# -------------------------------------------------------
+# 2. 上限・write through
+# -------------------------------------------------------
+section("上限・write through")
+
+path = tmp / "bounded.jsonl"
+writer = cost_logger._BufferedWriter(interval=3600, max_records=3, fsync=False)
+for i in range(3):
+    writer.append(path, f'{{"i": {i}}}\n'.encode())
+test("max_records に達したら呼び出し側で書く", len(read_lines(path)) == 3)
+
+path = tmp / "through.jsonl"
+writer = cost_logger._BufferedWriter(interval=0, max_records=3, fsync=True)
+writer.append(path, b'{"i": 0}\n')
+test("interval=0 なら即時に書く", len(read_lines(path)) == 1)
+
+# -------------------------------------------------------
+# 3. プロセス間
+# -------------------------------------------------------
+section("プロセス間")
+
+shared_dir = tmp / "shared"
+shared = shared_dir / "x_api_usage" / f"{date.today().isoformat()}.jsonl"
+script = f"""
+import sys
+sys.path.insert(0, {str(PROJECT_DIR / "post_scheduler")!r})
+import cost_logger
+cost_logger.LOG_DIR = __import__("pathlib").Path({str(shared_dir)!r})
+for i in range(2000):
+    cost_logger.log_api_usage("post_read", 1, "GET /2/tweets", metadata={{"pad": "x" * 200, "i": i}})
+"""
+procs = [subprocess.Popen([sys.executable, "-c", script]) for _ in range(4)]
+for p in procs:
+    p.wait()
+try:
+    rows = read_lines(shared)
+    intact = True
+except json.JSONDecodeError:
+    rows, intact = [], False
+test("同時追記でも行が壊れない", intact)
+test("全プロセスの全件が残る（atexit で flush）", len(rows) == 8000, f"rows={len(rows)}")
+
+# -------------------------------------------------------
+# 4. 日別パーティション
+# -------------------------------------------------------
+section("日別パーティション")
+
+cost_logger.LOG_DIR = tmp / "parts"
+cost_logger.LOG_FILE = cost_logger.LOG_DIR / "x_api_usage.jsonl"
+
+
+def write_day(day: str, rows: list[tuple[str, str, int]]) -> None:
+    lines = []
+    for usage_type, endpoint, units in rows:
+        price = cost_logger.UNIT_PRICES[usage_type]
+        lines.append(json.dumps({
+            "date": day, "usage_type": usage_type, "endpoint": endpoint, "units": units,
+            "unit_price_usd": price, "estimated_cost_usd": round(units * price, 6), "metadata": {},
+        }).encode() + b"\n")
+    cost_logger._append_lines(cost_logger.partition_path(day), lines, False)
+
+
+write_day("2026-03-01", [("post_read", "GET /2/tweets", 100), ("user_read", "GET /2/users/me", 1)])
+write_day("2026-03-02", [("post_read", "GET /2/tweets", 20)])
+
+closed = cost_logger.close_past_days(now=datetime(2026, 3, 2, 0, 5))
+test("猶予時間内の日は締めない", closed == [])
+closed = cost_logger.close_past_days(now=datetime(2026, 3, 2, 12, 0))
+test("終わった日だけ締める", closed == ["2026-03-01"], f"{closed}")
+summary = json.loads(cost_logger.summary_path("2026-03-01").read_text(encoding="utf-8"))
+test("sidecar に usage_type 別の合計", summary["by_type"]["post_read"]["units"] == 100 and summary["events"] == 2)
+test("sidecar に endpoint 別の合計", summary["by_endpoint"]["GET /2/users/me"]["cost"] == 0.01)
+test("締めた日は再度締めない", cost_logger.close_past_days(now=datetime(2026, 3, 3, 12, 0)) == ["2026-03-02"])
+
+write_day("2026-03-02", [("post_read", "GET /2/tweets", 7)])
+sidecar = cost_logger.summary_path("2026-03-02")
+st = sidecar.stat()
+os.utime(sidecar, ns=(st.st_atime_ns, st.st_mtime_ns - 10**9))
+test("締めた後に届いた分があれば締め直す",
+     cost_logger.close_past_days(now=datetime(2026, 3, 3, 12, 0)) == ["2026-03-02"]
+     and cost_logger.load_day_summary("2026-03-02")["events"] == 2)
+
+lock_fd = os.open(cost_logger.partition_dir(), os.O_RDONLY)
+fcntl.flock(lock_fd, fcntl.LOCK_SH)
+finisher = threading.Thread(target=cost_logger.finalize_day, args=("2026-03-02",))
+finisher.start()
+finisher.join(0.3)
+test("追記中（共有ロック）は締めを待つ", finisher.is_alive())
+os.close(lock_fd)
+finisher.join(5)
+test("追記が終われば締める", not finisher.is_alive())
+
+cost_logger.partition_path("2026-03-01").write_text("", encoding="utf-8")
+test("締めた日は sidecar だけを読む", cost_logger.load_day_summary("2026-03-01")["events"] == 2)
+test("締めていない日はパーティションから集計", cost_logger.load_day_summary("2026-03-04")["events"] == 0)
+
+write_day("2026-03-05", [("post_read", "GET /2/tweets", 10)])
+cost_logger.finalize_day("2026-03-05", compress=True)
+gz_path = cost_logger.partition_dir() / "2026-03-05.jsonl.gz"
+test("gzip 圧縮して元ファイルを消す", gz_path.exists() and not cost_logger.partition_path("2026-03-05").exists())
+test("圧縮後も読める", len(list(cost_logger.iter_records("2026-03-05"))) == 1)
+write_day("2026-03-05", [("post_read", "GET /2/tweets", 5)])
+cost_logger.finalize_day("2026-03-05", compress=True)
+with gzip.open(gz_path, "rt", encoding="utf-8") as f:
+    test("遅れて届いた分も同じ gz に追加", len(f.read().splitlines()) == 2)
+
+legacy = [{"date": "2026-02-27", "usage_type": "post_read", "units": 3, "estimated_cost_usd": 0.015},
+          {"date": "2026-02-28", "usage_type": "post_read", "units": 4, "estimated_cost_usd": 0.02}]
+cost_logger.LOG_FILE.write_text("\n".join(json.dumps(r) for r in legacy) + "\n", encoding="utf-8")
+test("未分割の日は旧ファイルから読む", len(list(cost_logger.iter_records("2026-02-28"))) == 1)
+index = cost_logger._legacy_index
+test("旧ファイルは1回の読み込みで日別に索引する",
+     len(list(cost_logger.iter_records("2026-02-27"))) == 1 and cost_logger._legacy_index is index)
+moved = cost_logger.split_legacy_log()
+test("旧ファイルを日別に分割", moved == {"2026-02-27": 1, "2026-02-28": 1}, f"{moved}")
+test("旧ファイルは退避", not cost_logger.LOG_FILE.exists())
+test("分割後は sidecar で読める", cost_logger.load_day_summary("2026-02-28")["by_type"]["post_read"]["units"] == 4)
+
+# -------------------------------------------------------
+# サマリー
+# -------------------------------------------------------
+print(f"\n{'='*50}")
+print(f"結果: {PASSED} PASSED / {FAILED} FAILED / {PASSED + FAILED} TOTAL")
+if FAILED > 0:
+    print("FAILED テストがあります。確認してください。")
+    sys.exit(1)
+else:
+    print("全テスト PASSED")
+    sys.exit(0)
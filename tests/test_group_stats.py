@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+group_stats（カテゴリ別集計エンジン）の動作テスト
+実行: python3 tests/test_group_stats.py
+"""
+
+import sys
+from pathlib import Path
+
+PROJECT_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_DIR / "post_scheduler"))
+
+from group_stats import by_avg_imp, group_posts
+
+PASSED = 0
+FAILED = 0
+
+
+def test(name: str, condition: bool, detail: str = ""):
+    global PASSED, FAILED
+    if condition:
+        PASSED += 1
+        print(f"  PASS: {name}")
+    else:
+        FAILED += 1
+        msg = f"  FAIL: {name}"
+        if detail:
+            msg += f" — {detail}"
+        print(msg)
+
+
+def section(title: str):
+    print(f"\n=== {title} ===")
+
+
+posts = [
+    {"tweet_id": "1", "hookCategory": "脱力系", "postedAt": "2026-02-01T08:00:00", "impressions": 10, "likes": 1, "diagnosis": "DROP"},
+    {"tweet_id": "2", "hookCategory": "脱力系", "postedAt": "2026-02-03T08:00:00", "impressions": 30, "likes": None, "diagnosis": "GOOD"},
+    {"tweet_id": "3", "hookCategory": "脱力系", "postedAt": "2026-02-02T08:00:00", "impressions": 20, "likes": 3},
+    {"tweet_id": "4", "hookCategory": "脱力系", "postedAt": "2026-02-03T08:00:00", "impressions": 0, "likes": 0, "diagnosis": "DROP"},
+    {"tweet_id": "5", "postedAt": "2026-02-04T08:00:00", "impressions": 100, "likes": 2, "diagnosis": "OK"},
+]
+
+# -------------------------------------------------------
+# 1. 1パス集計
+# -------------------------------------------------------
+section("1パス集計")
+
+groups = group_posts(posts)
+g = groups["脱力系"]
+test("件数", g.n == 4)
+test("平均imp", g.avg_imp == 15)
+test("平均いいね（None は 0）", g.avg_likes == 1)
+test("診断分布（欠損は DROP）", g.diagnoses == {"DROP": 3, "GOOD": 1}, f"{dict(g.diagnoses)}")
+test("hookCategory 欠損は 未分類", "未分類" in groups)
+
+# -------------------------------------------------------
+# 2. 直近N件
+# -------------------------------------------------------
+section("直近N件")
+
+test("新しい順で3件、同時刻は先に追加した方が先",
+     [p["tweet_id"] for p in g.recent] == ["2", "4", "3"], f"{[p['tweet_id'] for p in g.recent]}")
+test("recent_n=0 は保持しない", group_posts(posts, recent_n=0)["脱力系"].recent == [])
+test("平均imp降順", [name for name, _ in by_avg_imp(groups)] == ["未分類", "脱力系"])
+
+# -------------------------------------------------------
+# サマリー
+# -------------------------------------------------------
+print(f"\n{'='*50}")
+print(f"結果: {PASSED} PASSED / {FAILED} FAILED / {PASSED + FAILED} TOTAL")
+if FAILED > 0:
+    print("FAILED テストがあります。確認してください。")
+    sys.exit(1)
+else:
+    print("全テスト PASSED")
+    sys.exit(0)
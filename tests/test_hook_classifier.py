@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+hook_classifier（ローカル hookCategory 分類器）の動作テスト
+実行: python3 tests/test_hook_classifier.py
+"""
+
+import random
+import sys
+import tempfile
+from pathlib import Path
+
+PROJECT_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_DIR / "post_scheduler"))
+
+from hook_classifier import LOCAL_SOURCE, N_FEATURES, HookClassifier, featurize, normalize_text
+
+PASSED = 0
+FAILED = 0
+
+
+def test(name: str, condition: bool, detail: str = ""):
+    global PASSED, FAILED
+    if condition:
+        PASSED += 1
+        print(f"  PASS: {name}")
+    else:
+        FAILED += 1
+        msg = f"  FAIL: {name}"
+        if detail:
+            msg += f" — {detail}"
+        print(msg)
+
+
+def section(title: str):
+    print(f"\n=== {title} ===")
+
+
+PHRASES = {
+    "猫写真": ["窓辺で日向ぼっこ", "寝顔を見て", "毛づくろい中", "箱に入ってる"],
+    "脱力系": ["眠い", "だるい", "何もしたくない", "ずっと寝てたい"],
+    "時事ネタ": ["ニュースで見た", "選挙の日", "株価が下がった", "新しいスマホ発表"],
+}
+rng = random.Random(0)
+
+
+def sample(category: str) -> str:
+    words = PHRASES[category]
+    return f"今日は{rng.choice(words)}。{rng.choice(words)}"
+
+
+def posts(n: int, start: int = 0) -> list[dict]:
+    cats = list(PHRASES)
+    return [
+        {"tweet_id": str(start + i), "text": sample(cats[i % 3]), "hookCategory": cats[i % 3]}
+        for i in range(n)
+    ]
+
+
+# -------------------------------------------------------
+# 1. 特徴量
+# -------------------------------------------------------
+section("特徴量")
+
+test("URL・メンションを除いて NFKC 正規化", normalize_text("@hokke ＡＢＣ https://t.co/x  ねこ") == "abc ねこ")
+idx, tf = featurize("ねこねこ")
+test("インデックスは重複なし・範囲内", len(set(idx.tolist())) == len(idx) and int(idx.max()) < N_FEATURES)
+test("繰り返しはサブリニア TF", float(tf.max()) > 1.0)
+test("空文字は特徴なし", len(featurize("")[0]) == 0)
+
+# -------------------------------------------------------
+# 2. 学習・分類
+# -------------------------------------------------------
+section("学習・分類")
+
+model = HookClassifier(list(PHRASES))
+test("学習不足の間は分類しない", model.predict(sample("脱力系"))[0] is None)
+
+train = posts(60)
+test("ラベル付き投稿を学習", model.update(train) == 60 and model.n_docs == 60)
+test("学習済みは二重に学習しない", model.update(train) == 0)
+
+correct = sum(model.predict(sample(c), 0.0)[0] == c for c in PHRASES for _ in range(20))
+test("見たことのある言い回しは分類できる", correct == 60, f"correct={correct}/60")
+label, confidence = model.predict(sample("時事ネタ"))
+test("確信度が高ければラベルを返す", label == "時事ネタ" and confidence >= 0.8, f"{label} {confidence:.3f}")
+label, confidence = model.predict("今日はいい天気")
+test("知らない文は確信度が低い（LLM に回す）", label is None, f"{confidence:.3f}")
+
+test("固定ラベル以外は学習しない", not model.learn("x1", "テスト", "リプライ"))
+skipped = model.update([{"tweet_id": "x2", "text": "眠い", "hookCategory": "脱力系", "categorySource": LOCAL_SOURCE}])
+test("自分で付けたラベルは学習しない", skipped == 0)
+
+before = model.class_docs.copy()
+relabeled = dict(train[0], hookCategory="時事ネタ")
+model.update([relabeled])
+moved = model.class_docs - before
+test("ラベルが変わったら付け替える", moved.sum() == 0 and moved[model.labels.index("時事ネタ")] == 1)
+test("件数は変わらない", model.n_docs == 60)
+
+# -------------------------------------------------------
+# 3. 保存・ラベル可変
+# -------------------------------------------------------
+section("保存・ラベル可変")
+
+path = Path(tempfile.mkdtemp()) / "post.npz"
+model.save(path)
+loaded = HookClassifier.load(path, list(PHRASES))
+test("保存して読み戻せる", loaded.n_docs == 60 and loaded.learned == model.learned)
+text = sample("猫写真")
+test("読み戻しても同じ確率", abs(loaded.predict_proba(text)["猫写真"] - model.predict_proba(text)["猫写真"]) < 1e-9)
+test("読み戻した後も差分学習", loaded.update(posts(3, start=100)) == 3 and loaded.n_docs == 63)
+test("無いファイルは空のモデル", HookClassifier.load(path.with_name("none.npz")).n_docs == 0)
+
+replies = HookClassifier()
+replies.update(
+    [{"tweet_id": str(i), "text": t, "hookCategory": c}
+     for i, (t, c) in enumerate([("AIの話", "テック系"), ("ごはんまだ", "ごはん系"), ("リプ", "リプライ")] * 10)],
+    exclude=("リプライ",),
+)
+test("ラベル未指定なら出てきたラベルを学習", replies.labels == ["テック系", "ごはん系"] and replies.ready)
+
+# -------------------------------------------------------
+# サマリー
+# -------------------------------------------------------
+print(f"\n{'='*50}")
+print(f"結果: {PASSED} PASSED / {FAILED} FAILED / {PASSED + FAILED} TOTAL")
+if FAILED > 0:
+    print("FAILED テストがあります。確認してください。")
+    sys.exit(1)
+else:
+    print("全テスト PASSED")
+    sys.exit(0)
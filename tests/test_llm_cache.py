@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+llm_cache（LLM 結果キャッシュ）の動作テスト
+実行: python3 tests/test_llm_cache.py
+"""
+
+import sqlite3
+import sys
+import tempfile
+import threading
+from pathlib import Path
+
+PROJECT_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_DIR))
+
+from llm.llm_cache import LLMCache, cache_key, normalize_input, template_id
+
+PASSED = 0
+FAILED = 0
+
+
+def test(name: str, condition: bool, detail: str = ""):
+    global PASSED, FAILED
+    if condition:
+        PASSED += 1
+        print(f"  PASS: {name}")
+    else:
+        FAILED += 1
+        msg = f"  FAIL: {name}"
+        if detail:
+            msg += f" — {detail}"
+        print(msg)
+
+
+def section(title: str):
+    print(f"\n=== {title} ===")
+
+
+TMP = Path(tempfile.mkdtemp())
+T0 = 1_800_000_000.0
+
+# -------------------------------------------------------
+# 1. キー
+# -------------------------------------------------------
+section("キー")
+
+test("全角/半角・空白の揺れを吸収", normalize_input("ＡＢＣ  ねこ\n") == "ABC ねこ")
+test("大文字小文字は区別", normalize_input("Cat") != normalize_input("cat"))
+judge = template_id("reply.judge", "プロンプトv1")
+test("テンプレート名にプロンプトのハッシュが付く", judge.startswith("reply.judge@") and judge != template_id("reply.judge", "プロンプトv2"))
+test("同じ入力は同じキー", cache_key(judge, "claude", "ねこ  かわいい") == cache_key(judge, "claude", "ねこ かわいい"))
+test("モデルが違えば別のキー", cache_key(judge, "claude", "x") != cache_key(judge, "codex", "x"))
+
+# -------------------------------------------------------
+# 2. 読み書き・TTL
+# -------------------------------------------------------
+section("読み書き・TTL")
+
+cache = LLMCache(TMP / "cache.db", ttl_seconds=3600)
+test("無ければ None", cache.get(judge, "claude", "ねこ", now=T0) is None)
+cache.put(judge, "claude", "ねこ", {"reason": None}, now=T0)
+test("保存した値を返す", cache.get(judge, "claude", "ねこ", now=T0 + 10) == {"reason": None})
+test("正規化後が同じ入力もヒット", cache.get(judge, "claude", "ねこ ", now=T0 + 10) == {"reason": None})
+test("他のモデルはミス", cache.get(judge, "codex", "ねこ", now=T0 + 10) is None)
+test("TTL を過ぎたらミス", cache.get(judge, "claude", "ねこ", now=T0 + 3601) is None)
+
+cache.put(judge, "claude", "長期", "猫写真", ttl=86400, now=T0)
+test("呼び出しごとの TTL", cache.get(judge, "claude", "長期", now=T0 + 7200) == "猫写真")
+cache.put(judge, "claude", "none", None, now=T0)
+test("None は保存しない", cache.get(judge, "claude", "none", now=T0) is None)
+
+reopened = LLMCache(TMP / "cache.db")
+test("開き直しても残る（cron をまたぐ）", reopened.get(judge, "claude", "長期", now=T0 + 7200) == "猫写真")
+reopened.close()
+
+# -------------------------------------------------------
+# 3. LRU・期限切れの削除
+# -------------------------------------------------------
+section("LRU・期限切れの削除")
+
+lru = LLMCache(TMP / "lru.db", max_entries=3, ttl_seconds=3600)
+for i, text in enumerate(["a", "b", "c"]):
+    lru.put("t", "m", text, i, now=T0 + i)
+lru.get("t", "m", "a", now=T0 + 10)
+lru.put("t", "m", "d", 3, now=T0 + 11)
+test("上限を超えたら最後に使われたのが古いものから消す", lru.get("t", "m", "b", now=T0 + 12) is None and len(lru) == 3)
+test("使ったものは残る", lru.get("t", "m", "a", now=T0 + 12) == 0)
+lru.put("t", "m", "e", 4, now=T0 + 3605)
+test("期限切れは保存時に消す", len(lru) == 2, f"len={len(lru)}")
+test("追い出し件数を数える", lru.stats()["evictions"] == 3, f"{lru.stats()}")
+
+# -------------------------------------------------------
+# 4. カウンター・スレッド
+# -------------------------------------------------------
+section("カウンター・スレッド")
+
+s = cache.stats()
+test("ヒット・ミス件数", s["hits"] == 3 and s["misses"] == 4, f"{s}")
+test("ヒット率", s["hit_rate"] == round(3 / 7, 4))
+changes = cache._conn.total_changes
+cache.get(judge, "claude", "長期", now=T0 + 7200)
+cache.get(judge, "claude", "無い", now=T0 + 7200)
+test("get は DB に書かない", cache._conn.total_changes == changes)
+cache.flush()
+totals = LLMCache(TMP / "cache.db").totals()
+test("テンプレートごとの累計を flush でまとめて保存", totals[judge]["hits"] == 5 and totals[judge]["misses"] == 5
+     and totals[judge]["stores"] == 2, f"{totals}")
+
+shared = LLMCache(TMP / "threads.db")
+
+
+def worker(n: int):
+    for i in range(50):
+        shared.put("t", "m", f"{n}-{i}", i)
+        shared.get("t", "m", f"{n}-{i}")
+
+
+threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+for t in threads:
+    t.start()
+for t in threads:
+    t.join()
+test("スレッドから共有できる", len(shared) == 200 and shared.stats()["hits"] == 200, f"{shared.stats()}")
+
+# -------------------------------------------------------
+# 5. SQLite のエラー
+# -------------------------------------------------------
+section("SQLite のエラー")
+
+broken_path = TMP / "broken.db"
+broken_path.write_bytes(b"not a sqlite database" * 100)
+broken = LLMCache(broken_path)
+test("開けない DB はキャッシュなしで続行", broken.get("t", "m", "x") is None and len(broken) == 0)
+broken.put("t", "m", "x", 1)
+test("開けない DB への put は何もしない", broken.stats()["stores"] == 0 and broken.totals() == {})
+broken.close()
+
+faulty = LLMCache(TMP / "faulty.db")
+faulty.put("t", "m", "x", 1)
+sqlite3.connect(str(TMP / "faulty.db")).execute("DROP TABLE entries")
+test("読み込みエラーはミス扱い", faulty.get("t", "m", "x") is None and faulty.stats()["misses"] == 1)
+faulty.put("t", "m", "y", 2)
+test("書き込みエラーは保存せず続行", faulty.stats()["stores"] == 1, f"{faulty.stats()}")
+faulty.close()
+
+# -------------------------------------------------------
+# サマリー
+# -------------------------------------------------------
+print(f"\n{'='*50}")
+print(f"結果: {PASSED} PASSED / {FAILED} FAILED / {PASSED + FAILED} TOTAL")
+if FAILED > 0:
+    print("FAILED テストがあります。確認してください。")
+    sys.exit(1)
+else:
+    print("全テスト PASSED")
+    sys.exit(0)
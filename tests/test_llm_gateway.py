@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+llm_gateway（待機プロセス付き LLM 呼び出し）の動作テスト
+CLI の代わりに stdin を読む python プロセスを使う。
+実行: python3 tests/test_llm_gateway.py
+"""
+
+import sys
+import threading
+import time
+from pathlib import Path
+
+PROJECT_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_DIR))
+
+from llm import llm_gateway
+from llm.llm_gateway import CLIBackend, CodexBackend, LLMGateway, StubBackend, get_gateway, register_backend
+
+PASSED = 0
+FAILED = 0
+
+
+def test(name: str, condition: bool, detail: str = ""):
+    global PASSED, FAILED
+    if condition:
+        PASSED += 1
+        print(f"  PASS: {name}")
+    else:
+        FAILED += 1
+        msg = f"  FAIL: {name}"
+        if detail:
+            msg += f" — {detail}"
+        print(msg)
+
+
+def section(title: str):
+    print(f"\n=== {title} ===")
+
+
+def fake_cli(body: str) -> list[str]:
+    """起動に 0.3 秒かかり、stdin のプロンプトを処理する擬似 CLI"""
+    return [sys.executable, "-c", f"import sys, time\ntime.sleep(0.3)\nprompt = sys.stdin.read()\n{body}"]
+
+
+def wait_idle(backend: CLIBackend, n: int, limit: float = 5.0) -> bool:
+    deadline = time.monotonic() + limit
+    while time.monotonic() < deadline:
+        if len(backend._idle) >= n and all(w.proc.poll() is None for w in backend._idle):
+            return True
+        time.sleep(0.05)
+    return False
+
+
+# -------------------------------------------------------
+# 1. 待機プロセス
+# -------------------------------------------------------
+section("待機プロセス")
+
+backend = CLIBackend(fake_cli("print(prompt.upper())"), warm=1)
+gateway = LLMGateway(backend, max_concurrency=2)
+test("起動時に待機プロセスを用意", wait_idle(backend, 1))
+time.sleep(0.4)
+
+r = gateway.complete("hello")
+test("stdin でプロンプトを渡す", r.ok and r.text == "HELLO", f"{r}")
+test("待機プロセスを使う", r.warm)
+test("起動時間を払わない", r.latency < 0.25, f"latency={r.latency:.3f}")
+time.sleep(0.5)
+test("1回目の呼び出しの後は補充しない（単発実行で余分に起動しない）", not backend._idle and not backend._spawning)
+
+r = gateway.complete("again")
+test("2回目は待機プロセスが無ければその場で起動", r.ok and not r.warm, f"{r}")
+test("2回目の呼び出しから補充する", wait_idle(backend, 1))
+
+first = backend._idle[0].proc.pid
+r = gateway.complete("third")
+test("補充した待機プロセスを使う", r.ok and r.warm, f"{r}")
+test("1プロセス1プロンプト（使い回さない）", wait_idle(backend, 1) and backend._idle[0].proc.pid != first)
+
+class SlowSpawn(CLIBackend):
+    """プロセスの起動自体に時間がかかる（起動回数を数える）"""
+
+    spawned = 0
+
+    def _spawn(self):
+        SlowSpawn.spawned += 1
+        time.sleep(0.3)
+        return super()._spawn()
+
+
+eager = SlowSpawn(fake_cli("print(prompt)"), warm=1)
+r = eager.complete("early", 5.0)
+test("起動中の待機プロセスを待って使う（2つ目を起動しない）", r.ok and r.warm and SlowSpawn.spawned == 1,
+     f"{r} spawned={SlowSpawn.spawned}")
+eager.close()
+
+cold = LLMGateway(CLIBackend(fake_cli("print(prompt)"), warm=0))
+r = cold.complete("x")
+test("warm=0 なら毎回起動", r.ok and not r.warm and r.latency >= 0.3, f"{r}")
+backend.close()
+test("close で待機プロセスを止める", not backend._idle)
+
+# -------------------------------------------------------
+# 2. タイムアウト・エラー
+# -------------------------------------------------------
+section("タイムアウト・エラー")
+
+slow = LLMGateway(CLIBackend(fake_cli("time.sleep(5)"), warm=0))
+r = slow.complete("x", timeout=1)
+test("タイムアウトで打ち切る", not r.ok and r.timed_out and r.latency < 3, f"{r}")
+
+failing = LLMGateway(CLIBackend(fake_cli("sys.stderr.write('boom'); sys.exit(2)"), warm=0))
+r = failing.complete("x")
+test("終了コード≠0 はエラー", not r.ok and "exit=2" in r.error and "boom" in r.error, f"{r}")
+
+missing = LLMGateway(CLIBackend(["/nonexistent/llm-cli"], warm=0))
+r = missing.complete("x")
+test("起動できない CLI はエラー", not r.ok and "起動できない" in r.error, f"{r}")
+
+# -------------------------------------------------------
+# 3. 同時実行数
+# -------------------------------------------------------
+section("同時実行数")
+
+running = 0
+peak = 0
+lock = threading.Lock()
+
+
+def responder(prompt: str) -> str:
+    global running, peak
+    with lock:
+        running += 1
+        peak = max(peak, running)
+    time.sleep(0.1)
+    with lock:
+        running -= 1
+    return prompt
+
+
+limited = LLMGateway(StubBackend(responder), max_concurrency=2)
+threads = [threading.Thread(target=limited.complete, args=(str(i),)) for i in range(6)]
+for t in threads:
+    t.start()
+for t in threads:
+    t.join()
+test("上限を超えて同時に走らない", peak == 2, f"peak={peak}")
+
+blocked = LLMGateway(StubBackend(lambda p: time.sleep(1.5) or p), max_concurrency=1)
+t = threading.Thread(target=blocked.complete, args=("a",))
+t.start()
+time.sleep(0.1)
+r = blocked.complete("b", timeout=0.3)
+test("空き待ちも timeout に含める", not r.ok and r.timed_out, f"{r}")
+t.join()
+
+# -------------------------------------------------------
+# 4. メトリクス・バックエンド
+# -------------------------------------------------------
+section("メトリクス・バックエンド")
+
+m = limited.metrics()
+test("呼び出し回数", m["calls"] == 6 and m["ok"] == 6 and m["errors"] == 0, f"{m}")
+test("レイテンシ分位", 0.09 <= m["latency_p50"] <= m["latency_p95"] <= m["latency_max"], f"{m}")
+m = slow.metrics()
+test("タイムアウトを数える", m["timeouts"] == 1 and m["errors"] == 1)
+
+register_backend("echo", lambda: StubBackend(lambda p: f"echo:{p}"))
+test("登録したバックエンドを使う", get_gateway("echo").complete("x").text == "echo:x")
+test("同じ名前は同じゲートウェイ", get_gateway("echo") is get_gateway("echo"))
+
+raw = "header\ncodex\n本文1\n本文2\ntokens used: 10\n"
+test("codex の出力から本文だけ取り出す", CodexBackend.parse_output(None, raw) == "本文1\n本文2")
+
+llm_gateway.os.environ.update({"CLAUDECODE": "1", "CLAUDE_CODE_ENTRYPOINT": "cli", "CLAUDE_CONFIG_DIR": "/x", "KEEP": "1"})
+cleaned = llm_gateway.clean_env()
+test("ネスト起動の目印だけ外す", "CLAUDECODE" not in cleaned and "CLAUDE_CODE_ENTRYPOINT" not in cleaned)
+test("それ以外の CLAUDE* は残す", cleaned.get("CLAUDE_CONFIG_DIR") == "/x" and cleaned.get("KEEP") == "1")
+
+# -------------------------------------------------------
+# サマリー
+# -------------------------------------------------------
+print(f"\n{'='*50}")
+print(f"結果: {PASSED} PASSED / {FAILED} FAILED / {PASSED + FAILED} TOTAL")
+if FAILED > 0:
+    print("FAILED テストがあります。確認してください。")
+    sys.exit(1)
+else:
+    print("全テスト PASSED")
+    sys.exit(0)
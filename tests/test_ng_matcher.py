@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+ng_matcher（NGキーワード照合）の動作テスト
+実行: python3 tests/test_ng_matcher.py
+"""
+
+import json
+import os
+import random
+import sys
+import tempfile
+from pathlib import Path
+
+PROJECT_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_DIR / "reply_system"))
+
+from ng_matcher import AhoCorasick, NGMatcher, normalize
+
+PASSED = 0
+FAILED = 0
+
+
+def test(name: str, condition: bool, detail: str = ""):
+    global PASSED, FAILED
+    if condition:
+        PASSED += 1
+        print(f"  PASS: {name}")
+    else:
+        FAILED += 1
+        msg = f"  FAIL: {name}"
+        if detail:
+            msg += f" — {detail}"
+        print(msg)
+
+
+def section(title: str):
+    print(f"\n=== {title} ===")
+
+
+# -------------------------------------------------------
+# 1. オートマトン
+# -------------------------------------------------------
+section("オートマトン")
+
+ac = AhoCorasick(["he", "she", "his", "hers", "選挙", "PR", "ＰＲ", ""])
+test("正規化後に同じキーワードと空文字は1つにまとめる", ac.patterns == ["he", "she", "his", "hers", "選挙", "PR"])
+test("終わる位置が一番前のキーワードを返す", ac.find("ushers") == "she")
+test("同じ位置に終わる短いキーワードも拾う", ac.find_all("ushers") == ["she", "he", "hers"])
+test("当たらなければ None", ac.find("猫かわいい") is None and ac.find("") is None)
+test("全角/半角を吸収", ac.find("ｐｒ案件です") == "PR" and normalize("ＰＲ") == "pr")
+test("大文字小文字を吸収", ac.find("Hi, SHE said") == "she")
+test("日本語", ac.find("明日は選挙に行く") == "選挙")
+
+patterns = ["ab", "bab", "a", "bca", "c", "ＡＢＣ"]
+brute = AhoCorasick(patterns)
+rng = random.Random(0)
+mismatch = []
+for _ in range(2000):
+    text = "".join(rng.choice("abcABｂ") for _ in range(rng.randint(0, 15)))
+    expected = {p for p in brute.patterns if normalize(p) in normalize(text)}
+    if set(brute.find_all(text)) != expected or (brute.find(text) is None) != (not expected):
+        mismatch.append(text)
+test("素朴な部分文字列検索と同じ結果", not mismatch, f"{mismatch[:3]}")
+
+# -------------------------------------------------------
+# 2. ファイル・再構築・件数
+# -------------------------------------------------------
+section("ファイル・再構築・件数")
+
+path = Path(tempfile.mkdtemp()) / "ng_keywords.json"
+path.write_text(json.dumps({"skip_keywords": ["選挙", "炎上"], "reply_ng_phrases": ["！！"]}), encoding="utf-8")
+matcher = NGMatcher(path, "skip_keywords")
+replies = NGMatcher(path, "reply_ng_phrases")
+test("key のキーワードだけ読む", matcher.patterns == ["選挙", "炎上"] and replies.patterns == ["！！"])
+test("当たったキーワードを返す", matcher.match("また炎上してる") == "炎上")
+test("半角の !! も全角の ！！ に当たる", replies.match("すごい!!") == "！！")
+matcher.match("選挙速報")
+matcher.match("選挙の日")
+matcher.match("猫")
+test("キーワードごとに件数を数える", matcher.hits == {"選挙": 2, "炎上": 1}, f"{dict(matcher.hits)}")
+
+path.write_text(json.dumps({"skip_keywords": ["猫"]}), encoding="utf-8")
+stat = path.stat()
+os.utime(path, (stat.st_atime, stat.st_mtime + 10))
+test("ファイルが更新されたら作り直す", matcher.match("猫") == "猫" and matcher.match("選挙") is None)
+test("作り直しても件数は残る", matcher.hits["選挙"] == 2 and matcher.hits["猫"] == 1)
+
+path.write_text("{ broken", encoding="utf-8")
+os.utime(path, (stat.st_atime, stat.st_mtime + 20))
+test("壊れた JSON なら前のキーワードのまま", matcher.match("猫") == "猫")
+test("ファイルが無ければ何にも当たらない", NGMatcher(path.with_name("none.json"), "skip_keywords").match("選挙") is None)
+
+try:
+    NGMatcher(path, "skip_keywords")
+    raised = False
+except ValueError:
+    raised = True
+test("起動時に壊れた JSON ならエラー（黙って素通しにしない）", raised)
+fallback = NGMatcher(path, "reply_ng_phrases", default=["ありがとう"])
+test("default があれば起動時の壊れた JSON でも default を使う", fallback.match("ありがとう") == "ありがとう")
+path.write_text(json.dumps({"skip_keywords": ["猫"]}), encoding="utf-8")
+test("key が無ければ default を使う", NGMatcher(path, "reply_ng_phrases", default=["素敵"]).patterns == ["素敵"])
+test("key があればファイルを優先", NGMatcher(path, "skip_keywords", default=["素敵"]).patterns == ["猫"])
+
+# -------------------------------------------------------
+# サマリー
+# -------------------------------------------------------
+print(f"\n{'='*50}")
+print(f"結果: {PASSED} PASSED / {FAILED} FAILED / {PASSED + FAILED} TOTAL")
+if FAILED > 0:
+    print("FAILED テストがあります。確認してください。")
+    sys.exit(1)
+else:
+    print("全テスト PASSED")
+    sys.exit(0)
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+PerfStore (hook_performance の SQLite バックエンド) の動作テスト
+
+一時ディレクトリ上で JSON 取り込み・差分保存・書き出しを検証する。
+実行: python3 tests/test_perf_store.py
+"""
+
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+PROJECT_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_DIR / "post_scheduler"))
+
+from perf_store import PerfStore, PostIndex
+
+PASSED = 0
+FAILED = 0
+
+
+def test(name: str, condition: bool, detail: str = ""):
+    global PASSED, FAILED
+    if condition:
+        PASSED += 1
+        print(f"  PASS: {name}")
+    else:
+        FAILED += 1
+        msg = f"  FAIL: {name}"
+        if detail:
+            msg += f" — {detail}"
+        print(msg)
+
+
+def section(title: str):
+    print(f"\n=== {title} ===")
+
+
+def make_post(tid: str, **kw) -> dict:
+    post = {
+        "tweet_id": tid,
+        "text": f"post {tid}",
+        "hookCategory": "脱力系",
+        "tweet_type": "post",
+        "postedAt": "2026-02-18T08:38:00",
+        "engagementFetchedAt": None,
+        "likes": None, "retweets": None, "impressions": None,
+        "diagnosis": None,
+    }
+    post.update(kw)
+    return post
+
+
+def _raises(fn) -> bool:
+    try:
+        fn()
+    except ValueError:
+        return True
+    return False
+
+
+tmp = Path(tempfile.mkdtemp())
+json_path = tmp / "hook_performance.json"
+db_path = tmp / "hook_performance.db"
+json_path.write_text(json.dumps({
+    "version": "1.0",
+    "my_user_id": "42",
+    "posts": [make_post("1"), make_post("2", tweet_type="reply", hookCategory="リプライ")],
+}, ensure_ascii=False), encoding="utf-8")
+
+# -------------------------------------------------------
+# 1. JSON の自動取り込み
+# -------------------------------------------------------
+section("JSON の自動取り込み")
+
+store = PerfStore(db_path, json_path)
+data = store.load()
+test("投稿数が一致", len(data["posts"]) == 2, f"count={len(data['posts'])}")
+test("メタ情報 my_user_id", data.get("my_user_id") == "42")
+test("記録順を維持", [p["tweet_id"] for p in data["posts"]] == ["1", "2"])
+
+# -------------------------------------------------------
+# 2. 差分保存
+# -------------------------------------------------------
+section("差分保存")
+
+data["posts"][0]["likes"] = 5
+data["posts"].append(make_post("3"))
+data["last_since_id"] = "3"
+written = store.save(data)
+test("変更+追加の2件だけ書き込む", written == 2, f"written={written}")
+test("変更なしの再保存は0件", store.save(data) == 0)
+
+data["sync_checkpoint"] = {"pagination_token": "t1"}
+store.save(data)
+test("メタ情報を保存", store.get_meta("sync_checkpoint") == {"pagination_token": "t1"})
+del data["sync_checkpoint"]
+store.save(data)
+test("data から消したメタ情報は DB からも消す", store.get_meta("sync_checkpoint", "gone") == "gone")
+test("他のメタ情報は残す", store.get_meta("last_since_id") == "3")
+
+store.add_post(make_post("4"))
+test("add_post で追加", store.get("4") is not None)
+test("recent_posts は古い順で末尾n件",
+     [p["tweet_id"] for p in store.recent_posts(2)] == ["3", "4"])
+store.close()
+
+reopened = PerfStore(db_path, json_path)
+data = reopened.load()
+test("再オープン後も更新が残る", data["posts"][0]["likes"] == 5)
+test("last_since_id が残る", data.get("last_since_id") == "3")
+test("JSON を再取り込みしない", reopened.count() == 4, f"count={reopened.count()}")
+
+# -------------------------------------------------------
+# 3. JSON 書き出し
+# -------------------------------------------------------
+section("JSON 書き出し")
+
+out = tmp / "export.json"
+n = reopened.export_json(out)
+exported = json.loads(out.read_text(encoding="utf-8"))
+test("書き出し件数", n == 4)
+test("従来形式 (posts キー)", isinstance(exported.get("posts"), list))
+test("メタ情報も書き出す", exported.get("my_user_id") == "42")
+reopened.close()
+
+# -------------------------------------------------------
+# 4. PostIndex の一括 upsert
+# -------------------------------------------------------
+section("PostIndex の一括 upsert")
+
+data = {"posts": [make_post("1"), make_post("2")]}
+index = PostIndex(data)
+added, updated = index.upsert_many([
+    {"tweet_id": "2", "likes": 7},
+    make_post("9", text="new"),
+])
+test("追加1件 / 更新1件", (added, updated) == (1, 1), f"got={(added, updated)}")
+test("更新は data['posts'] の同一オブジェクトに反映", data["posts"][1]["likes"] == 7)
+test("新規は data['posts'] 末尾に追加", data["posts"][-1]["tweet_id"] == "9")
+test("索引と data['posts'] が一致", len(index) == len(data["posts"]) == 3)
+test("int の tweet_id でも引ける", 9 in index)
+
+# -------------------------------------------------------
+# 5. engagement_rollup の差分集計
+# -------------------------------------------------------
+section("engagement_rollup の差分集計")
+
+store = PerfStore(tmp / "rollup.db", tmp / "missing.json")
+store.upsert_posts([
+    make_post("r1", engagementFetchedAt="x", impressions=100, likes=2, retweets=0),
+    make_post("r2", engagementFetchedAt="x", impressions=300, likes=4, retweets=1,
+              postedAt="2026-02-18T21:00:00"),
+    make_post("r3", hookCategory="自虐", postedAt="2026-02-10T08:00:00"),
+    make_post("r4", tweet_type="reply", hookCategory="リプライ",
+              engagementFetchedAt="x", impressions=50, likes=1, retweets=0),
+])
+
+rows = {r["hookCategory"]: r for r in store.rollup()}
+test("取得済みのみで平均", rows["脱力系"]["avg_imp"] == 200 and rows["脱力系"]["n"] == 2)
+test("未取得カテゴリは fetched_only で除外", "自虐" not in rows)
+all_rows = {r["hookCategory"]: r for r in store.rollup(fetched_only=False)}
+test("fetched_only=False は未取得も件数に含む", all_rows["自虐"]["n"] == 1)
+
+hours = {r["hour"]: r for r in store.rollup(group_by=("hour",), exclude_tweet_types=("reply",))}
+test("時間帯別 + tweet_type 除外", sorted(hours) == [8, 21] and hours[8]["avg_likes"] == 2)
+
+window = store.rollup(since="2026-02-11", until="2026-02-18", fetched_only=False,
+                      exclude_categories=("リプライ",))
+test("日付ウィンドウ", [r["hookCategory"] for r in window] == ["脱力系"])
+
+data = store.load()
+data["posts"][0]["impressions"] = 500
+data["posts"][2].update(engagementFetchedAt="x", impressions=10, likes=0, retweets=0)
+store.save(data)
+rows = {r["hookCategory"]: r for r in store.rollup()}
+test("更新で旧値を差し引いて再集計", rows["脱力系"]["imp_sum"] == 800, f"imp_sum={rows['脱力系']['imp_sum']}")
+test("未取得→取得済みへの遷移", rows["自虐"]["n"] == 1)
+
+store.conn.execute("DELETE FROM engagement_rollup")
+store.conn.execute("PRAGMA user_version = 0")
+store.conn.commit()
+store.close()
+rebuilt = PerfStore(tmp / "rollup.db", tmp / "missing.json")
+rows = {r["hookCategory"]: r for r in rebuilt.rollup()}
+test("旧スキーマ DB は開いた時に再構築", rows.get("脱力系", {}).get("imp_sum") == 800)
+test("不正な group_by は ValueError", _raises(lambda: rebuilt.rollup(group_by=("text",))))
+rebuilt.close()
+
+# -------------------------------------------------------
+# 6. エンゲージメント時系列
+# -------------------------------------------------------
+section("エンゲージメント時系列")
+
+import metric_series
+
+store = PerfStore(tmp / "series.db", tmp / "missing.json")
+base = make_post("s1", postedAt="2026-02-18T08:00:00")
+for fetched_at, imp, likes in (
+    ("2026-02-18T08:30:00", 10, 1),
+    ("2026-02-18T09:30:00", 30, 3),
+    ("2026-02-18T09:45:00", 30, 3),  # 値が同じ → 観測時刻として記録
+    ("2026-02-18T10:00:00", 30, 3),  # さらに同じ → 終点を進めるだけ
+    ("2026-02-18T20:00:00", 90, 5),
+    ("2026-02-19T10:00:00", 120, 6),
+):
+    store.add_post(dict(base, engagementFetchedAt=fetched_at, impressions=imp, likes=likes, retweets=0))
+
+series = store.series("s1")
+test("同じ値が続く間は始点と終点だけ持つ", len(series) == 5 and series[2] == (2 * 3600, 30, 3, 0),
+     f"samples={series}")
+test("差分から絶対値を復元", series[-1] == (26 * 3600, 120, 6, 0), f"last={series[-1]}")
+at = store.values_at(["s1", "none"], hours=(1, 6, 24, 48))["s1"]
+test("t+1h は前後サンプルで補間", at[1] == {"impressions": 20, "likes": 2, "retweets": 0}, f"{at[1]}")
+test("未観測の t+48h は None", at[48] is None)
+flat = PerfStore(tmp / "flat.db", tmp / "missing.json")
+for fetched_at in ("2026-02-18T09:00:00", "2026-02-19T09:00:00"):
+    flat.add_post(dict(make_post("f1", postedAt="2026-02-18T08:00:00"),
+                       engagementFetchedAt=fetched_at, impressions=40, likes=2, retweets=0))
+flat_at = flat.values_at(["f1"], hours=(6, 24))["f1"]
+test("値が変わらない再取得でも t+6h/24h は観測済み",
+     flat_at[6] == flat_at[24] == {"impressions": 40, "likes": 2, "retweets": 0}, f"{flat_at}")
+flat.close()
+test("時系列のない投稿は全て None", all(v is None for v in store.values_at(["none"])["none"].values()))
+gen = store.values_at(iter(["s1", "none"]))
+test("ジェネレーターを渡しても全件返す", set(gen) == {"s1", "none"} and gen["s1"][1] is not None, f"{list(gen)}")
+
+os.environ["TZ"] = "America/New_York"
+time.tzset()
+test("タイムゾーンなしの日時はホストに依らず JST",
+     metric_series.to_epoch("2026-02-18T09:00:00") == metric_series.to_epoch("2026-02-18T00:00:00+00:00"))
+written = metric_series.parse_jst(metric_series.now_jst_str())
+test("現在時刻も JST で書く", abs((written - datetime.now(timezone.utc)).total_seconds()) < 5, f"{written}")
+del os.environ["TZ"]
+time.tzset()
+
+samples = [(i * 600, i, 0, 0) for i in range(1, 200)]
+thinned = metric_series.downsample(samples)
+test("間引きで件数が減る", len(thinned) <= 7, f"len={len(thinned)}")
+test("間引き後も基準点の値は同じ",
+     all(metric_series.value_at(thinned, a) == metric_series.value_at(samples, a) for a in metric_series.ANCHORS))
+test("基準点の前後だけの時系列は compact_series で変えない", store.compact_series(min_age_hours=0) == 0)
+store.close()
+
+# -------------------------------------------------------
+# サマリー
+# -------------------------------------------------------
+print(f"\n{'='*50}")
+print(f"結果: {PASSED} PASSED / {FAILED} FAILED / {PASSED + FAILED} TOTAL")
+if FAILED > 0:
+    print("FAILED テストがあります。確認してください。")
+    sys.exit(1)
+else:
+    print("全テスト PASSED")
+    sys.exit(0)
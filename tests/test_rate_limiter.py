@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+rate_limiter（X API のエンドポイント別トークンバケット）の動作テスト
+実行: python3 tests/test_rate_limiter.py
+"""
+
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+PROJECT_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_DIR / "post_scheduler"))
+
+import rate_limiter
+from rate_limiter import DEFAULT_BACKOFF_SECONDS, RateLimitExceeded, RateLimiter, TokenBucket, load_state
+
+PASSED = 0
+FAILED = 0
+
+
+def test(name: str, condition: bool, detail: str = ""):
+    global PASSED, FAILED
+    if condition:
+        PASSED += 1
+        print(f"  PASS: {name}")
+    else:
+        FAILED += 1
+        msg = f"  FAIL: {name}"
+        if detail:
+            msg += f" — {detail}"
+        print(msg)
+
+
+def section(title: str):
+    print(f"\n=== {title} ===")
+
+
+def headers(limit: int, remaining: int, reset: float) -> dict:
+    return {"x-rate-limit-limit": str(limit), "x-rate-limit-remaining": str(remaining), "x-rate-limit-reset": str(reset)}
+
+
+# -------------------------------------------------------
+# 1. TokenBucket
+# -------------------------------------------------------
+section("TokenBucket")
+
+now = 1_000_000.0
+bucket = TokenBucket()
+test("未学習なら待たない", bucket.reserve(now) == 0)
+test("ヘッダーなしは学習しない", bucket.update({}, now) is False)
+
+bucket.update(headers(3, 1, now + 100), now)
+test("残り1なら待たない", bucket.reserve(now) == 0)
+wait = bucket.reserve(now + 10)
+test("枠切れなら reset まで待つ", 90 <= wait <= 92, f"wait={wait}")
+test("reset 後は limit まで回復", bucket.reserve(now + 101) == 0 and bucket.remaining == 2)
+
+bucket.update(headers(3, 2, now + 500), now)
+bucket.update(headers(3, 3, now + 500), now)
+test("同じ窓の古い応答で枠を増やさない", bucket.remaining == 2)
+
+bucket = TokenBucket()
+bucket.exhaust({}, now)
+test("reset 不明の 429 は既定秒数待つ",
+     DEFAULT_BACKOFF_SECONDS <= bucket.reserve(now) <= DEFAULT_BACKOFF_SECONDS + 2)
+
+# -------------------------------------------------------
+# 2. RateLimiter
+# -------------------------------------------------------
+section("RateLimiter")
+
+state_file = Path(tempfile.mkdtemp()) / "x_rate_limits.json"
+limiter = RateLimiter(state_file, max_wait_seconds=5)
+limiter.update("GET /2/tweets", headers(300, 299, time.time() + 900))
+limiter.update("GET /2/tweets/search/recent", headers(450, 0, time.time() + 2))
+test("エンドポイントごとに別の枠", limiter.reserve("GET /2/tweets") == 0)
+test("枠が空くまで待ってから通す", 0 < limiter.wait("GET /2/tweets/search/recent") <= 4)
+
+limiter.exhaust("GET /2/users/:id/tweets", headers(900, 0, time.time() + 600))
+try:
+    limiter.reserve("GET /2/users/:id/tweets")
+    raised = False
+except RateLimitExceeded:
+    raised = True
+test("待機上限を超えるなら RateLimitExceeded", raised)
+
+state = load_state(state_file)
+test("ダッシュボード用に状態を保存", state.get("GET /2/tweets", {}).get("limit") == 300, f"{state}")
+test("他のエンドポイントも残る", set(state) == {"GET /2/tweets", "GET /2/tweets/search/recent", "GET /2/users/:id/tweets"})
+
+# -------------------------------------------------------
+# 3. 保存の間引き
+# -------------------------------------------------------
+section("保存の間引き")
+
+state_file = Path(tempfile.mkdtemp()) / "x_rate_limits.json"
+limiter = RateLimiter(state_file)
+reset = time.time() + 900
+limiter.update("GET /2/tweets", headers(300, 299, reset))
+test("新しい窓はすぐ保存", load_state(state_file)["GET /2/tweets"]["remaining"] == 299)
+limiter.update("GET /2/tweets", headers(300, 298, reset))
+limiter.update("GET /2/tweets", headers(300, 297, reset))
+test("同じ窓で残りが減っただけなら保存しない", load_state(state_file)["GET /2/tweets"]["remaining"] == 299)
+limiter.update("GET /2/tweets", headers(300, 0, reset))
+test("枠を使い切ったらすぐ保存", load_state(state_file)["GET /2/tweets"]["remaining"] == 0)
+
+limiter.update("GET /2/users/me", headers(75, 74, reset))
+limiter.update("GET /2/users/me", headers(75, 73, reset))
+limiter._saved_at -= rate_limiter.SAVE_INTERVAL_SECONDS
+limiter.update("GET /2/users/me", headers(75, 72, reset))
+test("間隔を空ければ保存", load_state(state_file)["GET /2/users/me"]["remaining"] == 72)
+limiter.update("GET /2/users/me", headers(75, 71, reset))
+limiter.flush()
+test("flush で間引いた変更を書き出す", load_state(state_file)["GET /2/users/me"]["remaining"] == 71)
+
+# -------------------------------------------------------
+# サマリー
+# -------------------------------------------------------
+print(f"\n{'='*50}")
+print(f"結果: {PASSED} PASSED / {FAILED} FAILED / {PASSED + FAILED} TOTAL")
+if FAILED > 0:
+    print("FAILED テストがあります。確認してください。")
+    sys.exit(1)
+else:
+    print("全テスト PASSED")
+    sys.exit(0)
@@ -113,6 +113,7 @@ try:
     test("is_ng メソッド", hasattr(engine, 'is_ng'))
     test("judge_tweet メソッド", hasattr(engine, 'judge_tweet'))
     test("generate_reply メソッド", hasattr(engine, 'generate_reply'))
+    test("generate_replies メソッド", hasattr(engine, 'generate_replies'))
     test("_call_claude メソッド", hasattr(engine, '_call_claude'))
 
     # 削除されたメソッドが存在しないこと
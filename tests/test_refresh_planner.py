@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+refresh_planner（エンゲージメント再取得プランナー）の動作テスト
+実行: python3 tests/test_refresh_planner.py
+"""
+
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+PROJECT_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_DIR / "post_scheduler"))
+
+from cost_logger import UNIT_PRICES
+from refresh_planner import BATCH_SIZE, plan_refresh, refresh_interval_hours
+
+PASSED = 0
+FAILED = 0
+
+
+def test(name: str, condition: bool, detail: str = ""):
+    global PASSED, FAILED
+    if condition:
+        PASSED += 1
+        print(f"  PASS: {name}")
+    else:
+        FAILED += 1
+        msg = f"  FAIL: {name}"
+        if detail:
+            msg += f" — {detail}"
+        print(msg)
+
+
+def section(title: str):
+    print(f"\n=== {title} ===")
+
+
+JST = timezone(timedelta(hours=9))
+NOW = datetime(2026, 3, 1, 12, 0, tzinfo=JST)
+
+
+def post(tid: str, age_h: float, fetched_h_ago: float | None = None) -> dict:
+    p = {"tweet_id": tid, "postedAt": (NOW - timedelta(hours=age_h)).strftime("%Y-%m-%dT%H:%M:%S")}
+    if fetched_h_ago is not None:
+        p["engagementFetchedAt"] = (NOW - timedelta(hours=fetched_h_ago)).strftime("%Y-%m-%dT%H:%M:%S")
+    return p
+
+
+# -------------------------------------------------------
+# 1. 再取得スケジュール
+# -------------------------------------------------------
+section("再取得スケジュール")
+
+test("若い投稿は短い間隔", refresh_interval_hours(2) == 1.0)
+test("古い投稿ほど間隔が広がる", refresh_interval_hours(24 * 7) > refresh_interval_hours(24))
+
+posts = [
+    post("young_unfetched", 3),
+    post("young_fresh", 3, fetched_h_ago=0.5),
+    post("day_old_stale", 30, fetched_h_ago=10),
+    post("week_old_recent", 24 * 7, fetched_h_ago=12),
+    post("too_new", 0.5),
+    post("too_old", 24 * 120),
+]
+plan = plan_refresh(posts, budget_usd=1.0, now=NOW)
+test("期限到来分だけ選ぶ", sorted(plan.tweet_ids) == ["day_old_stale", "young_unfetched"], f"{plan.tweet_ids}")
+test("期限超過の度合いが大きい順", plan.tweet_ids[0] == "young_unfetched")
+
+# -------------------------------------------------------
+# 2. 予算とバッチ
+# -------------------------------------------------------
+section("予算とバッチ")
+
+many = [post(str(i), 3 + i * 0.01) for i in range(250)]
+plan = plan_refresh(many, budget_usd=UNIT_PRICES["post_read"] * 150, now=NOW)
+test("予算内の件数に収める", plan.units == 150 and plan.due == 250, f"units={plan.units} due={plan.due}")
+test("100件ずつのバッチ", [len(b) for b in plan.batches] == [BATCH_SIZE, 50])
+test("見積額が予算以内", plan.estimated_usd <= UNIT_PRICES["post_read"] * 150)
+test("予算0なら何も取得しない", plan_refresh(many, budget_usd=0, now=NOW).units == 0)
+
+# -------------------------------------------------------
+# サマリー
+# -------------------------------------------------------
+print(f"\n{'='*50}")
+print(f"結果: {PASSED} PASSED / {FAILED} FAILED / {PASSED + FAILED} TOTAL")
+if FAILED > 0:
+    print("FAILED テストがあります。確認してください。")
+    sys.exit(1)
+else:
+    print("全テスト PASSED")
+    sys.exit(0)
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+replied_index（リプライ済みツイートのインデックス）の動作テスト
+実行: python3 tests/test_replied_index.py
+"""
+
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+PROJECT_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_DIR / "reply_system"))
+
+import replied_index
+from replied_index import JUDGED, REPLIED, SKIPPED, BloomFilter, RepliedIndex
+
+PASSED = 0
+FAILED = 0
+
+
+def test(name: str, condition: bool, detail: str = ""):
+    global PASSED, FAILED
+    if condition:
+        PASSED += 1
+        print(f"  PASS: {name}")
+    else:
+        FAILED += 1
+        msg = f"  FAIL: {name}"
+        if detail:
+            msg += f" — {detail}"
+        print(msg)
+
+
+def section(title: str):
+    print(f"\n=== {title} ===")
+
+
+TMP = Path(tempfile.mkdtemp())
+REPLY_LOG = TMP / "reply_log.json"
+SESSION_LOG = TMP / "session_log.json"
+SOURCES = {
+    "reply_log": (REPLY_LOG, replied_index._reply_log_records),
+    "session_log": (SESSION_LOG, replied_index._session_log_records),
+}
+
+
+def write_log(path: Path, entries: list[dict], bump: int = 0):
+    path.write_text(json.dumps(entries), encoding="utf-8")
+    if bump:
+        st = path.stat()
+        os.utime(path, (st.st_atime, st.st_mtime + bump))
+
+
+# -------------------------------------------------------
+# 1. Bloom filter
+# -------------------------------------------------------
+section("Bloom filter")
+
+bloom = BloomFilter(1000)
+for i in range(1000):
+    bloom.add(str(i))
+test("追加したものは必ず含む", all(str(i) in bloom for i in range(1000)))
+false_positive = sum(f"x{i}" in bloom for i in range(10000)) / 10000
+test("偽陽性率は設定値程度", false_positive < 0.03, f"{false_positive:.4f}")
+
+# -------------------------------------------------------
+# 2. ログの取り込み
+# -------------------------------------------------------
+section("ログの取り込み")
+
+write_log(REPLY_LOG, [
+    {"target_tweet_id": "1", "status": "posted"},
+    {"target_tweet_id": "2", "status": "dry_run"},
+])
+write_log(SESSION_LOG, [
+    {"tweet_id": "3", "status": "success"},
+    {"tweet_id": "4", "status": "success", "dry_run": True},
+    {"tweet_id": "5", "status": "skipped"},
+    {"tweet_id": "6", "status": "failed"},
+])
+index = RepliedIndex(TMP / "index.db", sources=SOURCES)
+test("posted と success をリプライ済みとして取り込む", index.ids([REPLIED]) == {"1", "3"}, f"{index.ids()}")
+test("人のスキップも記録", index.status("5") == SKIPPED)
+test("dry_run・失敗は記録しない", not any(t in index for t in ("2", "4", "6")))
+test("更新されていないログは読み直さない", index.sync_logs() == 0)
+
+# session_log が500件で切り捨てられても、取り込み済みのIDは残る
+write_log(SESSION_LOG, [{"tweet_id": "7", "status": "success"}], bump=10)
+test("更新されたログだけ取り込む", index.sync_logs() == 1 and "7" in index)
+test("ログから消えたIDも残る", index.status("3") == REPLIED)
+
+# -------------------------------------------------------
+# 3. 記録・状態
+# -------------------------------------------------------
+section("記録・状態")
+
+test("判定済みを記録", index.record("10", JUDGED, source="dashboard", reason="spam"))
+test("どの状態でも含む", "10" in index and not index.contains("10", [REPLIED]))
+test("上位の状態に上げる", index.record("10", REPLIED) and index.status("10") == REPLIED)
+test("下位の状態では上書きしない", not index.record("10", JUDGED) and index.status("10") == REPLIED)
+test("空のIDは無視", not index.record("", REPLIED))
+test("未知のIDは含まない", "999" not in index and index.status("999") is None)
+index.close()
+
+reopened = RepliedIndex(TMP / "index.db", sources=SOURCES)
+test("開き直しても残る", reopened.status("10") == REPLIED and len(reopened) == 5, f"len={len(reopened)}")
+test("ids は set を返す", reopened.ids([REPLIED]) == {"1", "3", "7", "10"})
+
+many = RepliedIndex(TMP / "many.db", sources={})
+many._rebuild_bloom(capacity=10)
+many.record_many((str(i), JUDGED) for i in range(50))
+test("容量を超えたら Bloom filter を作り直す", many._bloom.capacity >= 50 and all(str(i) in many for i in range(50)))
+
+# -------------------------------------------------------
+# サマリー
+# -------------------------------------------------------
+print(f"\n{'='*50}")
+print(f"結果: {PASSED} PASSED / {FAILED} FAILED / {PASSED + FAILED} TOTAL")
+if FAILED > 0:
+    print("FAILED テストがあります。確認してください。")
+    sys.exit(1)
+else:
+    print("全テスト PASSED")
+    sys.exit(0)
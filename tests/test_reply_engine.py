@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+reply_engine のバッチ判定・生成（_parse_batch / generate_replies）の動作テスト
+LLM は StubBackend（LLM_BACKEND=stub）に差し替え、LLM キャッシュは一時ファイルを使う。
+実行: python3 tests/test_reply_engine.py
+"""
+
+import json
+import os
+import re
+import sys
+import tempfile
+from pathlib import Path
+
+PROJECT_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_DIR))
+sys.path.insert(0, str(PROJECT_DIR / "reply_system"))
+
+from llm import llm_cache
+from llm.llm_gateway import StubBackend, register_backend
+
+llm_cache.DB_FILE = Path(tempfile.mkdtemp()) / "llm_cache.db"
+llm_cache._CACHE = None
+os.environ["LLM_BACKEND"] = "stub"
+
+from ng_matcher import NGMatcher
+from reply_engine import INVALID_RESPONSE_REASON, NG_FILE, REPLY_BATCH_SIZE, ReplyEngine
+
+PASSED = 0
+FAILED = 0
+
+
+def test(name: str, condition: bool, detail: str = ""):
+    global PASSED, FAILED
+    if condition:
+        PASSED += 1
+        print(f"  PASS: {name}")
+    else:
+        FAILED += 1
+        msg = f"  FAIL: {name}"
+        if detail:
+            msg += f" — {detail}"
+        print(msg)
+
+
+def section(title: str):
+    print(f"\n=== {title} ===")
+
+
+# プロンプトを受け取って応答を返す関数（テストごとに差し替える）
+calls: list[str] = []
+answer = lambda prompt: ""
+
+
+def responder(prompt: str) -> str:
+    calls.append(prompt)
+    return answer(prompt)
+
+
+register_backend("stub", lambda: StubBackend(responder))
+
+
+def numbered(prompt: str) -> list[tuple[int, str]]:
+    """プロンプト中の [番号] ツイート本文 を取り出す"""
+    return [(int(n), t) for n, t in re.findall(r"^\[(\d+)\] (.+)$", prompt, re.MULTILINE)]
+
+
+def ok_for_all(prompt: str) -> str:
+    return json.dumps([{"id": n, "ok": True, "reply": f"返事:{t}"} for n, t in numbered(prompt)], ensure_ascii=False)
+
+
+# X API に触れないよう __init__ を通さずに作る
+engine = ReplyEngine.__new__(ReplyEngine)
+engine.persona = ""
+engine.reply_strategy = {}
+engine.ng_matcher = NGMatcher(NG_FILE, "skip_keywords")
+engine.reply_ng_matcher = NGMatcher(NG_FILE, "reply_ng_phrases")
+
+
+def tweets(prefix: str, n: int) -> list[dict]:
+    return [{"text": f"{prefix}{i}", "category": "c"} for i in range(n)]
+
+
+# -------------------------------------------------------
+# 1. _parse_batch
+# -------------------------------------------------------
+section("_parse_batch")
+
+raw = json.dumps([
+    {"id": 3, "ok": False, "reason": "宣伝"},
+    {"id": 1, "ok": True, "reply": "リプライ: 一つ目"},
+    {"id": 1, "ok": False, "reason": "重複"},
+    {"id": 9, "ok": True, "reply": "範囲外"},
+    {"id": 2, "ok": "yes"},
+], ensure_ascii=False)
+items = engine._parse_batch(f"```json\n{raw}\n```", 3)
+test("id で入力の位置に対応づける", items[0]["reply"] == "一つ目" and items[2]["reason"] == "宣伝", f"{items}")
+test("同じ id は最初の1件を使う", items[0]["ok"] is True)
+test("形が不正な項目は None", items[1] is None)
+test("範囲外の id は無視", len(items) == 3)
+test("ok なのに reply が空なら None", engine._parse_batch('[{"id": 1, "ok": true, "reply": ""}]', 1) == [None])
+test("応答なしは丸ごと None", engine._parse_batch(None, 2) is None and engine._parse_batch("", 2) is None)
+test("JSON 配列でない応答は丸ごと None", engine._parse_batch("すみません", 2) is None
+     and engine._parse_batch('{"ok": true}', 1) is None)
+
+# -------------------------------------------------------
+# 2. generate_replies
+# -------------------------------------------------------
+section("generate_replies")
+
+
+def reversed_order(prompt: str) -> str:
+    return json.dumps(list(reversed(json.loads(ok_for_all(prompt)))), ensure_ascii=False)
+
+
+calls.clear()
+answer = reversed_order
+batch = tweets("順番", 3)
+results = engine.generate_replies(batch)
+test("1回の呼び出しにまとめる", len(calls) == 1, f"calls={len(calls)}")
+test("入力と同じ順で返す", [r["reply"] for r in results] == [f"返事:{t['text']}" for t in batch], f"{results}")
+test("リプ可は判定済み", all(r["judged"] for r in results))
+
+calls.clear()
+results = engine.generate_replies(batch)
+test("判定済みは LLM キャッシュから返す", not calls and all(r["ok"] for r in results))
+
+
+def drop_second(prompt: str) -> str:
+    items = json.loads(ok_for_all(prompt))
+    if len(items) > 1:
+        items[1] = {"id": items[1]["id"], "ok": "?"}
+    return json.dumps(items, ensure_ascii=False)
+
+
+calls.clear()
+answer = drop_second
+results = engine.generate_replies(tweets("一部不正", 3))
+test("不正な項目だけ1件で呼び直す", len(calls) == 2 and len(numbered(calls[1])) == 1, f"calls={len(calls)}")
+test("呼び直した項目も埋まる", all(r["ok"] for r in results), f"{results}")
+
+calls.clear()
+answer = lambda prompt: json.dumps(
+    [{"id": n, "ok": True, "reply": "ありがとう！"} for n, _ in numbered(prompt)], ensure_ascii=False
+)
+results = engine.generate_replies(tweets("セルフチェック", 2))
+test("セルフチェックNGはスキップ理由にする",
+     all(not r["ok"] and "セルフチェックNG" in r["reason"] for r in results), f"{results}")
+test("セルフチェックNGは判定済みにしない（次回作り直す）", not any(r["judged"] for r in results))
+
+calls.clear()
+answer = lambda prompt: json.dumps(
+    [{"id": n, "ok": False, "reason": "宣伝"} for n, _ in numbered(prompt)], ensure_ascii=False
+)
+results = engine.generate_replies(tweets("リプ不可", 2))
+test("リプ不可の判定は判定済み", all(not r["ok"] and r["judged"] and r["reason"] == "宣伝" for r in results), f"{results}")
+
+
+def outage(prompt: str) -> str:
+    raise RuntimeError("timeout")
+
+
+calls.clear()
+answer = outage
+results = engine.generate_replies(tweets("障害", REPLY_BATCH_SIZE + 2))
+test("呼び出し自体の失敗では1件ずつ呼び直さず打ち切る", len(calls) == 1, f"calls={len(calls)}")
+test("残りは全て判定不能", all(r["reason"] == INVALID_RESPONSE_REASON and not r["judged"] for r in results)
+     and len(results) == REPLY_BATCH_SIZE + 2)
+
+calls.clear()
+answer = lambda prompt: "JSONで返せませんでした"
+results = engine.generate_replies(tweets("読めない", 3))
+test("配列として読めない応答も打ち切る", len(calls) == 1 and all(not r["ok"] for r in results))
+
+calls.clear()
+answer = ok_for_all
+results = engine.generate_replies(tweets("障害", 2))
+test("失敗した結果はキャッシュしない", len(calls) == 1 and all(r["ok"] for r in results))
+
+# -------------------------------------------------------
+# サマリー
+# -------------------------------------------------------
+print(f"\n{'='*50}")
+print(f"結果: {PASSED} PASSED / {FAILED} FAILED / {PASSED + FAILED} TOTAL")
+if FAILED > 0:
+    print("FAILED テストがあります。確認してください。")
+    sys.exit(1)
+else:
+    print("全テスト PASSED")
+    sys.exit(0)
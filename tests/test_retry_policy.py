@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+retry_policy（X API の再試行とサーキットブレーカー）の動作テスト
+実行: python3 tests/test_retry_policy.py
+"""
+
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+PROJECT_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_DIR / "post_scheduler"))
+
+from retry_policy import CircuitBreaker, CircuitOpenError, RetryPolicy, call_with_retry, call_with_retry_async
+
+PASSED = 0
+FAILED = 0
+
+
+def test(name: str, condition: bool, detail: str = ""):
+    global PASSED, FAILED
+    if condition:
+        PASSED += 1
+        print(f"  PASS: {name}")
+    else:
+        FAILED += 1
+        msg = f"  FAIL: {name}"
+        if detail:
+            msg += f" — {detail}"
+        print(msg)
+
+
+def section(title: str):
+    print(f"\n=== {title} ===")
+
+
+class Transient(Exception):
+    pass
+
+
+def flaky(failures: int, exc: type = Transient):
+    """最初の failures 回だけ exc を送出する関数"""
+    calls = []
+
+    def fn():
+        calls.append(1)
+        if len(calls) <= failures:
+            raise exc("boom")
+        return "ok"
+
+    return fn, calls
+
+
+def is_transient(e: Exception) -> bool:
+    return isinstance(e, Transient)
+
+
+FAST = RetryPolicy(max_attempts=3, base_delay=0.001, max_delay=0.002)
+
+# -------------------------------------------------------
+# 1. RetryPolicy
+# -------------------------------------------------------
+section("RetryPolicy")
+
+policy = RetryPolicy(max_attempts=5, base_delay=1.0, max_delay=5.0)
+delays = [policy.delay(r) for r in range(6) for _ in range(50)]
+test("待ち時間は 0〜max_delay", all(0 <= d <= 5.0 for d in delays))
+test("1回目は base_delay 以下", all(policy.delay(0) <= 1.0 for _ in range(50)))
+test("jitter で毎回ばらつく", len({round(policy.delay(3), 6) for _ in range(20)}) > 1)
+
+# -------------------------------------------------------
+# 2. call_with_retry
+# -------------------------------------------------------
+section("call_with_retry")
+
+fn, calls = flaky(2)
+result, retries = call_with_retry("GET /x", fn, policy=FAST, breaker=CircuitBreaker(), is_retryable=is_transient)
+test("一時的な失敗は再試行して成功", result == "ok" and len(calls) == 3)
+test("再試行回数を返す", retries == 2, f"retries={retries}")
+
+fn, calls = flaky(5)
+try:
+    call_with_retry("GET /x", fn, policy=FAST, breaker=CircuitBreaker(), is_retryable=is_transient)
+    raised = False
+except Transient:
+    raised = True
+test("max_attempts を超えたら元の例外を送出", raised and len(calls) == 3, f"calls={len(calls)}")
+
+fn, calls = flaky(1, ValueError)
+try:
+    call_with_retry("GET /x", fn, policy=FAST, breaker=CircuitBreaker(), is_retryable=is_transient)
+    raised = False
+except ValueError:
+    raised = True
+test("再試行対象外の例外は即送出", raised and len(calls) == 1)
+
+async def async_flaky(fn):
+    return fn()
+
+
+fn, calls = flaky(1)
+result, retries = asyncio.run(
+    call_with_retry_async(
+        "GET /x", lambda: async_flaky(fn), policy=FAST, breaker=CircuitBreaker(), is_retryable=is_transient
+    )
+)
+test("asyncio 版も再試行する", result == "ok" and retries == 1)
+
+# -------------------------------------------------------
+# 3. CircuitBreaker
+# -------------------------------------------------------
+section("CircuitBreaker")
+
+breaker = CircuitBreaker(failure_threshold=3, reset_timeout=0.05)
+fn, calls = flaky(100)
+for _ in range(2):
+    try:
+        call_with_retry("GET /down", fn, policy=FAST, breaker=breaker, is_retryable=is_transient)
+    except (Transient, CircuitOpenError):
+        pass
+test("連続失敗で open になる", breaker.state("GET /down") == "open")
+test("別エンドポイントは影響を受けない", breaker.state("GET /ok") == "closed")
+
+before = len(calls)
+try:
+    call_with_retry("GET /down", fn, policy=FAST, breaker=breaker, is_retryable=is_transient)
+    err = None
+except CircuitOpenError as e:
+    err = e
+test("open 中は呼び出さずに CircuitOpenError", err is not None and len(calls) == before)
+test("CircuitOpenError にエンドポイントを持たせる", err is not None and err.endpoint == "GET /down")
+
+time.sleep(0.06)
+test("reset_timeout 後は half_open", breaker.state("GET /down") == "half_open")
+try:
+    call_with_retry("GET /down", fn, policy=RetryPolicy(1, 0, 0), breaker=breaker, is_retryable=is_transient)
+except Transient:
+    pass
+test("half_open の試行が失敗すると再び open", breaker.state("GET /down") == "open")
+
+time.sleep(0.06)
+fn_ok, _ = flaky(0)
+call_with_retry("GET /down", fn_ok, policy=FAST, breaker=breaker, is_retryable=is_transient)
+test("half_open の試行が成功すると closed", breaker.state("GET /down") == "closed")
+
+breaker = CircuitBreaker(failure_threshold=3)
+fn, _ = flaky(1, ValueError)
+try:
+    call_with_retry("GET /bad", fn, policy=FAST, breaker=breaker, is_retryable=is_transient)
+except ValueError:
+    pass
+breaker.record_failure("GET /bad")
+breaker.record_failure("GET /bad")
+test("再試行対象外の失敗は数えない", breaker.state("GET /bad") == "closed")
+
+# -------------------------------------------------------
+# サマリー
+# -------------------------------------------------------
+print(f"\n{'='*50}")
+print(f"結果: {PASSED} PASSED / {FAILED} FAILED / {PASSED + FAILED} TOTAL")
+if FAILED > 0:
+    print("FAILED テストがあります。確認してください。")
+    sys.exit(1)
+else:
+    print("全テスト PASSED")
+    sys.exit(0)
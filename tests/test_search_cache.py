@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+search_cache（search_recent_tweets のディスクキャッシュ）の動作テスト
+実行: python3 tests/test_search_cache.py
+"""
+
+import sys
+import tempfile
+from datetime import datetime, timezone
+from pathlib import Path
+
+PROJECT_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_DIR / "post_scheduler"))
+
+from search_cache import MAX_CHAIN_AGE_SECONDS, SearchCache, cache_key
+
+PASSED = 0
+FAILED = 0
+
+
+def test(name: str, condition: bool, detail: str = ""):
+    global PASSED, FAILED
+    if condition:
+        PASSED += 1
+        print(f"  PASS: {name}")
+    else:
+        FAILED += 1
+        msg = f"  FAIL: {name}"
+        if detail:
+            msg += f" — {detail}"
+        print(msg)
+
+
+def section(title: str):
+    print(f"\n=== {title} ===")
+
+
+NOW = datetime(2026, 3, 1, 12, 0, tzinfo=timezone.utc).timestamp()
+
+
+def tweet(tid: int, author: int, age_seconds: float = 600) -> dict:
+    created = datetime.fromtimestamp(NOW - age_seconds, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+    return {"id": str(tid), "author_id": str(author), "text": f"tweet {tid}", "created_at": created}
+
+
+def response(tweets: list[dict]) -> dict:
+    authors = sorted({t["author_id"] for t in tweets})
+    data = {"meta": {"result_count": len(tweets)}}
+    if tweets:
+        data["data"] = tweets
+        data["includes"] = {"users": [{"id": a, "username": f"user{a}"} for a in authors]}
+    return data
+
+
+def params(query: str = "猫 豆知識", max_results: int = 10) -> dict:
+    return {"query": f"{query} -is:retweet -is:reply lang:ja", "max_results": max_results, "tweet.fields": "created_at"}
+
+
+tmp = Path(tempfile.mkdtemp())
+cache = SearchCache(tmp / "cache", ttl_seconds=1800)
+
+# -------------------------------------------------------
+# 1. キー
+# -------------------------------------------------------
+section("キー")
+
+test("全角空白・連続空白を正規化", cache_key(params("猫　 豆知識")) == cache_key(params("猫 豆知識")))
+test("since_id はキーに含めない", cache_key(dict(params(), since_id="5")) == cache_key(params()))
+test("max_results が違えば別キー", cache_key(params(max_results=20)) != cache_key(params()))
+test("OR の大文字小文字は区別", cache_key(params("猫 OR 犬")) != cache_key(params("猫 or 犬")))
+
+# -------------------------------------------------------
+# 2. ヒット / 差分取得
+# -------------------------------------------------------
+section("ヒット / 差分取得")
+
+lookup = cache.lookup(params(), now=NOW)
+test("初回はミス", lookup.entry is None and not lookup.fresh and lookup.since_id is None)
+
+first = [tweet(i, i % 3) for i in range(110, 100, -1)]
+result, saved = cache.store(lookup, response(first), 10, now=NOW)
+test("ミス時は再利用0件", saved == {"post_read": 0, "user_read": 0}, f"{saved}")
+test("そのまま返す", [t["id"] for t in result["data"]] == [t["id"] for t in first])
+
+lookup = cache.lookup(params(), now=NOW + 600)
+test("TTL 内は fresh", lookup.fresh and lookup.since_id is None)
+hit = lookup.response()
+test("キャッシュから同じ結果", [t["id"] for t in hit["data"]] == [t["id"] for t in first])
+test("ユーザーも復元", len(hit["includes"]["users"]) == 3)
+
+lookup = cache.lookup(params(), now=NOW + 3600)
+test("TTL 超過は stale", not lookup.fresh)
+test("since_id は最新のID", lookup.since_id == "110", f"{lookup.since_id}")
+
+newer = [tweet(113, 7, 60), tweet(112, 1, 120), tweet(111, 0, 180)]
+result, saved = cache.store(lookup, response(newer), 10, now=NOW + 3600)
+ids = [t["id"] for t in result["data"]]
+test("新しい順に max_results 件", ids == [str(i) for i in range(113, 103, -1)], f"{ids}")
+test("再利用した post_read を数える", saved["post_read"] == 7, f"{saved}")
+test("再利用した user_read を数える", saved["user_read"] == 1, f"{saved}")
+users = {u["id"] for u in result["includes"]["users"]}
+test("結果に登場する著者だけ残す", users == {"0", "1", "2", "7"}, f"{users}")
+
+lookup = cache.lookup(params(), now=NOW + 7200)
+result, saved = cache.store(lookup, response([]), 10, now=NOW + 7200)
+test("新着0件なら全件再利用", saved["post_read"] == 10 and len(result["data"]) == 10)
+
+# -------------------------------------------------------
+# 3. 期限
+# -------------------------------------------------------
+section("期限")
+
+lookup = cache.lookup(params(), now=NOW + MAX_CHAIN_AGE_SECONDS + 7201)
+test("古すぎるエントリは使わない", lookup.entry is None)
+
+cache2 = SearchCache(tmp / "cache2")
+old = [tweet(50, 1, MAX_CHAIN_AGE_SECONDS + 100)]
+cache2.store(cache2.lookup(params(), now=NOW), response(old), 10, now=NOW)
+lookup = cache2.lookup(params(), now=NOW + 3600)
+test("最新ツイートが7日近く前なら差分取得しない", lookup.entry is not None and lookup.since_id is None)
+
+(tmp / "cache2" / f"{cache_key(params())}.json").write_text("{", encoding="utf-8")
+test("壊れたファイルはミス扱い", cache2.lookup(params(), now=NOW).entry is None)
+
+# -------------------------------------------------------
+# サマリー
+# -------------------------------------------------------
+print(f"\n{'='*50}")
+print(f"結果: {PASSED} PASSED / {FAILED} FAILED / {PASSED + FAILED} TOTAL")
+if FAILED > 0:
+    print("FAILED テストがあります。確認してください。")
+    sys.exit(1)
+else:
+    print("全テスト PASSED")
+    sys.exit(0)
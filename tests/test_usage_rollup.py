@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+usage_rollup（期間集計・ロールアップ・月末見込み）の動作テスト
+実行: python3 tests/test_usage_rollup.py
+"""
+
+import json
+import sys
+import tempfile
+from datetime import date, datetime
+from pathlib import Path
+
+PROJECT_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_DIR / "post_scheduler"))
+
+import cost_logger
+from usage_rollup import period_key, project_month_end, rollup
+from usage_summary import summarize
+
+PASSED = 0
+FAILED = 0
+
+
+def test(name: str, condition: bool, detail: str = ""):
+    global PASSED, FAILED
+    if condition:
+        PASSED += 1
+        print(f"  PASS: {name}")
+    else:
+        FAILED += 1
+        msg = f"  FAIL: {name}"
+        if detail:
+            msg += f" — {detail}"
+        print(msg)
+
+
+def section(title: str):
+    print(f"\n=== {title} ===")
+
+
+tmp = Path(tempfile.mkdtemp())
+cost_logger.LOG_DIR = tmp
+cost_logger.LOG_FILE = tmp / "x_api_usage.jsonl"
+
+
+def record(day: str, units: int, context: str, query: str = "") -> dict:
+    price = cost_logger.UNIT_PRICES["post_read"]
+    return {
+        "date": day, "usage_type": "post_read", "endpoint": "GET /2/tweets/search/recent", "units": units,
+        "unit_price_usd": price, "estimated_cost_usd": round(units * price, 6), "context": context,
+        "metadata": {"query": query} if query else {},
+    }
+
+
+def write_day(day: str, rows: list[dict]) -> None:
+    lines = [json.dumps(r).encode() + b"\n" for r in rows]
+    cost_logger._append_lines(cost_logger.partition_path(day), lines, False)
+
+
+# 2026-03-01(日) / 03-02(月) / 03-09(月) / 04-01
+write_day("2026-03-01", [record("2026-03-01", 10, "reply", "猫"), record("2026-03-01", 20, "engagement")])
+write_day("2026-03-02", [record("2026-03-02", 30, "reply", "猫"), record("2026-03-02", 5, "reply", "犬")])
+write_day("2026-03-09", [record("2026-03-09", 100, "trend", "猫 豆知識")])
+write_day("2026-04-01", [record("2026-04-01", 40, "reply", "犬")])
+cost_logger.finalize_day("2026-03-01")
+
+# -------------------------------------------------------
+# 1. 集計の形
+# -------------------------------------------------------
+section("集計の形")
+
+rows = [record("2026-03-01", 10, "reply", "猫"), record("2026-03-01", 20, "engagement")]
+s = summarize(rows)
+test("context 別に集計", s["by_context"]["reply"]["units"] == 10 and s["by_context"]["engagement"]["units"] == 20)
+test("query がある記録だけ by_query に入る", list(s["by_query"]) == ["猫"])
+
+result = rollup(date(2026, 3, 1), date(2026, 4, 30))
+test("summarize と同じキー", set(s) <= set(result), f"{set(s) - set(result)}")
+test("期間の合計", result["by_type"]["post_read"]["units"] == 205 and result["events"] == 6)
+test("sidecar と未締めの日を合わせて数える", result["by_context"]["reply"]["units"] == 85)
+test("クエリ別の合計", result["by_query"]["猫"]["events"] == 2 and result["by_query"]["犬"]["units"] == 45)
+
+top = rollup(date(2026, 3, 1), date(2026, 4, 30), max_queries=1)
+test("上位クエリに絞る", list(top["by_query"]) == ["猫 豆知識"], f"{list(top['by_query'])}")
+test("絞っても合計は変わらない", top["estimated_total_usd"] == result["estimated_total_usd"])
+
+# -------------------------------------------------------
+# 2. ロールアップ
+# -------------------------------------------------------
+section("ロールアップ")
+
+test("ISO 週キー", period_key(date(2026, 3, 1), "week") == "2026-W09" and period_key(date(2026, 3, 2), "week") == "2026-W10")
+
+weekly = rollup(date(2026, 3, 1), date(2026, 3, 15), "week")
+keys = [p["period"] for p in weekly["periods"]]
+test("週ごとに区切る", keys == ["2026-W09", "2026-W10", "2026-W11"], f"{keys}")
+test("週の範囲", weekly["periods"][1]["from"] == "2026-03-02" and weekly["periods"][1]["to"] == "2026-03-08")
+test("週の小計", [p["events"] for p in weekly["periods"]] == [2, 2, 1])
+
+monthly = rollup(date(2026, 3, 1), date(2026, 4, 30), "month")
+test("月ごとの小計", [(p["period"], p["by_type"]["post_read"]["units"]) for p in monthly["periods"]]
+     == [("2026-03", 165), ("2026-04", 40)])
+test("小計の合計は全体と一致", abs(sum(p["estimated_total_usd"] for p in monthly["periods"]) - monthly["estimated_total_usd"]) < 1e-9)
+
+# -------------------------------------------------------
+# 3. 月末見込み
+# -------------------------------------------------------
+section("月末見込み")
+
+p = project_month_end(date(2026, 3, 10), now=datetime(2026, 4, 5, 12, 0))
+test("月初からの実績", abs(p["month_to_date_usd"] - 0.825) < 1e-9, f"{p}")
+test("経過日数で日割り", abs(p["projected_usd"] - 0.825 / 10 * 31) < 1e-6, f"{p['projected_usd']}")
+
+p = project_month_end(date(2026, 4, 1), now=datetime(2026, 4, 1, 12, 0))
+test("今日は経過した時間だけ数える", abs(p["projected_usd"] - 0.2 / 0.5 * 30) < 1e-6, f"{p['projected_usd']}")
+
+march = rollup(date(2026, 2, 20), date(2026, 3, 10))
+test("月初から集計した rollup は end の月の合計を持つ", abs(march["month_to_date_usd"] - 0.825) < 1e-9, f"{march}")
+test("月初より後から集計した rollup には無い", "month_to_date_usd" not in rollup(date(2026, 3, 2), date(2026, 3, 10)))
+
+loaded = []
+original = cost_logger.load_day_summary
+cost_logger.load_day_summary = lambda day: loaded.append(day) or original(day)
+p = project_month_end(date(2026, 3, 10), now=datetime(2026, 4, 5, 12, 0), month_to_date_usd=march["month_to_date_usd"])
+cost_logger.load_day_summary = original
+test("rollup の合計を渡せば日別 summary を読み直さない", not loaded and abs(p["month_to_date_usd"] - 0.825) < 1e-9, f"{loaded}")
+
+# -------------------------------------------------------
+# サマリー
+# -------------------------------------------------------
+print(f"\n{'='*50}")
+print(f"結果: {PASSED} PASSED / {FAILED} FAILED / {PASSED + FAILED} TOTAL")
+if FAILED > 0:
+    print("FAILED テストがあります。確認してください。")
+    sys.exit(1)
+else:
+    print("全テスト PASSED")
+    sys.exit(0)
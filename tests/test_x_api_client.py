@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+x_api_client の create_tweet（再送時の二重投稿防止）の動作テスト
+X API には触れず、tweepy.Client とタイムライン取得を差し替える。
+実行: python3 tests/test_x_api_client.py
+"""
+
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+PROJECT_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_DIR / "post_scheduler"))
+
+import requests
+import tweepy
+
+import x_api_client
+from budget_guard import BudgetGuard
+from rate_limiter import RateLimiter
+from retry_policy import CircuitBreaker, RetryPolicy
+from x_api_client import XApiClient, _same_tweet_text
+
+PASSED = 0
+FAILED = 0
+
+
+def test(name: str, condition: bool, detail: str = ""):
+    global PASSED, FAILED
+    if condition:
+        PASSED += 1
+        print(f"  PASS: {name}")
+    else:
+        FAILED += 1
+        msg = f"  FAIL: {name}"
+        if detail:
+            msg += f" — {detail}"
+        print(msg)
+
+
+def section(title: str):
+    print(f"\n=== {title} ===")
+
+
+# コストログを書かない・再試行を待たない
+x_api_client.log_api_usage = lambda *args, **kwargs: None
+x_api_client.CREATE_RETRY = RetryPolicy(max_attempts=3, base_delay=0.001, max_delay=0.002)
+
+# -------------------------------------------------------
+# 1. 本文の照合
+# -------------------------------------------------------
+section("本文の照合")
+
+test("同じ本文", _same_tweet_text("猫がかわいい", "猫がかわいい"))
+test("HTML エスケープを戻して比べる", _same_tweet_text("A &amp; B &lt;3", "A & B <3"))
+test("末尾のメディア t.co URL を無視", _same_tweet_text("猫の写真 https://t.co/abc123", "猫の写真"))
+test("本文中の URL は t.co に置き換わっていても同じ",
+     _same_tweet_text("見て https://t.co/x1 かわいい", "見て https://example.com/cat かわいい"))
+test("リプライ先の @メンションを無視", _same_tweet_text("@alice @bob そうですね", "そうですね"))
+test("違う本文は別物", not _same_tweet_text("猫がかわいい", "犬がかわいい"))
+test("末尾が一致するだけの別の投稿は別物", not _same_tweet_text("猫だね", "ね"))
+test("空の本文には当てない", not _same_tweet_text("", ""))
+
+# -------------------------------------------------------
+# 2. create_tweet の再送
+# -------------------------------------------------------
+section("create_tweet の再送")
+
+
+class FakeClient:
+    """create_tweet が errors を順に送出し、尽きたら投稿に成功する"""
+
+    def __init__(self, errors: list[Exception]):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def create_tweet(self, **kwargs):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return tweepy.Response({"id": "new", "text": kwargs["text"]}, {}, [], {})
+
+
+def http_error(cls: type, status: int, reason: str, detail: str = "") -> Exception:
+    """tweepy の HTTPException はレスポンスから組み立てる"""
+    body = {"detail": detail} if detail else {}
+    response = SimpleNamespace(status_code=status, reason=reason, text=str(body), json=lambda: body)
+    return cls(response)
+
+
+def make_client(errors: list[Exception], timeline: list[str]) -> tuple[XApiClient, FakeClient, list[int]]:
+    api = XApiClient(
+        rate_limiter=RateLimiter(state_file=None),
+        circuit_breaker=CircuitBreaker(),
+        budget_guard=BudgetGuard(None, None, register=False),
+    )
+    fake = api.client = FakeClient(errors)
+    lookups: list[int] = []
+    api.get_me = lambda: SimpleNamespace(data=SimpleNamespace(id=1))
+
+    def get_user_tweets(user_id: str, max_results: int = 5):
+        lookups.append(1)
+        return [SimpleNamespace(id=f"old{i}", text=t) for i, t in enumerate(timeline)]
+
+    api.get_user_tweets = get_user_tweets
+    return api, fake, lookups
+
+
+api, fake, lookups = make_client([requests.ReadTimeout("read timed out")], ["@alice 投稿した &amp; 届いた"])
+r = api.create_tweet(text="投稿した & 届いた", in_reply_to_tweet_id="9")
+test("届いたかもしれない失敗の後は再送前にタイムラインを見る", lookups == [1] and fake.calls == 1, f"lookups={lookups} calls={fake.calls}")
+test("投稿済みなら再送せず既存の投稿を返す", r.data["id"] == "old0", f"{r}")
+
+api, fake, lookups = make_client([http_error(tweepy.TwitterServerError, 503, "Service Unavailable")], ["別の投稿"])
+r = api.create_tweet(text="まだ無い")
+test("タイムラインに無ければ再送する", lookups == [1] and fake.calls == 2 and r.data["id"] == "new", f"{r}")
+
+api, fake, lookups = make_client([requests.ConnectTimeout("connect timed out")], [])
+r = api.create_tweet(text="接続できなかった")
+test("接続できなかった送信はそのまま再送する", not lookups and fake.calls == 2 and r.data["id"] == "new")
+
+api, fake, lookups = make_client([http_error(tweepy.Forbidden, 403, "Forbidden")], [])
+try:
+    api.create_tweet(text="拒否")
+    raised = False
+except tweepy.Forbidden:
+    raised = True
+test("再送対象でないエラーはそのまま送出", raised and fake.calls == 1 and not lookups)
+
+# -------------------------------------------------------
+# 3. iter_user_tweets
+# -------------------------------------------------------
+section("iter_user_tweets")
+
+api = XApiClient(rate_limiter=RateLimiter(state_file=None), circuit_breaker=CircuitBreaker(),
+                 budget_guard=BudgetGuard(None, None, register=False))
+pages = {None: (["a", "b"], "t1"), "t1": (["c"], None)}
+requested: list[tuple] = []
+
+
+def get_page(user_id, max_results, since_id, token=None, start_time=None):
+    requested.append((since_id, token, start_time))
+    return pages[token]
+
+
+api._get_user_tweets_page = get_page
+got = list(api.iter_user_tweets("1", start_time="2026-01-01T00:00:00Z"))
+test("next_token を最後まで辿る", got == [(["a", "b"], "t1"), (["c"], None)], f"{got}")
+test("全ページに同じ start_time を渡す",
+     [r[2] for r in requested] == ["2026-01-01T00:00:00Z"] * 2 and [r[1] for r in requested] == [None, "t1"],
+     f"{requested}")
+
+# -------------------------------------------------------
+# サマリー
+# -------------------------------------------------------
+print(f"\n{'='*50}")
+print(f"結果: {PASSED} PASSED / {FAILED} FAILED / {PASSED + FAILED} TOTAL")
+if FAILED > 0:
+    print("FAILED テストがあります。確認してください。")
+    sys.exit(1)
+else:
+    print("全テスト PASSED")
+    sys.exit(0)